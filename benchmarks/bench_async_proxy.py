@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+""" Upload and download throughput of proxy.Storage and async_proxy.Storage
+    uploads - setting each block then waiting for them all to be sent
+    downloads - get_many() of all the blocks (like bundle.restore)
+    --latency adds a delay to each request to simulate a remote server
+"""
+
+
+import argparse
+import logging
+import random
+import threading
+import time
+
+from tempfile import TemporaryDirectory
+
+import werkzeug.serving
+
+import libernet.async_proxy
+import libernet.message
+import libernet.proxy
+import libernet.server
+
+from libernet.disk import Storage
+from libernet.hash import sha256_data_identifier
+from libernet.url import for_data_block
+from benchmarks.bench_proxy_upload import delayed
+
+
+def measure(label: str, create_client, blocks: list, args):
+    """time uploading then downloading the blocks through a new client"""
+    with TemporaryDirectory() as working_dir:
+        app = libernet.server.create_app(
+            Storage(working_dir), libernet.message.Center()
+        )
+        server = werkzeug.serving.make_server(
+            "localhost", args.port, delayed(app, args.latency / 1000), threaded=True
+        )
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        total = sum(len(d) for _, d in blocks) / 1024 / 1024
+        start = time.perf_counter()
+        client = create_client(args.port)
+
+        for key, data in blocks:
+            client[key] = data
+
+        close(client)  # waits for everything to be sent
+        upload_rate = total / (time.perf_counter() - start)
+        start = time.perf_counter()
+        client = create_client(args.port)
+        assert client.get_many([k for k, _ in blocks]) == [d for _, d in blocks]
+        close(client)
+        download_rate = total / (time.perf_counter() - start)
+        server.shutdown()
+        thread.join()
+
+    print(
+        f"{label:>6}: upload {upload_rate:8.1f} MiB/second"
+        f" download {download_rate:8.1f} MiB/second"
+    )
+
+
+def close(client):
+    """shutdown the client after all data has been sent"""
+    client.shutdown()
+
+    if isinstance(client, libernet.proxy.Storage):
+        client.join()
+
+
+def create_proxy(port: int):
+    """the threaded client"""
+    return libernet.proxy.Storage("localhost", port)
+
+
+def create_async_proxy(port: int):
+    """the asyncio client"""
+    return libernet.async_proxy.Storage("localhost", port)
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=128)
+    parser.add_argument("--size", type=int, default=1024 * 1024)
+    parser.add_argument("--port", type=int, default=8046)
+    parser.add_argument("--latency", type=float, default=20, help="milliseconds")
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    blocks = []
+
+    for _ in range(0, args.blocks):
+        data = random.randbytes(args.size)
+        blocks.append((for_data_block(sha256_data_identifier(data)), data))
+
+    measure("proxy", create_proxy, blocks, args)
+    measure("async", create_async_proxy, blocks, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+""" Where the time goes in block.store() and block.fetch() for 1 MiB blocks
+    hash (sha256), compress, encrypt and IO (disk.Storage) are timed
+    by wrapping the functions block.py calls
+    legacy - fetch() checking hashes the way it did before (3 hashes per block)
+"""
+
+
+import argparse
+import random
+import time
+
+from tempfile import TemporaryDirectory
+
+import libernet.block
+import libernet.codec
+import libernet.url
+
+from libernet.bundle import MAX_RAW_BLOCK_SIZE
+from libernet.disk import Storage
+from libernet.hash import sha256_data_identifier, binary_from_identifier
+
+
+class Profile:
+    """accumulates the time and calls of each stage"""
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self.bytes = {}
+
+    def wrap(self, stage: str, function, data_arg: int = 0):
+        """a function that times calls to function as stage
+        data_arg - the argument that is the data being processed (None: the result)
+        """
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            data = result if data_arg is None else args[data_arg]
+            self.seconds[stage] = (
+                self.seconds.get(stage, 0) + time.perf_counter() - start
+            )
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+            self.bytes[stage] = self.bytes.get(stage, 0) + len(data or b"")
+            return result
+
+        return timed
+
+    def report(self, label: str, blocks: int, total: float):
+        """print the time for each stage"""
+        print(f"{label}: {total:0.3f} seconds")
+
+        for stage, seconds in sorted(self.seconds.items(), key=lambda s: -s[1]):
+            print(
+                f"  {stage:>10}: {seconds:0.3f} seconds {seconds / total * 100:5.1f}%"
+                f" {self.calls[stage] / blocks:5.1f} calls/block"
+                f" {self.bytes[stage] / blocks / 1024 / 1024:5.2f} MiB/block"
+            )
+
+
+class TimedStorage:
+    """a storage that times reads and writes"""
+
+    def __init__(self, storage, profile: Profile):
+        self.setitem = profile.wrap("io", storage.__setitem__, 1)
+        self.getitem = profile.wrap("io", storage.get, None)
+
+    def __setitem__(self, key, value):
+        self.setitem(key, value)
+
+    def get(self, key, default=None):
+        """read a block"""
+        return self.getitem(key, default)
+
+
+def legacy_unpack(url: str, data: bytes) -> bytes:
+    """fetch() before hashes were threaded through (AES256 urls)"""
+    url_info = libernet.url.parse(url)
+    data = libernet.block.aes_decrypt(binary_from_identifier(url_info[1]), data)
+
+    if libernet.block.sha256_data_identifier(data) == url_info[2]:
+        return data
+
+    uncompressed = libernet.codec.decompress(data)
+    assert libernet.block.sha256_data_identifier(uncompressed) == url_info[2]
+    assert libernet.block.sha256_data_identifier(uncompressed) == url_info[2]
+    return uncompressed
+
+
+def run(label: str, function, items: list) -> Profile:
+    """profile function over items"""
+    profile = Profile()
+    originals = (
+        libernet.block.sha256_data_identifier,
+        libernet.block.aes_encrypt,
+        libernet.block.aes_decrypt,
+        libernet.codec.compress,
+        libernet.codec.decompress,
+    )
+    libernet.block.sha256_data_identifier = profile.wrap("hash", originals[0])
+    libernet.block.aes_encrypt = profile.wrap("encrypt", originals[1], 1)
+    libernet.block.aes_decrypt = profile.wrap("decrypt", originals[2], 1)
+    libernet.codec.compress = profile.wrap("compress", originals[3])
+    libernet.codec.decompress = profile.wrap("decompress", originals[4])
+    start = time.perf_counter()
+
+    try:
+        results = [function(i, profile) for i in items]
+
+    finally:
+        (
+            libernet.block.sha256_data_identifier,
+            libernet.block.aes_encrypt,
+            libernet.block.aes_decrypt,
+            libernet.codec.compress,
+            libernet.codec.decompress,
+        ) = originals
+
+    profile.report(label, len(items), time.perf_counter() - start)
+    return results
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=32)
+    args = parser.parse_args()
+    words = [random.randbytes(4).hex() for _ in range(0, 1000)]
+    blocks = [
+        " ".join(
+            random.choice(words) for _ in range(0, MAX_RAW_BLOCK_SIZE // 9)
+        ).encode()[:MAX_RAW_BLOCK_SIZE]
+        for _ in range(0, args.blocks)
+    ]
+
+    with TemporaryDirectory() as working_dir:
+        storage = Storage(working_dir)
+        urls = run(
+            "store",
+            lambda b, p: libernet.block.store(b, TimedStorage(storage, p))[0],
+            blocks,
+        )
+        fetched = run(
+            "fetch",
+            lambda u, p: libernet.block.fetch(u, TimedStorage(storage, p)),
+            urls,
+        )
+        legacy = run(
+            "legacy fetch",
+            lambda u, p: legacy_unpack(
+                u, TimedStorage(storage, p).get(libernet.url.address_of(u))
+            ),
+            urls,
+        )
+        assert fetched == blocks and legacy == blocks
+        assert sha256_data_identifier(blocks[0]) == libernet.url.parse(urls[0])[2]
+
+
+if __name__ == "__main__":
+    main()
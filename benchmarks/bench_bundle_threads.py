@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+""" bundle.create throughput into memory with 1 to --threads file threads
+    files are half random (incompressible) and half text (compressible)
+    --files 1 --size 268435456 measures the blocks of one large file in parallel
+"""
+
+
+import argparse
+import os
+import random
+import time
+
+from tempfile import TemporaryDirectory
+
+import libernet.bundle
+
+
+def make_files(path: str, count: int, size: int):
+    """write count files of size bytes"""
+    for index in range(0, count):
+        with open(os.path.join(path, f"file_{index}.bin"), "wb") as file:
+            if index % 2:
+                file.write(random.randbytes(size))
+            else:
+                file.write((f"line {index} " * (size // 8 + 1)).encode()[:size])
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=32)
+    parser.add_argument("--size", type=int, default=4 * 1024 * 1024)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    total = args.files * args.size / 1024 / 1024
+    counts = sorted({1, 2, 4, 8, args.threads} & set(range(1, args.threads + 1)))
+
+    with TemporaryDirectory() as working_dir:
+        make_files(working_dir, args.files, args.size)
+        urls = set()
+
+        for threads in counts:
+            start = time.perf_counter()
+            urls.add(libernet.bundle.create(working_dir, {}, threads=threads))
+            rate = total / (time.perf_counter() - start)
+            print(f"{threads:3} threads: {rate:8.1f} MiB/second")
+
+    assert len(urls) == 1, "bundle changed with the number of threads"
+
+
+if __name__ == "__main__":
+    main()
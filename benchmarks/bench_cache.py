@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+""" block.fetch of the same blocks again, with and without libernet.cache
+    --latency adds a delay to each storage request to simulate a remote server
+    --cache is the cache size in MiB (blocks beyond it are fetched again)
+"""
+
+
+import argparse
+import random
+import time
+
+import libernet.block
+import libernet.cache
+
+from benchmarks.bench_restore import DelayedStorage
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=32)
+    parser.add_argument("--size", type=int, default=1000000)
+    parser.add_argument("--passes", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=20, help="milliseconds")
+    parser.add_argument("--cache", type=int, default=64, help="MiB")
+    args = parser.parse_args()
+    storage = DelayedStorage(args.latency / 1000)
+    urls = [
+        libernet.block.store(random.randbytes(args.size), storage)[0]
+        for _ in range(0, args.blocks)
+    ]
+    total = args.blocks * args.passes * args.size / 1024 / 1024
+
+    for name, reader in (
+        ("no cache", storage),
+        ("cache", libernet.cache.Storage(storage, args.cache * 1024 * 1024)),
+    ):
+        start = time.perf_counter()
+
+        for _ in range(0, args.passes):
+            for url in urls:
+                assert libernet.block.fetch(url, reader) is not None
+
+        rate = total / (time.perf_counter() - start)
+        stats = reader.stats() if name == "cache" else {}
+        print(f"{name:>8}: {rate:8.1f} MiB/second {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+""" Chunking throughput and how many blocks are reused after editing a file
+    fixed - MAX_RAW_BLOCK_SIZE slices
+    gear - content-defined blocks
+    reused - the fraction of the edited file's bytes in blocks the original had
+"""
+
+
+import argparse
+import io
+import random
+import time
+
+import libernet.chunk
+
+from libernet.bundle import MAX_RAW_BLOCK_SIZE
+
+
+def edit(data: bytes, edits: int) -> bytes:
+    """insert, delete and overwrite a few bytes at random places"""
+    for _ in range(0, edits):
+        offset = random.randrange(0, len(data))
+        change = random.choice(["insert", "delete", "overwrite"])
+
+        if change == "insert":
+            data = data[:offset] + random.randbytes(16) + data[offset:]
+        elif change == "delete":
+            data = data[:offset] + data[offset + 16 :]
+        else:
+            data = data[:offset] + random.randbytes(16) + data[offset + 16 :]
+
+    return data
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=32, help="MiB")
+    parser.add_argument("--edits", type=int, default=8)
+    args = parser.parse_args()
+    original = random.randbytes(args.size * 1024 * 1024)
+    edited = edit(original, args.edits)
+
+    for method in libernet.chunk.METHODS:
+        start = time.perf_counter()
+        blocks = list(
+            libernet.chunk.blocks(io.BytesIO(original), method, MAX_RAW_BLOCK_SIZE)
+        )
+        rate = args.size / (time.perf_counter() - start)
+        known = set(blocks)
+        edited_blocks = libernet.chunk.blocks(
+            io.BytesIO(edited), method, MAX_RAW_BLOCK_SIZE
+        )
+        reused = sum(len(b) for b in edited_blocks if b in known) / len(edited)
+        print(
+            f"{method:>6}: {rate:8.1f} MiB/second {len(blocks):5} blocks"
+            f" (average {len(original) / len(blocks) / 1024:6.1f} KiB)"
+            f" reused {reused * 100:5.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+""" Compress and decompress throughput and ratio of each codec in libernet.codec
+    on compressible blocks (text and sparse blocks from bench_compression)
+"""
+
+
+import argparse
+import time
+
+import libernet.codec
+
+from benchmarks.bench_compression import make_corpus
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=4, help="of each kind")
+    args = parser.parse_args()
+    corpus = [b for i, b in enumerate(make_corpus(args.blocks)) if i % 4 >= 2]
+    total = sum(len(b) for b in corpus)
+
+    for codec in libernet.codec.available():
+        for level in sorted({1, libernet.codec.LEVELS[codec], 9}):
+            start = time.perf_counter()
+            compressed = [libernet.codec.compress(b, codec, level) for b in corpus]
+            compress_rate = total / (time.perf_counter() - start) / 1024 / 1024
+            start = time.perf_counter()
+
+            for block in compressed:
+                libernet.codec.decompress(block)
+
+            decompress_rate = total / (time.perf_counter() - start) / 1024 / 1024
+            ratio = sum(len(b) for b in compressed) / total
+            print(
+                f"{codec:>5} level {level}: compress {compress_rate:8.1f} MiB/second"
+                f" decompress {decompress_rate:8.1f} MiB/second"
+                f" ratio {ratio * 100:5.1f}%"
+            )
+
+
+if __name__ == "__main__":
+    main()
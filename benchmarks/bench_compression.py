@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+""" block.store throughput and compression on a mixed corpus of blocks
+    random (like jpeg/mp4), zlib compressed (like zip), text and sparse blocks
+    always - compress every block (the probe is disabled)
+    probe - only compress blocks where a sample compresses
+"""
+
+
+import argparse
+import random
+import time
+import zlib
+
+import libernet.block
+
+from libernet.bundle import MAX_RAW_BLOCK_SIZE
+
+
+def make_corpus(count: int) -> list:
+    """count blocks of each kind"""
+    size = MAX_RAW_BLOCK_SIZE
+    words = [random.randbytes(4).hex() for _ in range(0, 1000)]
+    corpus = []
+
+    for _ in range(0, count):
+        corpus.append(random.randbytes(size))
+        text = " ".join(random.choice(words) for _ in range(0, size // 4)).encode()
+        corpus.append(zlib.compress(text * 8, 6)[:size])
+        corpus.append(text[:size])
+        sparse = bytearray(size)
+        sparse[::4096] = random.randbytes(len(sparse[::4096]))
+        corpus.append(bytes(sparse))
+
+    return corpus
+
+
+def measure(label: str, corpus: list, level: int):
+    """store the corpus, print the rate and how much was saved"""
+    stats = {}
+    start = time.perf_counter()
+
+    for block in corpus:
+        libernet.block.store(block, {}, level=level, compression=stats)
+
+    duration = time.perf_counter() - start
+    total = sum(len(b) for b in corpus) / 1024 / 1024
+    saved = (stats["compress_input"] - stats["compress_output"]) / 1024 / 1024
+    print(
+        f"{label:>6} level {level}: {total / duration:8.1f} MiB/second"
+        f" compressing {stats['compress_seconds']:6.3f} seconds"
+        f" saved {saved:6.1f} of {total:6.1f} MiB"
+        f" skipped {stats['compress_skipped']:3} blocks"
+    )
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=8, help="of each kind")
+    args = parser.parse_args()
+    corpus = make_corpus(args.blocks)
+    old_ratio = libernet.block.PROBE_RATIO
+    libernet.block.PROBE_RATIO = float("inf")
+    measure("always", corpus, 9)
+    libernet.block.PROBE_RATIO = old_ratio
+
+    for level in (9, 6, 1):
+        measure("probe", corpus, level)
+
+
+if __name__ == "__main__":
+    main()
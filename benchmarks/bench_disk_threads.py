@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+""" disk.Storage operations/second with 1 to 64 threads (3 reads per write)
+"""
+
+
+import argparse
+import random
+import threading
+import time
+
+from tempfile import TemporaryDirectory
+
+from libernet.disk import Storage
+from libernet.hash import sha256_data_identifier
+from libernet.url import for_data_block
+
+
+def worker(storage, blocks: list, operations: int):
+    """read and write random blocks"""
+    for index in range(0, operations):
+        key, data = random.choice(blocks)
+
+        if index % 4 == 0:
+            storage[key] = data
+        else:
+            storage.get(key)
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=2_000)
+    parser.add_argument("--operations", type=int, default=20_000)
+    parser.add_argument("--size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+    blocks = []
+
+    for _ in range(0, args.blocks):
+        data = random.randbytes(random.randrange(1, args.size))
+        blocks.append((for_data_block(sha256_data_identifier(data)), data))
+
+    with TemporaryDirectory() as working_dir:
+        storage = Storage(working_dir)
+
+        for key, data in blocks:
+            storage[key] = data
+
+        for thread_count in (1, 2, 4, 8, 16, 32, 64):
+            each = args.operations // thread_count
+            threads = [
+                threading.Thread(target=worker, args=(storage, blocks, each))
+                for _ in range(0, thread_count)
+            ]
+            start = time.perf_counter()
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            rate = each * thread_count / (time.perf_counter() - start)
+            print(f"{thread_count:3} threads: {rate:10,.0f} operations/second")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+""" Compare identifier_match_score against the original string-of-bits version
+"""
+
+
+import argparse
+import struct
+import time
+
+from libernet.hash import sha256_data_identifier, binary_from_identifier
+from libernet.hash import identifier_match_score, identifier_match_scores
+
+
+def bits_match_score(id1, id2):
+    """the original implementation, walks strings of '0' and '1'"""
+    bits1 = "".join(bin(b).lstrip("0b").zfill(8) for b in binary_from_identifier(id1))
+    bits2 = "".join(bin(b).lstrip("0b").zfill(8) for b in binary_from_identifier(id2))
+    widest = max(len(bits1), len(bits2))
+
+    for index, bit1_2 in enumerate(zip(bits1.zfill(widest), bits2.zfill(widest))):
+        if bit1_2[0] != bit1_2[1]:
+            return index
+
+    return widest
+
+
+def measure(label, function, count):
+    """run function and report the rate"""
+    start = time.perf_counter()
+    results = function()
+    duration = time.perf_counter() - start
+    print(f"{label:>10}: {count / duration:12,.0f} scores/second")
+    return results, duration
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200_000)
+    args = parser.parse_args()
+    target = sha256_data_identifier(b"target")
+    others = [sha256_data_identifier(struct.pack("q", i)) for i in range(args.count)]
+    original, original_time = measure(
+        "bits", lambda: [bits_match_score(target, o) for o in others], args.count
+    )
+    single, single_time = measure(
+        "int", lambda: [identifier_match_score(target, o) for o in others], args.count
+    )
+    batch, batch_time = measure(
+        "batch", lambda: identifier_match_scores(target, others), args.count
+    )
+    assert original == single == batch
+    print(f"speedup: int {original_time / single_time:0.1f}x", end=" ")
+    print(f"batch {original_time / batch_time:0.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+""" Startup time, memory, lookup and nearest (like) rate of the in-memory block index
+    python3 -m benchmarks.bench_index --blocks 10000000
+"""
+
+
+import argparse
+import os
+import resource
+import time
+
+from tempfile import TemporaryDirectory
+
+from libernet.disk import Storage, GROUP_NIBBLES, MAX_LIKE, MIN_LIKE_SCORE
+from libernet.index import BlockIndex, MERGE_SIZE
+from libernet.url import for_data_block
+
+
+def rss_mib() -> float:
+    """maximum resident set size so far (ru_maxrss is KiB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def identifiers_in_order(count: int):
+    """random identifiers in the order a scan of the data directory returns them"""
+    groups = 16**GROUP_NIBBLES
+
+    for group in range(0, groups):
+        per_group = count // groups + (1 if group < count % groups else 0)
+        prefix = f"{group:03x}"
+        yield from sorted(
+            prefix + os.urandom(32).hex()[GROUP_NIBBLES:] for _ in range(per_group)
+        )
+
+
+def lookups(label: str, storage, urls: list):
+    """report the rate of membership checks"""
+    start = time.perf_counter()
+
+    for url in urls:
+        assert url in storage
+
+    rate = len(urls) / (time.perf_counter() - start)
+    print(f"{label:>12}: {rate:12,.0f} lookups/second")
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=1_000_000)
+    parser.add_argument("--files", type=int, default=5_000)
+    parser.add_argument("--likes", type=int, default=1_000)
+    parser.add_argument("--pending", type=int, default=MERGE_SIZE - 1)
+    args = parser.parse_args()
+    before = rss_mib()
+    start = time.perf_counter()
+    index = BlockIndex(identifiers_in_order(args.blocks))
+    duration = time.perf_counter() - start
+    print(f"{len(index):,} identifiers indexed in {duration:0.1f} seconds")
+    print(f"maximum RSS grew {rss_mib() - before:0.1f} MiB to {rss_mib():0.1f} MiB")
+    targets = [os.urandom(32).hex() for _ in range(0, args.likes)]
+
+    for label in ("nearest", f"{args.pending} added"):
+        start = time.perf_counter()
+
+        for target in targets:
+            index.nearest(target, MAX_LIKE, MIN_LIKE_SCORE)
+
+        rate = len(targets) / (time.perf_counter() - start)
+        print(f"{label:>12}: {rate:12,.0f} queries/second")
+        index.update(os.urandom(32).hex() for _ in range(0, args.pending))
+
+    with TemporaryDirectory() as working_dir:
+        storage = Storage(working_dir)
+        urls = [for_data_block(i) for i in identifiers_in_order(args.files)]
+
+        for url in urls:
+            storage[url] = b"x"
+
+        lookups("isfile", storage, urls)
+        lookups("index", Storage(working_dir, index=True), urls)
+
+
+if __name__ == "__main__":
+    main()
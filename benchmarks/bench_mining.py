@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+""" Attempts per second when matching a similar identifier with 1 to N processes
+    (--score must be at least libernet.block.PARALLEL_SCORE to use the processes)
+"""
+
+
+import argparse
+import os
+
+from random import randbytes
+
+import libernet.block
+
+from libernet.hash import sha256_data_identifier
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--score", type=int, default=18)
+    parser.add_argument("--size", type=int, default=4096)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--passphrase", default="Setec Astronomy")
+    args = parser.parse_args()
+    similar = sha256_data_identifier(b"USER:bench@2001-01")
+    data = randbytes(args.size)
+    workers = 1
+
+    while True:
+        stats = {}
+        libernet.block.store(
+            data,
+            {},
+            encrypt=args.passphrase,
+            similar=similar,
+            score=args.score,
+            workers=workers,
+            stats=stats,
+        )
+        print(
+            f"{workers:3} workers: {stats['attempts_per_second']:12,.0f} attempts/second"
+            f" {stats['attempts']:12,} attempts {stats['mining_seconds']:8.3f} seconds"
+        )
+
+        if workers >= args.workers:
+            break
+
+        workers = min(workers * 2, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+""" Latency of proxy.Storage reads interleaved with writes to a local server
+    (like bundle.create checking for blocks while uploading new ones)
+    recent - blocks just written, still waiting to be sent
+    stored - blocks already on the server
+    --latency adds a delay to each request to simulate a remote server
+"""
+
+
+import argparse
+import logging
+import random
+import threading
+import time
+
+from tempfile import TemporaryDirectory
+
+import werkzeug.serving
+
+import libernet.message
+import libernet.proxy
+import libernet.server
+
+from libernet.disk import Storage
+from libernet.hash import sha256_data_identifier
+from libernet.url import for_data_block
+from benchmarks.bench_proxy_upload import delayed
+
+
+def make_blocks(count: int, size: int) -> list:
+    """random blocks and their urls"""
+    blocks = []
+
+    for _ in range(0, count):
+        data = random.randbytes(size)
+        blocks.append((for_data_block(sha256_data_identifier(data)), data))
+
+    return blocks
+
+
+def report(label: str, latencies: list):
+    """print the mean and 99th percentile latency"""
+    latencies.sort()
+    mean = sum(latencies) / len(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{label:>6}: read mean {mean:8.3f} ms p99 {p99:8.3f} ms")
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=128)
+    parser.add_argument("--size", type=int, default=1024 * 1024)
+    parser.add_argument("--port", type=int, default=8045)
+    parser.add_argument("--latency", type=float, default=20, help="milliseconds")
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    stored = make_blocks(args.blocks, args.size)
+    recent = make_blocks(args.blocks, args.size)
+
+    with TemporaryDirectory() as working_dir:
+        storage = Storage(working_dir)
+
+        for key, data in stored:
+            storage[key] = data
+
+        app = libernet.server.create_app(storage, libernet.message.Center())
+        server = werkzeug.serving.make_server(
+            "localhost", args.port, delayed(app, args.latency / 1000), threaded=True
+        )
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        proxy = libernet.proxy.Storage("localhost", args.port)
+        latencies = {"recent": [], "stored": []}
+
+        for (recent_key, data), (stored_key, _) in zip(recent, stored):
+            proxy[recent_key] = data
+
+            for label, key in (("recent", recent_key), ("stored", stored_key)):
+                start = time.perf_counter()
+                assert key in proxy
+                latencies[label].append(time.perf_counter() - start)
+
+        proxy.shutdown()
+        proxy.join()
+        server.shutdown()
+        thread.join()
+
+    for label, measured in latencies.items():
+        report(label, measured)
+
+
+if __name__ == "__main__":
+    main()
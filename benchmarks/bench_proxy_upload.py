@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+""" Upload throughput through proxy.Storage to a local server
+    with 1, 4 and 16 concurrent PUT requests
+    --latency adds a delay to each request to simulate a remote server
+"""
+
+
+import argparse
+import logging
+import random
+import threading
+import time
+
+from tempfile import TemporaryDirectory
+
+import werkzeug.serving
+
+import libernet.message
+import libernet.proxy
+import libernet.server
+
+from libernet.disk import Storage
+from libernet.hash import sha256_data_identifier
+from libernet.url import for_data_block
+
+
+def delayed(app, seconds: float):
+    """wsgi app that waits before handling each request"""
+
+    def handle(environ, start_response):
+        time.sleep(seconds)
+        return app(environ, start_response)
+
+    return handle
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=256)
+    parser.add_argument("--size", type=int, default=1024 * 1024)
+    parser.add_argument("--port", type=int, default=8044)
+    parser.add_argument("--latency", type=float, default=20, help="milliseconds")
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    blocks = []
+
+    for _ in range(0, args.blocks):
+        data = random.randbytes(args.size)
+        blocks.append((for_data_block(sha256_data_identifier(data)), data))
+
+    for uploaders in (1, 4, 16):
+        with TemporaryDirectory() as working_dir:
+            app = libernet.server.create_app(
+                Storage(working_dir), libernet.message.Center()
+            )
+            server = werkzeug.serving.make_server(
+                "localhost",
+                args.port,
+                delayed(app, args.latency / 1000),
+                threaded=True,
+            )
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            proxy = libernet.proxy.Storage("localhost", args.port, uploaders)
+            start = time.perf_counter()
+
+            for key, data in blocks:
+                proxy[key] = data
+
+            proxy.shutdown()
+            proxy.join()
+            duration = time.perf_counter() - start
+            server.shutdown()
+            thread.join()
+            rate = args.blocks * args.size / duration / 1024 / 1024
+            print(f"{uploaders:3} uploaders: {rate:8.1f} MiB/second")
+
+
+if __name__ == "__main__":
+    main()
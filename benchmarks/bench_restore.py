@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+""" bundle.restore throughput with 1 to 16 threads fetching and writing blocks
+    --latency adds a delay to each storage request to simulate a remote server
+    --copies writes each file that many times (blocks shared by files are
+        fetched once)
+"""
+
+
+import argparse
+import os
+import random
+import time
+
+from tempfile import TemporaryDirectory
+
+import libernet.bundle
+
+
+class DelayedStorage:
+    """dict storage that waits before answering each request"""
+
+    def __init__(self, seconds: float):
+        self.__blocks = {}
+        self.__seconds = seconds
+
+    def __setitem__(self, key: str, value: bytes):
+        self.__blocks[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__blocks
+
+    def get(self, key: str, default: bytes = None) -> bytes:
+        """get one block"""
+        time.sleep(self.__seconds)
+        return self.__blocks.get(key, default)
+
+    def get_many(self, keys: list) -> list:
+        """get a batch of blocks in one request"""
+        time.sleep(self.__seconds)
+        return [self.__blocks.get(k, None) for k in keys]
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--size", type=int, default=8 * 1024 * 1024)
+    parser.add_argument("--latency", type=float, default=20, help="milliseconds")
+    parser.add_argument("--copies", type=int, default=1)
+    args = parser.parse_args()
+    storage = DelayedStorage(args.latency / 1000)
+    total = args.files * args.copies * args.size / 1024 / 1024
+
+    with TemporaryDirectory() as working_dir:
+        source = os.path.join(working_dir, "source")
+        os.makedirs(source)
+
+        for index in range(0, args.files):
+            data = random.randbytes(args.size)
+
+            for copy in range(0, args.copies):
+                with open(
+                    os.path.join(source, f"file_{index}_{copy}.bin"), "wb"
+                ) as file:
+                    file.write(data)
+
+        url = libernet.bundle.create(source, storage)
+
+        for threads in (1, 4, 16):
+            start = time.perf_counter()
+            target = os.path.join(working_dir, f"restored_{threads}")
+            stats = {}
+            assert not libernet.bundle.restore(
+                url, target, storage, threads=threads, stats=stats
+            )
+            rate = total / (time.perf_counter() - start)
+            print(
+                f"{threads:3} threads: {rate:8.1f} MiB/second"
+                f" {stats['restore_bytes_saved'] / 1024 / 1024:8.1f} MiB not fetched"
+            )
+
+
+if __name__ == "__main__":
+    main()
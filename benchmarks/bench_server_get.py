@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+""" Throughput and memory of concurrent 1 MiB block GETs from the server
+    stream - blocks are streamed from the file (Storage.open)
+    copy - blocks are read into memory first (Storage.get)
+"""
+
+
+import argparse
+import io
+import logging
+import random
+import threading
+import time
+import tracemalloc
+
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
+
+import requests
+import werkzeug.serving
+
+import libernet.message
+import libernet.server
+
+from libernet.disk import Storage
+from libernet.hash import sha256_data_identifier
+from libernet.url import for_data_block
+
+
+class CopyingStorage:
+    """reads the whole block into memory, like the server used to"""
+
+    def __init__(self, storage):
+        self.__storage = storage
+
+    def open(self, key: str):
+        """read the block and wrap it in a file object"""
+        contents = self.__storage.get(key)
+        return None if contents is None else (io.BytesIO(contents), len(contents))
+
+
+def client(base_url: str, keys: list, requests_each: int) -> int:
+    """GET random blocks, returns bytes received"""
+    received = 0
+
+    with requests.Session() as session:
+        for key in random.choices(keys, k=requests_each):
+            with session.get(base_url + key, stream=True) as response:
+                assert response.status_code == 200, response.status_code
+
+                for chunk in response.iter_content(64 * 1024):
+                    received += len(chunk)
+
+    return received
+
+
+def measure(label: str, storage, keys: list, args):
+    """serve storage and GET from it with args.clients concurrent clients"""
+    app = libernet.server.create_app(storage, libernet.message.Center())
+    server = werkzeug.serving.make_server("localhost", args.port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(args.clients) as pool:
+        futures = [
+            pool.submit(client, f"http://localhost:{args.port}", keys, args.requests)
+            for _ in range(0, args.clients)
+        ]
+        received = sum(f.result() for f in futures)
+
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    server.shutdown()
+    thread.join()
+    print(
+        f"{label:>6}: {received / duration / 1024 / 1024:8.1f} MiB/second"
+        f" peak traced memory {peak / 1024 / 1024:6.1f} MiB"
+    )
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8043)
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    with TemporaryDirectory() as working_dir:
+        storage = Storage(working_dir)
+        keys = []
+
+        for _ in range(0, args.blocks):
+            data = random.randbytes(1024 * 1024)
+            keys.append(for_data_block(sha256_data_identifier(data)))
+            storage[keys[-1]] = data
+
+        measure("copy", CopyingStorage(storage), keys, args)
+        measure("stream", storage, keys, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+""" Backing up an unchanged tree again, inflating the previous backup
+    from storage vs loading it from a libernet.stat_cache file
+    --files 1000000 for a 1M file tree (the first backup takes a while)
+    --latency adds a delay to each storage request to simulate a remote server
+"""
+
+
+import argparse
+import os
+import time
+
+from tempfile import TemporaryDirectory
+
+import libernet.bundle
+import libernet.stat_cache
+
+from benchmarks.bench_restore import DelayedStorage
+
+
+def make_tree(source: str, files: int, per_directory: int):
+    """create small files, per_directory of them in each directory"""
+    for index in range(0, files):
+        directory = os.path.join(source, f"dir_{index // per_directory}")
+        os.makedirs(directory, exist_ok=True)
+
+        with open(
+            os.path.join(directory, f"file_{index}.txt"), "w", encoding="utf-8"
+        ) as file:
+            file.write(f"file #{index}")
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--per-directory", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=20, help="milliseconds")
+    args = parser.parse_args()
+    storage = DelayedStorage(args.latency / 1000)
+
+    with TemporaryDirectory() as working_dir:
+        source = os.path.join(working_dir, "source")
+        make_tree(source, args.files, args.per_directory)
+        start = time.perf_counter()
+        files = {}
+        url = libernet.bundle.create(source, storage, files=files)
+        print(f"first backup: {time.perf_counter() - start:8.3f} seconds")
+        cache = libernet.stat_cache.StatCache(os.path.join(working_dir, "stat.json"))
+        cache.save(url, files)
+        size = os.path.getsize(os.path.join(working_dir, "stat.json")) / 1024 / 1024
+
+        for name, load in (
+            ("inflate", lambda: libernet.bundle.inflate(url, storage)),
+            (f"stat cache ({size:0.1f} MiB)", lambda: cache.load(url)),
+        ):
+            start = time.perf_counter()
+            previous = load()
+            loaded = time.perf_counter()
+            assert libernet.bundle.create(source, storage, previous) == url
+            end = time.perf_counter()
+            print(
+                f"{name:>24}: {loaded - start:8.3f} seconds loading"
+                f" {end - loaded:8.3f} seconds scanning"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+""" Compare writes/second and read latency of the block storage backends
+"""
+
+
+import argparse
+import random
+import time
+
+from tempfile import TemporaryDirectory
+
+import libernet.disk
+import libernet.pack
+
+from libernet.hash import sha256_data_identifier
+from libernet.url import for_data_block
+
+
+def make_blocks(count: int, max_size: int) -> list:
+    """mostly small blocks (bundles, tails of files) with some full blocks"""
+    blocks = []
+
+    for index in range(0, count):
+        size = max_size if index % 8 == 0 else random.randrange(64, 8192)
+        data = random.randbytes(size)
+        blocks.append((for_data_block(sha256_data_identifier(data)), data))
+
+    return blocks
+
+
+def measure(label: str, storage, blocks: list, reads: int):
+    """time writes and random reads"""
+    start = time.perf_counter()
+
+    for key, data in blocks:
+        storage[key] = data
+
+    write_rate = len(blocks) / (time.perf_counter() - start)
+    latencies = []
+
+    for key, _ in random.choices(blocks, k=reads):
+        start = time.perf_counter()
+        assert storage.get(key) is not None
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    mean = sum(latencies) / len(latencies) * 1_000_000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1_000_000
+    print(
+        f"{label:>5}: {write_rate:10,.0f} writes/second"
+        f" read mean {mean:7.1f} us p99 {p99:7.1f} us"
+    )
+
+
+def main():
+    """run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=5_000)
+    parser.add_argument("--reads", type=int, default=5_000)
+    parser.add_argument("--max-size", type=int, default=1024 * 1024)
+    args = parser.parse_args()
+    blocks = make_blocks(args.blocks, args.max_size)
+
+    with TemporaryDirectory() as working_dir:
+        measure("disk", libernet.disk.Storage(working_dir), blocks, args.reads)
+
+    with TemporaryDirectory() as working_dir:
+        storage = libernet.pack.Storage(working_dir)
+        measure("pack", storage, blocks, args.reads)
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+
+""" Acts as a block storage but uses a Libernet server as the storage (asyncio)
+
+Requests are made over a pool of keep-alive HTTP/1.1 connections,
+    so many blocks can be transferred at once without a thread per request.
+The async methods (aget, aput, acontains, alike, ...) can be awaited from any
+    event loop (each loop gets its own pool of connections).
+The dict-like methods run the async methods on a background event loop.
+    Setting an item returns once the upload has started, see flush().
+"""
+
+
+import asyncio
+import concurrent.futures
+import io
+import json
+import logging
+import threading
+
+import libernet.url
+import libernet.batch
+
+
+CONNECTIONS = 16  # keep-alive connections per event loop
+MAX_UPLOADS = 64  # blocks being sent before __setitem__ blocks
+
+
+class ConnectionPool:
+    """Keep-alive connections to a server for one event loop"""
+
+    def __init__(self, host: str, port: int, size: int):
+        self.__host = host
+        self.__port = port
+        self.__idle = []  # (reader, writer)
+        self.__slots = asyncio.Semaphore(size)
+
+    async def acquire(self) -> ((asyncio.StreamReader, asyncio.StreamWriter), bool):
+        """get a connection, returns the connection and if it has been used before"""
+        await self.__slots.acquire()
+
+        if self.__idle:
+            return self.__idle.pop(), True
+
+        try:
+            return await asyncio.open_connection(self.__host, self.__port), False
+
+        except BaseException:
+            self.__slots.release()
+            raise
+
+    def release(self, connection, keep: bool):
+        """return a connection to the pool (or close it if it can't be reused)"""
+        if keep:
+            self.__idle.append(connection)
+        else:
+            connection[1].close()
+
+        self.__slots.release()
+
+    def close(self):
+        """close the idle connections"""
+        while self.__idle:
+            self.__idle.pop()[1].close()
+
+
+async def __read_body(reader: asyncio.StreamReader, headers: dict) -> (bytes, bool):
+    """read the body of a response, returns the body and if the connection can be reused"""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+
+            if size == 0:
+                break
+
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()  # end of chunk
+
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass  # trailers
+
+        return b"".join(chunks), True
+
+    if "content-length" in headers:
+        return await reader.readexactly(int(headers["content-length"])), True
+
+    return await reader.read(), False  # the body ends when the connection closes
+
+
+async def __read_head(reader: asyncio.StreamReader, host: str) -> (bytes, int, dict):
+    """read the status line and headers, returns the version, status and headers"""
+    status_line = await reader.readline()
+
+    if not status_line:
+        raise ConnectionResetError(f"{host} closed the connection")
+
+    version, status = status_line.split()[:2]
+    headers = {}
+
+    while True:
+        line = await reader.readline()
+
+        if line in (b"\r\n", b"\n", b""):
+            break
+
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    return version, int(status), headers
+
+
+async def exchange(connection, host: str, method: str, path: str, body: bytes = None):
+    """send a request and read the response on a connection
+    returns the status, the body, and if the connection can be reused
+    """
+    reader, writer = connection
+    request = [f"{method} {path} HTTP/1.1", f"Host: {host}"]
+
+    if body is not None:
+        request.append(f"Content-Length: {len(body)}")
+
+    writer.write(("\r\n".join(request) + "\r\n\r\n").encode("latin-1"))
+
+    if body:
+        writer.write(body)
+
+    await writer.drain()
+    version, status, headers = await __read_head(reader, host)
+    keep = version == b"HTTP/1.1" and headers.get("connection", "") != "close"
+
+    if method == "HEAD" or status in (204, 304):
+        return status, b"", keep
+
+    response, reusable = await __read_body(reader, headers)
+    return status, response, keep and reusable
+
+
+class Storage:  # pylint: disable=too-many-instance-attributes
+    """Proxy storage class to remote server using asyncio
+    connections - the number of connections to use at once for each event loop
+    max_uploads - the number of blocks being sent before __setitem__ blocks
+    """
+
+    def __init__(
+        self, server: str, port: int, connections=CONNECTIONS, max_uploads=MAX_UPLOADS
+    ):
+        self.__server = server
+        self.__port = port
+        self.__connections = connections
+        self.__running = True
+        self.__lock = threading.Lock()
+        self.__pools = {}  # event loop -> ConnectionPool
+        self.__pending = {}  # key -> [times queued, data] for __setitem__ uploads
+        self.__uploads = set()  # futures for __setitem__ uploads
+        self.__window = threading.Semaphore(max_uploads)
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, daemon=True)
+        self.__thread.start()
+
+    def __pool(self) -> ConnectionPool:
+        """the connection pool for the running event loop"""
+        loop = asyncio.get_running_loop()
+
+        with self.__lock:
+            pool = self.__pools.get(loop, None)
+
+            if pool is None:
+                pool = ConnectionPool(self.__server, self.__port, self.__connections)
+                self.__pools[loop] = pool
+
+        return pool
+
+    async def __request(self, method: str, path: str, body: bytes = None):
+        """returns the status and body of the response"""
+        pool = self.__pool()
+        host = f"{self.__server}:{self.__port}"
+
+        while True:
+            connection, reused = await pool.acquire()
+
+            try:
+                status, response, keep = await exchange(
+                    connection, host, method, path, body
+                )
+
+            except (ConnectionError, asyncio.IncompleteReadError):
+                pool.release(connection, keep=False)
+
+                if reused:  # the server may have closed an idle connection
+                    continue
+
+                raise
+
+            except BaseException:
+                pool.release(connection, keep=False)
+                raise
+
+            pool.release(connection, keep)
+            return status, response
+
+    def __get_pending(self, key: str) -> bytes:
+        with self.__lock:
+            pending = self.__pending.get(key, None)
+
+        return None if pending is None else pending[1]
+
+    async def aget(self, key: str, default: bytes = None) -> bytes:
+        """Get data being sent or request the data from the server"""
+        pending = self.__get_pending(key)
+
+        if pending is not None:
+            return pending
+
+        status, response = await self.__request("GET", key)
+        return response if status == 200 else default
+
+    async def aput(self, key: str, value: bytes):
+        """Send data to the server"""
+        logging.info("Sending %d bytes of data to %s", len(value), key)
+        status, response = await self.__request("PUT", key, value)
+
+        if status != 200:
+            logging.warning(
+                "Sending %d bytes of data to %s -> %d: %s",
+                len(value),
+                key,
+                status,
+                response,
+            )
+
+    async def acontains(self, key: str) -> bool:
+        """Does the block exist in the server (or is it being sent)"""
+        if self.__get_pending(key) is not None:
+            return True
+
+        status, _ = await self.__request("HEAD", key)
+        return status == 200
+
+    async def alike(self, key: str) -> dict:
+        """gets a list of keys that are best-matches to given key"""
+        identifier, _, _, _ = libernet.url.parse(key)
+        status, response = await self.__request(
+            "GET", libernet.url.for_data_block(identifier, like=True)
+        )
+        return json.loads(response.decode("utf-8")) if status == 200 else {}
+
+    def __batches(self, keys: list) -> list:
+        """split keys into batches to request at once over the connections"""
+        size = -(-len(keys) // self.__connections)  # round up
+        size = max(1, min(size, libernet.batch.MAX_BATCH))
+        return [keys[s : s + size] for s in range(0, len(keys), size)]
+
+    async def aget_many(self, keys: list) -> list:
+        """Get many blocks at once, returns the data for each key (None if not found)"""
+        found = await asyncio.gather(
+            *[self.__get_batch(b) for b in self.__batches(keys)]
+        )
+        return [d for b in found for d in b]
+
+    async def __get_batch(self, keys: list) -> list:
+        results = [self.__get_pending(k) for k in keys]
+        needed = [k for k, r in zip(keys, results) if r is None]
+
+        if not needed:
+            return results
+
+        identifiers = [libernet.url.parse(k)[0] for k in needed]
+        status, response = await self.__request(
+            "POST",
+            f"/{libernet.url.SHA256}/many",
+            libernet.batch.pack_identifiers(identifiers),
+        )
+        found = iter(
+            libernet.batch.read_frames(io.BytesIO(response), len(needed))
+            if status == 200
+            else [None] * len(needed)
+        )
+        return [next(found) if r is None else r for r in results]
+
+    async def acontains_many(self, keys: list) -> list:
+        """Check for many blocks, returns if each key exists"""
+        found = await asyncio.gather(
+            *[self.__contains_batch(b) for b in self.__batches(keys)]
+        )
+        return [e for b in found for e in b]
+
+    async def __contains_batch(self, keys: list) -> list:
+        identifiers = [libernet.url.parse(k)[0] for k in keys]
+        pending = [self.__get_pending(k) is not None for k in keys]
+        status, response = await self.__request(
+            "POST",
+            f"/{libernet.url.SHA256}/exists",
+            libernet.batch.pack_identifiers(identifiers),
+        )
+
+        if status != 200:
+            return pending
+
+        exists = libernet.batch.unpack_bitmap(response, len(keys))
+        return [p or e for p, e in zip(pending, exists)]
+
+    async def aclose(self):
+        """close the idle connections for the running event loop"""
+        with self.__lock:
+            pool = self.__pools.pop(asyncio.get_running_loop(), None)
+
+        if pool is not None:
+            pool.close()
+
+    def __run(self, coroutine):
+        """run a coroutine on the background event loop and wait for the result"""
+        assert self.__running, "Proxy has been shutdown()"
+        return asyncio.run_coroutine_threadsafe(coroutine, self.__loop).result()
+
+    def __sent(self, key: str, future: concurrent.futures.Future):
+        with self.__lock:
+            pending = self.__pending[key]
+            pending[0] -= 1
+
+            if pending[0] == 0:
+                del self.__pending[key]
+
+            self.__uploads.discard(future)
+
+        self.__window.release()
+
+        if future.exception() is not None:
+            logging.warning("Sending data to %s -> %s", key, future.exception())
+
+    def __setitem__(self, key: str, value: bytes):
+        """Starts sending data, blocks while max_uploads are being sent"""
+        assert self.__running, "Proxy has been shutdown()"
+        self.__window.acquire()  # pylint: disable=consider-using-with
+
+        with self.__lock:
+            self.__pending.setdefault(key, [0, value])[0] += 1
+            future = asyncio.run_coroutine_threadsafe(
+                self.aput(key, value), self.__loop
+            )
+            self.__uploads.add(future)
+
+        future.add_done_callback(lambda f: self.__sent(key, f))
+
+    def get(self, key: str, default: bytes = None) -> bytes:
+        """Get data being sent or request the data from the server"""
+        return self.__run(self.aget(key, default))
+
+    def get_many(self, keys: list) -> list:
+        """Get many blocks at once, returns the data for each key (None if not found)"""
+        return self.__run(self.aget_many(keys))
+
+    def contains_many(self, keys: list) -> list:
+        """Check for many blocks, returns if each key exists"""
+        return self.__run(self.acontains_many(keys))
+
+    def like(self, key: str) -> dict:
+        """gets a list of keys that are best-matches to given key"""
+        return self.__run(self.alike(key))
+
+    def __getitem__(self, key: str) -> bytes:
+        """Just calls get() to get data from the server"""
+        result = self.get(key)
+
+        if result is None:
+            raise KeyError(f"{key} not found on {self.__server}:{self.__port}")
+
+        return result
+
+    def __contains__(self, key: str) -> bool:
+        """Does the block exist in the server (or is it being sent)"""
+        return self.__run(self.acontains(key))
+
+    def flush(self):
+        """wait for everything set to be sent"""
+        with self.__lock:
+            uploads = list(self.__uploads)
+
+        concurrent.futures.wait(uploads)
+
+    def shutdown(self):
+        """send everything set, then close connections and stop the event loop"""
+        if not self.__running:
+            return
+
+        self.flush()
+        self.__run(self.aclose())
+        self.__running = False
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join()
+        self.__loop.close()
@@ -7,6 +7,7 @@
 
 import os
 import json
+import logging
 import argparse
 import time
 import zlib
@@ -22,15 +23,20 @@ import requests
 import libernet.proxy
 import libernet.bundle
 import libernet.block
+import libernet.cache
+import libernet.chunk
+import libernet.codec
 import libernet.message
 import libernet.disk
+import libernet.known
+import libernet.stat_cache
 
 from libernet.server import DEFAULT_PORT, SETTINGS_NAME, DEFAULT_STORAGE
 from libernet.server import load_settings_file, save_settings_file, check_arg
-from libernet.hash import sha256_data_identifier, identifier_match_score
+from libernet.hash import sha256_data_identifier, identifier_match_scores
 from libernet.bundle import create_timestamp
-from libernet.block import MATCH, COMPRESS_LEVEL
-from libernet.url import for_data_block
+from libernet.block import MATCH, COMPRESS_LEVEL, MINING_WORKERS
+from libernet.url import for_data_block, address_of
 
 
 DEFAULT_SERVER = "localhost"
@@ -45,6 +51,9 @@ ONE_MONTH_IN_SECONDS = 365 * 24 * 60 * 60 / 12
 USER_INPUT = input
 PASSWORD_INPUT = getpass
 PROGRESS_UPDATE_PERIOD_IN_SECONDS = 0.500  # 500 milliseconds
+SPILL_DIR = "spill"  # in --storage, blocks waiting to be sent with --spill
+KNOWN_DIR = "known"  # in --storage, blocks known to be on each server
+STAT_DIR = "stat"  # in --storage, the files of the last backup of each source
 
 # Settings keys
 SERVER = "server"
@@ -228,13 +237,8 @@ def target_match_score(similar_identifier: str, proxy) -> int:
     if len(existing) < libernet.disk.MAX_LIKE:
         return MATCH
 
-    return (
-        min(
-            identifier_match_score(libernet.url.parse(i)[0], similar_identifier)
-            for i in existing
-        )
-        + 1
-    )
+    existing_identifiers = [libernet.url.parse(i)[0] for i in existing]
+    return min(identifier_match_scores(similar_identifier, existing_identifiers)) + 1
 
 
 def __save_backup(args, settings: dict, proxy):
@@ -245,8 +249,21 @@ def __save_backup(args, settings: dict, proxy):
     )  # password, so no natural compression
     similar = get_similar_identifier(args)
     score = target_match_score(similar, proxy)
+    stats = {}
     libernet.block.store(
-        compressed, proxy, encrypt=args.passphrase, similar=similar, score=score
+        compressed,
+        proxy,
+        encrypt=args.passphrase,
+        similar=similar,
+        score=score,
+        workers=MINING_WORKERS,
+        stats=stats,
+    )
+    logging.info(
+        "Matched %d bits in %d attempts (%0.0f attempts/second)",
+        score,
+        stats["attempts"],
+        stats.get("attempts_per_second", 0),
     )
 
 
@@ -265,6 +282,49 @@ def __list(settings: dict, args):
             print(f"{path}")  # TODO: print backup timestamp  # pylint: disable=fixme
 
 
+def __warm(proxy, previous: dict):
+    """find which blocks from the previous backup are still on the server
+    only when none are known yet (the first backup here, or after --reset-known)
+    """
+    known_blocks = getattr(proxy, "known_blocks", None)
+
+    if previous is None or known_blocks is None or known_blocks() != 0:
+        return
+
+    proxy.warm(
+        [
+            address_of(b[libernet.bundle.URL])
+            for f in previous[libernet.bundle.FILES].values()
+            for b in f.get(libernet.bundle.CONTENTS) or []
+        ]
+    )
+
+
+def __print_compression(stats: dict):
+    """summarize the compression statistics from bundle.create()"""
+    if not stats.get("compress_input", 0):
+        return
+
+    saved = stats["compress_input"] - stats["compress_output"]
+    print(
+        f"compression: saved {saved / 1024 / 1024:0.1f} of"
+        f" {stats['compress_input'] / 1024 / 1024:0.1f} MiB"
+        f" in {stats['compress_seconds']:0.3f} seconds"
+        f" ({stats['compress_skipped']} incompressible blocks skipped)"
+    )
+
+
+def __stat_cache(args, source: str) -> libernet.stat_cache.StatCache:
+    """the files of the last backup of source, kept in --storage (if known)"""
+    if getattr(args, "storage", None) is None:
+        return None
+
+    name = sha256_data_identifier(f"{args.server}:{args.port}:{source}".encode())
+    return libernet.stat_cache.StatCache(
+        os.path.join(args.storage, STAT_DIR, f"{args.machine}_{name}.json")
+    )
+
+
 def __backup(settings: dict, proxy, args, message_center) -> bool:
     sources = settings.get(BACKUP, {}).get(args.machine, {})
     changed = False
@@ -277,14 +337,37 @@ def __backup(settings: dict, proxy, args, message_center) -> bool:
             continue
 
         previous_url = sources[source]["url"] if sources[source] else None
+        stat_cache = __stat_cache(args, source)
         previous = (
-            libernet.bundle.inflate(previous_url, proxy) if previous_url else None
+            stat_cache.load(previous_url) if stat_cache and previous_url else None
         )
+
+        if previous is None and previous_url:
+            previous = libernet.bundle.inflate(previous_url, proxy)
+
+        __warm(proxy, previous)
         start = time.perf_counter()
+        stats = {}
+        files = {}
         url = libernet.bundle.create(
-            source, proxy, previous, prior=previous_url, messages=message_center
+            source,
+            proxy,
+            previous,
+            prior=previous_url,
+            messages=message_center,
+            chunking=getattr(args, "chunking", None) or libernet.chunk.FIXED,
+            threads=getattr(args, "threads", None),
+            level=getattr(args, "level", None),
+            codec=getattr(args, "codec", None) or libernet.codec.ZLIB,
+            stats=stats,
+            files=files,
         )
         print(f"duration: {time.perf_counter() - start:0.3f} seconds for {source}")
+
+        if stat_cache:
+            stat_cache.save(url, files)
+
+        __print_compression(stats)
         sources[source] = {"url": url, TIMESTAMP: create_timestamp()}
         changed = True
 
@@ -335,12 +418,19 @@ def __restore(settings: dict, proxy, args, message_center):
             print(f"ERROR: not backed up yet: {source}")
             continue
 
-        missing = libernet.bundle.restore(source_url, destination, proxy)
+        stats = {}
+        missing = libernet.bundle.restore(source_url, destination, proxy, stats=stats)
 
         if missing:
             print("ERROR: The following blocks are missing:")
             print("\t" + "\n\t".join(missing))
 
+        elif stats.get("restore_bytes_saved", 0):
+            print(
+                f"restore: {stats['restore_bytes_saved'] / 1024 / 1024:0.1f} MiB"
+                " of duplicate blocks not fetched again"
+            )
+
 
 def __progress(message_center):
     channel = message_center.new_channel()
@@ -398,9 +488,32 @@ def __progress(message_center):
     sys.stderr.write("\n" if need_newline else "")
 
 
+def __create_proxy(args):
+    """connect to the server, spilling blocks waiting to be sent to disk if --spill
+    and keeping --cache MiB of blocks read in memory
+    """
+    spill = None
+    known_path = os.path.join(args.storage, KNOWN_DIR, f"{args.server}_{args.port}.bin")
+
+    if getattr(args, "spill", False):
+        spill = libernet.disk.Storage(os.path.join(args.storage, SPILL_DIR))
+
+    known = libernet.known.KnownBlocks(known_path)
+
+    if getattr(args, "reset_known", False):  # the server lost blocks or was replaced
+        known.clear()
+
+    proxy = libernet.proxy.Storage(args.server, args.port, spill=spill, known=known)
+
+    if getattr(args, "cache", 0):
+        return libernet.cache.Storage(proxy, args.cache * 1024 * 1024)
+
+    return proxy
+
+
 def main(args, proxy=None):
     """main backup entry point"""
-    proxy = libernet.proxy.Storage(args.server, args.port) if proxy is None else proxy
+    proxy = __create_proxy(args) if proxy is None else proxy
     message_center = libernet.message.Center()
 
     try:
@@ -675,6 +788,45 @@ def get_arg_parser():
         action="store_true",
         help="Store Account username/passphrase in keychain (if not there)",
     )
+    parser.add_argument(
+        "--spill",
+        action="store_true",
+        help="Queue blocks on disk instead of waiting when the server is slow",
+    )
+    parser.add_argument(
+        "--reset-known",
+        action="store_true",
+        help="Forget which blocks the server is known to have, check them again",
+    )
+    parser.add_argument(
+        "--chunking",
+        choices=libernet.chunk.METHODS,
+        default=libernet.chunk.FIXED,
+        help="How files are split into blocks (gear: content-defined, slower)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=libernet.bundle.FILE_THREADS,
+        help="Files to store at once (default: one per core)",
+    )
+    parser.add_argument(
+        "--level",
+        type=int,
+        help="Compression level, 0 to not compress (default depends on --codec)",
+    )
+    parser.add_argument(
+        "--codec",
+        choices=libernet.codec.available(),
+        default=libernet.codec.ZLIB,
+        help=f"How to compress blocks (default {libernet.codec.ZLIB})",
+    )
+    parser.add_argument(
+        "--cache",
+        type=int,
+        default=0,
+        help="MiB of blocks read from the server to keep in memory (default 0)",
+    )
     parser.add_argument("action", help="add, remove, list, backup, restore")
     return parser
 
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+""" Formats for requesting many blocks in one request
+
+request body - binary identifiers (32 bytes each), at most MAX_BATCH of them
+POST /sha256/many - for each identifier, in order:
+    size of the block (4 bytes, big endian) then the block data
+    a size of MISSING (with no data) means the block was not found
+POST /sha256/exists - a bitmap, bit 0 is the high bit of the first byte
+    a bit is set if the block with that identifier was found
+"""
+
+
+import struct
+
+from libernet.hash import binary_from_identifier
+
+
+MAX_BATCH = 1024
+MISSING = 0xFFFFFFFF
+FRAME_HEADER = struct.Struct(">I")  # size of block or MISSING
+BINARY_IDENTIFIER_SIZE = 32
+
+
+def pack_identifiers(identifiers: list) -> bytes:
+    """the request body for a list of (hex) identifiers"""
+    assert len(identifiers) <= MAX_BATCH, len(identifiers)
+    return b"".join(binary_from_identifier(i) for i in identifiers)
+
+
+def unpack_identifiers(body: bytes) -> list:
+    """the (hex) identifiers in a request body or None if the body is not valid"""
+    count, extra = divmod(len(body), BINARY_IDENTIFIER_SIZE)
+
+    if extra or count > MAX_BATCH:
+        return None
+
+    return [
+        body[i : i + BINARY_IDENTIFIER_SIZE].hex()
+        for i in range(0, len(body), BINARY_IDENTIFIER_SIZE)
+    ]
+
+
+def frame_header(size: int = None) -> bytes:
+    """the header before a block of size bytes (None if the block is missing)"""
+    return FRAME_HEADER.pack(MISSING if size is None else size)
+
+
+def read_frames(source, count: int):
+    """yields the data (or None if missing) for count blocks read from a file"""
+    for _ in range(0, count):
+        (size,) = FRAME_HEADER.unpack(__read_exactly(source, FRAME_HEADER.size))
+        yield None if size == MISSING else __read_exactly(source, size)
+
+
+def __read_exactly(source, size: int) -> bytes:
+    data = source.read(size)
+
+    while len(data) < size:
+        more = source.read(size - len(data))
+
+        if not more:
+            raise EOFError(f"expected {size} bytes, got {len(data)}")
+
+        data += more
+
+    return data
+
+
+def pack_bitmap(flags: list) -> bytes:
+    """a bitmap with a bit set for each true flag"""
+    bitmap = bytearray((len(flags) + 7) // 8)
+
+    for index, flag in enumerate(flags):
+        if flag:
+            bitmap[index // 8] |= 0x80 >> (index % 8)
+
+    return bytes(bitmap)
+
+
+def unpack_bitmap(bitmap: bytes, count: int) -> list:
+    """the flags for the first count bits of a bitmap"""
+    assert len(bitmap) * 8 >= count, f"{len(bitmap)} bytes for {count} flags"
+    return [bitmap[i // 8] & (0x80 >> (i % 8)) != 0 for i in range(0, count)]
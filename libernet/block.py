@@ -5,21 +5,36 @@
 """
 
 
+import os
+import time
+import random
+import threading
+import functools
+import multiprocessing
 import zlib
 
 from random import randbytes
 
+import libernet.codec
 import libernet.url
 
 from libernet.encrypt import aes_encrypt, aes_decrypt
 from libernet.hash import sha256_data_identifier, binary_from_identifier
-from libernet.hash import identifier_match_score
+from libernet.hash import identifier_match_score, sha256_hasher, hasher_identifier
 from libernet.url import address_of, SHA256, AES256, PASSWORD
 
 
 MAX_BLOCK_SIZE = 1024 * 1024
+MAX_UNCOMPRESSED_SIZE = MAX_BLOCK_SIZE + 64  # allow for similar padding
 MATCH = 12
-COMPRESS_LEVEL = 9
+COMPRESS_LEVEL = libernet.codec.LEVELS[libernet.codec.ZLIB]
+PROBE_SIZE = 4096  # bytes in each sample compressed to see if data is compressible
+PROBE_SAMPLES = 4
+PROBE_RATIO = 0.95  # samples must compress smaller than this to compress the data
+MINING_WORKERS = os.cpu_count() or 1
+MINING_START = "spawn"  # forking would copy the caller's threads and locks
+PARALLEL_SCORE = 16  # below this a single process finds a match before others start
+STATS_LOCK = threading.Lock()
 
 
 def __padding_suffixes(similar: str, encrypt, score: int) -> str:
@@ -37,16 +52,44 @@ def __padding_suffixes(similar: str, encrypt, score: int) -> str:
     return (data_suffix, encrypted_suffix)
 
 
-def __maybe_compress(data: bytes, encrypt) -> bytes:
+def __compressible(data: bytes) -> bool:
+    """quickly compress a few samples of the data to see if it is worth compressing
+    (already compressed data, like jpeg, mp4 or zip, is not)
+    """
+    if len(data) <= PROBE_SIZE * PROBE_SAMPLES:
+        return True
+
+    step = (len(data) - PROBE_SIZE) // (PROBE_SAMPLES - 1)
+    sample = b"".join(
+        data[s : s + PROBE_SIZE] for s in range(0, len(data) - PROBE_SIZE + 1, step)
+    )
+    return len(zlib.compress(sample, 1)) < len(sample) * PROBE_RATIO
+
+
+def __maybe_compress(
+    data: bytes, encrypt, codec=libernet.codec.ZLIB, level=None, compression=None
+) -> bytes:
     """Data is compressed if:
     1. We will have a hash of the original data in the url (no password encrypt)
-    2. The compressed data is not bigger than the original data
+    2. A sample of the data compresses (and level is not 0)
+    3. The compressed data is not bigger than the original data
+    codec, level, compression - see store()
     """
     if encrypt and encrypt is not True:
         return data
 
-    compressed = zlib.compress(data, COMPRESS_LEVEL)
-    return compressed if len(compressed) <= len(data) else data
+    start = time.perf_counter()
+    compressible = level != 0 and __compressible(data)
+    compressed = libernet.codec.compress(data, codec, level) if compressible else data
+    result = compressed if len(compressed) <= len(data) else data
+    __tally(
+        compression,
+        compress_seconds=time.perf_counter() - start,
+        compress_input=len(data),
+        compress_output=len(result),
+        compress_skipped=0 if compressible else 1,
+    )
+    return result
 
 
 def __key_and_kind(data: bytes, encrypt) -> (str, str):
@@ -85,8 +128,143 @@ def __maybe_encrypt(
     )
 
 
+def __tally(stats: dict, **values):
+    """add values to the running totals in stats (if stats is not None)"""
+    if stats is None:
+        return
+
+    with STATS_LOCK:
+        for name, value in values.items():
+            stats[name] = stats.get(name, 0) + value
+
+        if stats.get("mining_seconds", 0) > 0:
+            stats["attempts_per_second"] = stats["attempts"] / stats["mining_seconds"]
+
+
+def __attempt(
+    data: bytes, encrypt, similar: str, score: int, compress
+) -> (bytes, str, str):
+    """pad, compress and encrypt the data, returns block, url and identifier"""
+    start_suffix, end_suffix = __padding_suffixes(similar, encrypt, score)
+    padded = data + start_suffix
+    compressed = compress(padded, encrypt)
+    key, kind = __key_and_kind(padded, encrypt)
+    return __maybe_encrypt(compressed, key, kind, padded, end_suffix)
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def __mine_encrypted(data: bytes, encrypt, similar: str, score: int, compress, stop):
+    """When encrypting, the suffix is added after encryption.
+    So compress, encrypt and hash the body once,
+    then each attempt only hashes the suffix (from a copy of the body's hasher).
+    """
+    compressed = compress(data, encrypt)
+    key, kind = __key_and_kind(data, encrypt)
+    body = aes_encrypt(binary_from_identifier(key), compressed)
+    body_hasher = sha256_hasher(body)
+    attempts = 0
+
+    while stop is None or not stop.is_set():
+        attempts += 1
+        _, end_suffix = __padding_suffixes(similar, encrypt, score)
+        hasher = body_hasher.copy()
+        hasher.update(end_suffix)
+        ident = hasher_identifier(hasher)
+
+        if identifier_match_score(similar, ident) >= score:
+            url = libernet.url.for_encrypted(ident, key, kind)
+            return body + end_suffix, url, ident, attempts
+
+    return None, None, None, attempts
+
+
+# pylint: disable=too-many-arguments
+def __mine(
+    data: bytes, encrypt, similar: str, score: int, compress=__maybe_compress, stop=None
+):
+    """try random suffixes until the block identifier matches similar
+    compress - called with the data and encrypt to compress it (see __maybe_compress)
+    stop - an Event that, once set, ends the search without a block
+    returns block, url, identifier and the number of attempts made
+    """
+    if similar and encrypt:
+        return __mine_encrypted(data, encrypt, similar, score, compress, stop)
+
+    attempts = 0
+
+    while stop is None or not stop.is_set():
+        attempts += 1
+        block, url, ident = __attempt(data, encrypt, similar, score, compress)
+
+        if not similar or identifier_match_score(similar, ident) >= score:
+            return block, url, ident, attempts
+
+    return None, None, None, attempts
+
+
+def __mining_process(arguments: tuple, stop, results):
+    """worker process for __mine_parallel, reports exactly one result"""
+    random.seed()  # do not try the same suffixes as the other workers
+    result = (None, None, None, 0)
+
+    try:
+        result = __mine(*arguments, stop=stop)
+
+        if result[0] is not None:
+            stop.set()
+
+    finally:
+        results.put(result)
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def __mine_parallel(
+    data: bytes, encrypt, similar: str, score: int, compress, workers: int
+):
+    """spread __mine across worker processes, first match stops the others"""
+    context = multiprocessing.get_context(MINING_START)
+    stop = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=__mining_process,
+            args=((data, encrypt, similar, score, compress), stop, results),
+        )
+        for _ in range(0, workers)
+    ]
+    found = None
+    attempts = 0
+
+    for process in processes:
+        process.start()
+
+    for _ in processes:
+        block, url, ident, tried = results.get()
+        attempts += tried
+
+        if found is None and block is not None:
+            found = (block, url, ident)
+            stop.set()
+
+    for process in processes:
+        process.join()
+
+    assert found is not None, "All mining processes failed"
+    return (*found, attempts)
+
+
+# pylint: disable=too-many-arguments
 def store(
-    data: bytes, storage, encrypt=True, similar=None, score=MATCH
+    data: bytes,
+    storage,
+    encrypt=True,
+    similar=None,
+    score=MATCH,
+    workers=1,
+    stats=None,
+    level=None,
+    compression=None,
+    codec=libernet.codec.ZLIB,
 ) -> (str, bytes):
     """prepares data, stores it, and returns url and processed data
     data - raw data to store
@@ -97,18 +275,31 @@ def store(
                         We do not have the contents hash to know if it was compressed
     similar - An identifier to make this similar to (padding to match)
     score - The number of bits that need to match the similar identifier
+    workers - The number of processes to use to match the similar identifier
+            (only used when score is at least PARALLEL_SCORE)
+    stats - if not None, a dictionary to accumulate statistics in
+            (attempts, mining_seconds, attempts_per_second)
+    level - compression level (default for the codec, 0 to not compress)
+    compression - if not None, a dictionary to accumulate compression statistics in
+            (compress_seconds, compress_input, compress_output, compress_skipped)
+    codec - how to compress the data, see libernet.codec
     """
     assert len(data) <= MAX_BLOCK_SIZE, f"{len(data) - MAX_BLOCK_SIZE} bytes too big"
-
-    while True:
-        start_suffix, end_suffix = __padding_suffixes(similar, encrypt, score)
-        padded = data + start_suffix
-        compressed = __maybe_compress(padded, encrypt)
-        key, kind = __key_and_kind(padded, encrypt)
-        block, url, ident = __maybe_encrypt(compressed, key, kind, padded, end_suffix)
-
-        if not similar or identifier_match_score(similar, ident) >= score:
-            break
+    start = time.perf_counter()
+    compress = functools.partial(__maybe_compress, codec=codec, level=level)
+
+    if (
+        similar and workers > 1 and score >= PARALLEL_SCORE
+    ):  # statistics are not collected from the processes
+        block, url, _, attempts = __mine_parallel(
+            data, encrypt, similar, score, compress, workers
+        )
+    else:
+        compress = functools.partial(compress, compression=compression)
+        block, url, _, attempts = __mine(data, encrypt, similar, score, compress)
+
+    if similar:
+        __tally(stats, attempts=attempts, mining_seconds=time.perf_counter() - start)
 
     assert len(block) <= MAX_BLOCK_SIZE, f"{len(block)} > {MAX_BLOCK_SIZE}: {block}"
     storage[address_of(url)] = block
@@ -146,25 +337,39 @@ def __maybe_uncompress(url_info: [str], data: bytes, was_similar: bool) -> (byte
     parts - the parts of the url
     data - the data to uncompress (not encrypted)
     was_similar - was the data saved to a known location?
+    returns the data and its identifier (None for password encrypted data)
+    Each buffer is hashed at most once: data that looks compressed is
+        uncompressed and checked, otherwise the data itself is checked.
+    Data that would uncompress to more than a block can hold is not compressed.
     """
     encrypted = url_info[1] is not None
 
-    if was_similar and not encrypted:
-        data_identifier = sha256_data_identifier(data)
+    if encrypted and url_info[3] == PASSWORD:
+        return data, None  # the identifier is of the encrypted data
 
-        if data_identifier == url_info[2]:
-            return __maybe_unpad(data, was_similar), sha256_data_identifier(data)
+    codec = libernet.codec.identify(data)
 
-    if encrypted and url_info[3] == PASSWORD:
-        return data, sha256_data_identifier(data)
+    if codec is not None:
+        try:
+            uncompressed = libernet.codec.decompress(data, MAX_UNCOMPRESSED_SIZE)
+
+        except libernet.codec.ERRORS:  # uncompressed data that looks compressed
+            uncompressed = None
+
+        identifier = (
+            None if uncompressed is None else sha256_data_identifier(uncompressed)
+        )
 
-    if sha256_data_identifier(data) == url_info[2]:
-        return data, sha256_data_identifier(data)
+        if identifier == url_info[2]:
+            padded = was_similar and not encrypted
+            return __maybe_unpad(uncompressed, padded), identifier
 
-    uncompressed = zlib.decompress(data)
-    assert sha256_data_identifier(uncompressed) == url_info[2]
-    unpadded = uncompressed if encrypted else __maybe_unpad(uncompressed, was_similar)
-    return unpadded, sha256_data_identifier(uncompressed)
+    identifier = sha256_data_identifier(data)
+
+    if identifier != url_info[2] and codec not in libernet.codec.available() + [None]:
+        libernet.codec.decompress(data)  # raises the reason it can't be read
+
+    return __maybe_unpad(data, was_similar and not encrypted), identifier
 
 
 def unpack(url: str, data: bytes, was_similar=False) -> bytes:
@@ -192,4 +397,15 @@ def fetch(url: str, storage, was_similar=False, password=None) -> bytes:
         encryption_key = sha256_data_identifier(password.encode("utf-8"))
         url = libernet.url.for_encrypted(identifier, encryption_key, PASSWORD)
 
-    return unpack(url, storage.get(address_of(url)), was_similar)
+    get_unpacked = getattr(storage, "get_unpacked", None)  # see libernet.cache
+    data = None if get_unpacked is None else get_unpacked(url, was_similar)
+
+    if data is not None:
+        return data
+
+    data = unpack(url, storage.get(address_of(url)), was_similar)
+
+    if get_unpacked is not None and data is not None:
+        storage.set_unpacked(url, was_similar, data)
+
+    return data
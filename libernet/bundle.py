@@ -17,13 +17,20 @@ import os
 import time
 import datetime
 import threading
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from queue import Queue
 
 import libernet.block
+import libernet.chunk
+import libernet.codec
 import libernet.url
 from libernet.encrypt import BLOCK_SIZE
 
-FILE_THREADS = 1  # 4
+FILE_THREADS = os.cpu_count() or 1  # files (and blocks) stored at once by create()
+RESTORE_BATCH = 32  # blocks requested at a time when restoring
+RESTORE_THREADS = 8  # batches of blocks fetched and written at once when restoring
 MAX_BLOCK_SIZE = 1024 * 1024
 MAX_RAW_BLOCK_SIZE = MAX_BLOCK_SIZE - BLOCK_SIZE  # allow for encryption padding
 MAX_BUNDLE_SIZE = MAX_RAW_BLOCK_SIZE
@@ -44,6 +51,11 @@ READ_BINARY = "rb"
 SIZE = "size"
 URL = "url"
 
+# keys only kept locally, see create(files=), not stored in bundles
+INODE = "inode"
+MODIFIED_NS = "modified_ns"
+LOCAL = (INODE, MODIFIED_NS)
+
 
 def create_timestamp(py_time=None):
     """Creates a timestamp (optionally from a python-epoch based time"""
@@ -91,6 +103,8 @@ def __file_metadata_entry(full_path: str) -> dict:
     description = {
         SIZE: file_info.st_size,
         MODIFIED: create_timestamp(file_info.st_mtime),
+        MODIFIED_NS: file_info.st_mtime_ns,
+        INODE: file_info.st_ino,
     }
 
     if is_link:
@@ -108,22 +122,76 @@ def __file_metadata_entry(full_path: str) -> dict:
     return description
 
 
-def __file_contents(full_path: str, storage, messages) -> dict:
-    """given the path to a file, create the bundle entry"""
+def __store_block(block: bytes, store) -> (str, int):
+    """store a block of a file, returns the url and size"""
+    url, _ = store(block)
+    return url, len(block)
+
+
+def __read_block(descriptor: int, offset: int, store) -> (str, int):
+    """read and store the block of a file at offset, returns the url and size"""
+    return __store_block(os.pread(descriptor, MAX_RAW_BLOCK_SIZE, offset), store)
+
+
+def __in_order(pool: ThreadPoolExecutor, jobs, window: int):
+    """run (function, *args) jobs on the pool, yields the results in order
+    at most window jobs are queued or running at once
+    """
+    running = deque()
+
+    try:
+        for function, *args in jobs:
+            running.append(pool.submit(function, *args))
+
+            if len(running) >= window:
+                yield running.popleft().result()
+
+        while running:
+            yield running.popleft().result()
+
+    finally:  # do not leave jobs reading a file that is about to be closed
+        for job in running:
+            job.cancel()
+
+        wait(running)
+
+
+# pylint: disable=too-many-arguments
+def __file_contents(
+    full_path: str, store, messages, chunking: str, pool, window: int
+) -> dict:
+    """given the path to a file, create the bundle entry
+    store - called with each block to store it (see libernet.block.store)
+    blocks are compressed, encrypted and stored on the pool (large FIXED files
+        are also read on the pool)
+    """
     description = {CONTENTS: []}
 
     with open(full_path, READ_BINARY) as source_file:
-        while True:
-            block = source_file.read(MAX_RAW_BLOCK_SIZE)
+        descriptor = source_file.fileno()
+        file_size = os.fstat(descriptor).st_size
+
+        if chunking == libernet.chunk.FIXED and file_size > MAX_RAW_BLOCK_SIZE:
+            jobs = (  # blocks are read in parallel too
+                (__read_block, descriptor, o, store)
+                for o in range(0, file_size, MAX_RAW_BLOCK_SIZE)
+            )
+        else:
+            jobs = (
+                (__store_block, b, store)
+                for b in libernet.chunk.blocks(
+                    source_file, chunking, MAX_RAW_BLOCK_SIZE
+                )
+            )
 
-            if not block:
-                break
+        for url, size in __in_order(pool, jobs, window):
+            if not size:  # the file was truncated while reading it
+                continue
 
             if messages:
-                messages.send(("data", len(block)))
+                messages.send(("data", size))
 
-            url, _ = libernet.block.store(block, storage)
-            description[CONTENTS].append({URL: url, SIZE: len(block)})
+            description[CONTENTS].append({URL: url, SIZE: size})
 
     return description
 
@@ -141,7 +209,7 @@ def __deserialize_bundle(block):
 
 
 def __file_entry(
-    file_path: str, relative_path: str, previous: dict, storage, messages
+    file_path: str, relative_path: str, previous: dict, messages, contents
 ) -> (str, dict):
     """returns relative_path, file_entry"""
     prexisting = previous[FILES].get(relative_path, None) if previous else None
@@ -150,8 +218,13 @@ def __file_entry(
     size_matches = prexisting and prexisting[SIZE] == entry[SIZE]
     prexisting_modified = prexisting[MODIFIED] if prexisting else 0
     time_difference = prexisting_modified - entry[MODIFIED]
-    unmodified = size_matches and abs(time_difference) < SAME_TIME_VARIANCE_IN_SECONDS
-    new_contents = None if unmodified else __file_contents(file_path, storage, messages)
+    same_time = abs(time_difference) < SAME_TIME_VARIANCE_IN_SECONDS
+
+    if prexisting and INODE in prexisting:  # kept locally, compare exactly
+        same_time = all(prexisting[k] == entry[k] for k in LOCAL)
+
+    unmodified = size_matches and same_time
+    new_contents = None if unmodified else contents(file_path)
     entry.update({CONTENTS: prexisting_contents} if unmodified else new_contents)
 
     if messages and not unmodified:
@@ -181,8 +254,8 @@ def __list_directory(path: str) -> (list, list):
 def __file_processing_thread(
     source_path: str,
     previous: dict,
-    storage,
     messages,
+    contents,
     in_queue: Queue,
     out_queue: Queue,
 ):
@@ -194,22 +267,22 @@ def __file_processing_thread(
             break
 
         file_path = os.path.join(source_path, file)
-        out_queue.put(__file_entry(file_path, file, previous, storage, messages))
+        out_queue.put(__file_entry(file_path, file, previous, messages, contents))
 
 
-def __create_raw_bundle(source_path: str, storage, previous: dict, messages) -> dict:
-    """Given a path to a directory, create a full, raw bundle"""
-    description = {FILES: {}}
-    file_list, empty_dirs = __list_directory(source_path)
+# pylint: disable=too-many-arguments
+def __file_entries(
+    source_path: str, file_list: list, previous: dict, messages, contents, count: int
+) -> list:
+    """process the files on count threads, returns (relative_path, entry) for each"""
     path_queue = Queue()
     info_queue = Queue()
-
     threads = [
         threading.Thread(
             target=__file_processing_thread,
-            args=(source_path, previous, storage, messages, path_queue, info_queue),
+            args=(source_path, previous, messages, contents, path_queue, info_queue),
         )
-        for _ in range(0, FILE_THREADS)
+        for _ in range(0, max(1, min(count, len(file_list))))
     ]
 
     for thread in threads:
@@ -219,10 +292,44 @@ def __create_raw_bundle(source_path: str, storage, previous: dict, messages) ->
         path_queue.put(file)
 
     path_queue.put(None)
+    return [info_queue.get() for _ in file_list]
 
-    for _ in file_list:
-        entry = info_queue.get()
-        description[FILES].update(dict([entry]))
+
+# pylint: disable=too-many-arguments
+def __create_raw_bundle(
+    source_path: str,
+    store,
+    previous: dict,
+    messages,
+    chunking: str,
+    thread_count: int,
+    files: dict,
+) -> dict:
+    """Given a path to a directory, create a full, raw bundle"""
+    description = {FILES: {}}
+    file_list, empty_dirs = __list_directory(source_path)
+
+    with ThreadPoolExecutor(thread_count) as pool:
+        contents = functools.partial(
+            __file_contents,
+            store=store,
+            messages=messages,
+            chunking=chunking,
+            pool=pool,
+            window=thread_count,
+        )
+        entries = __file_entries(
+            source_path, file_list, previous, messages, contents, thread_count
+        )
+
+    entries = dict(sorted(entries))  # same order however files finish
+
+    if files is not None:
+        files.update(entries)
+
+    description[FILES] = {
+        f: {k: v for k, v in e.items() if k not in LOCAL} for f, e in entries.items()
+    }
 
     description[DIRECTORIES] = {
         d: (
@@ -300,24 +407,51 @@ def __thin_bundle(raw: dict, storage, encrypt) -> str:
     return url
 
 
-def create(
-    path: str, storage, previous: dict = None, encrypt=True, messages=None, **args
+def create(  # pylint: disable=too-many-arguments
+    path: str,
+    storage,
+    previous: dict = None,
+    encrypt=True,
+    messages=None,
+    chunking=libernet.chunk.FIXED,
+    threads=None,
+    level=None,
+    stats=None,
+    codec=libernet.codec.ZLIB,
+    files=None,
+    **args,
 ) -> str:
     """stores a bundle from path in storage and returns the url
     storage - an object that can be called with put((block_url, block_data))
     previous - a bundle dictionary for optimization, see inflate()
+    chunking - how file contents are split into blocks, see libernet.chunk
+    threads - how many files and blocks to store at once (default FILE_THREADS)
+    level - compression level for file contents, see libernet.block.store()
+    codec - compression codec for file contents, see libernet.codec
+    stats - if not None, a dictionary to accumulate file contents compression
+            statistics in, see libernet.block.store()
+    files - if not None, a dictionary to fill with the entry for each file,
+            including the local only keys (LOCAL), see libernet.stat_cache
     args - added to the bundle description
     """
     # TODO: support providing mime types  # pylint: disable=fixme
-    raw = __create_raw_bundle(path, storage, previous, messages)
+    store = functools.partial(
+        libernet.block.store,
+        storage=storage,
+        level=level,
+        compression=stats,
+        codec=codec,
+    )
+    raw = __create_raw_bundle(
+        path, store, previous, messages, chunking, threads or FILE_THREADS, files
+    )
     raw.update(args)
     bundle = __serialize_bundle(raw)
 
     if len(bundle) > MAX_BUNDLE_SIZE:
         return __thin_bundle(raw, storage, encrypt)
 
-    url, _ = libernet.block.store(bundle, storage, encrypt)
-    return url
+    return libernet.block.store(bundle, storage, encrypt)[0]
 
 
 def inflate(url: str, storage) -> dict:
@@ -350,12 +484,33 @@ def inflate(url: str, storage) -> dict:
     return bundle
 
 
+def __contains_many(storage, urls: list) -> list:
+    """are the urls in storage, in one request if storage supports it"""
+    contains_many = getattr(storage, "contains_many", None)
+
+    if contains_many is None:
+        return [u in storage for u in urls]
+
+    return contains_many(urls)
+
+
+def __get_many(storage, urls: list) -> list:
+    """get the blocks for the urls, in one request if storage supports it"""
+    get_many = getattr(storage, "get_many", None)
+
+    if get_many is None:
+        return [storage.get(u) for u in urls]
+
+    return get_many(urls)
+
+
 def __find_missing_blocks(bundle: dict, target_dir: str, storage) -> (list, dict):
     """returns missing blocks and existing file metadata cache
     valid[file] == None => existing file is good
     valid[file] == {metadata} => file was modified (should not exist)
     """
     missing = [libernet.url.address_of(u) for u in bundle.get(BUNDLES, [])]
+    needed = []
     valid = {}
 
     for file in bundle[FILES]:
@@ -375,14 +530,16 @@ def __find_missing_blocks(bundle: dict, target_dir: str, storage) -> (list, dict
         if unmodified:
             valid[file] = True
         else:
-            urls = [
+            needed.extend(
                 libernet.url.address_of(b["url"]) for b in bundle[FILES][file][CONTENTS]
-            ]
-            missing.extend(u for u in urls if u not in storage)
+            )
 
             if prexisting:
                 valid[file] = False
 
+    needed = list(dict.fromkeys(needed))  # blocks shared by files are checked once
+    exists = __contains_many(storage, needed)
+    missing.extend(u for u, e in zip(needed, exists) if not e)
     return missing, valid
 
 
@@ -410,23 +567,57 @@ def __remove_modified_files(files_valid: dict, target_dir: str):
         os.remove(os.path.join(target_dir, file))
 
 
-def __restore_file(bundle: dict, file: str, target_dir: str, storage):
-    """restore a given file from a bundle to disk"""
-    entry = bundle[FILES][file]
-    file_path = os.path.join(target_dir, file)
-    is_readonly = entry.get(READONLY, False)
-    is_executable = entry.get(EXUTABLE, False)
+def __create_file(entry: dict, file_path: str) -> list:
+    """create a file (or link) at its final size
+    returns the (url, offset, size) of each block to write to it
+    """
     os.makedirs(os.path.split(file_path)[0], exist_ok=True)
     link_contents = entry.get("link", None)
 
     if link_contents is not None:
         os.symlink(link_contents, file_path)
-        return
+        return []
+
+    blocks = []
+    offset = 0
+
+    for block in entry[CONTENTS]:
+        blocks.append((block[URL], offset, block[SIZE]))
+        offset += block[SIZE]
 
     with open(file_path, "wb") as file_contents:
-        for block_info in entry[CONTENTS]:
-            data = libernet.block.fetch(block_info["url"], storage)
-            file_contents.write(data)
+        file_contents.truncate(offset)  # preallocate, blocks are written in place
+
+    return blocks
+
+
+def __write_blocks(blocks: list, storage):
+    """fetch a batch of blocks and write each one everywhere it is used
+    blocks - (url, [(file_path, offset), ...]) for each block
+    """
+    found = __get_many(storage, [libernet.url.address_of(b[0]) for b in blocks])
+
+    for (url, destinations), block in zip(blocks, found):
+        data = libernet.block.unpack(url, block)  # only once for every copy
+        assert data is not None, f"block missing: {url}"
+
+        for file_path, offset in destinations:  # a block may go in any number of files
+            descriptor = os.open(file_path, os.O_WRONLY)
+
+            try:
+                os.pwrite(descriptor, data, offset)
+
+            finally:
+                os.close(descriptor)
+
+
+def __finish_file(entry: dict, file_path: str):
+    """set the modification time and permissions once a file is written"""
+    if entry.get("link", None) is not None:
+        return
+
+    is_readonly = entry.get(READONLY, False)
+    is_executable = entry.get(EXUTABLE, False)
 
     # TODO: add xattr  # pylint: disable=fixme
     # TODO: add rsrc  # pylint: disable=fixme
@@ -440,7 +631,58 @@ def __restore_file(bundle: dict, file: str, target_dir: str, storage):
         os.chmod(file_path, mode)
 
 
-def restore(url_or_bundle, target_dir: str, storage) -> list:
+def __create_files(bundle: dict, files: list, target_dir: str) -> (dict, dict):
+    """create the files, returns where each block goes and the size of each block
+    {url: [(file_path, offset), ...]}, {url: size}
+    """
+    destinations = {}
+    sizes = {}
+
+    for file in files:
+        file_path = os.path.join(target_dir, file)
+
+        for url, offset, size in __create_file(bundle[FILES][file], file_path):
+            destinations.setdefault(url, []).append((file_path, offset))
+            sizes[url] = size
+
+    return destinations, sizes
+
+
+# pylint: disable=too-many-arguments
+def __restore_files(
+    bundle: dict, files: list, target_dir: str, storage, threads: int, stats: dict
+):
+    """create the files at their final size, then fetch and write their blocks
+    in batches of up to RESTORE_BATCH blocks on threads threads
+    Blocks used more than once (copies of files) are fetched once.
+    """
+    destinations, sizes = __create_files(bundle, files, target_dir)
+    blocks = list(destinations.items())
+    size = max(1, min(RESTORE_BATCH, -(-len(blocks) // threads)))  # keep all busy
+
+    with ThreadPoolExecutor(threads) as pool:
+        batches = [
+            pool.submit(__write_blocks, blocks[s : s + size], storage)
+            for s in range(0, len(blocks), size)
+        ]
+
+        for batch in batches:
+            batch.result()
+
+    for file in files:
+        __finish_file(bundle[FILES][file], os.path.join(target_dir, file))
+
+    if stats is not None:
+        stats["restore_blocks"] = stats.get("restore_blocks", 0) + len(blocks)
+        stats["restore_bytes"] = stats.get("restore_bytes", 0) + sum(sizes.values())
+        stats["restore_bytes_saved"] = stats.get("restore_bytes_saved", 0) + sum(
+            sizes[u] * (len(d) - 1) for u, d in blocks
+        )
+
+
+def restore(
+    url_or_bundle, target_dir: str, storage, threads=RESTORE_THREADS, stats=None
+) -> list:
     """restores a bundle to a target directory if all data is available
     If not all blocks are available to restore, nothing is done
         and a list of (some) missing blocks is returned
@@ -448,6 +690,10 @@ def restore(url_or_bundle, target_dir: str, storage) -> list:
     target_dir - will be created if it doesn't exist
                 contents will be updated to match the bundle
     storage - a dict-like object
+    threads - how many batches of blocks to fetch and write at once
+    stats - if not None, a dictionary to accumulate statistics in
+            (restore_blocks, restore_bytes fetched, restore_bytes_saved by
+            fetching blocks used by more than one file once)
     returns a list of missing blocks (may not be exhaustive) or None
     """
     # TODO: support URLs that have the path in the bundle  # pylint: disable=fixme
@@ -468,9 +714,7 @@ def restore(url_or_bundle, target_dir: str, storage) -> list:
     __remove_not_in_bundle(bundle, target_dir)
     __remove_modified_files(files_valid, target_dir)
     files_to_restore = [f for f in bundle[FILES] if not files_valid.get(f, False)]
-
-    for file in files_to_restore:
-        __restore_file(bundle, file, target_dir, storage)
+    __restore_files(bundle, files_to_restore, target_dir, storage, threads, stats)
 
     for directory in bundle.get(DIRECTORIES, []):
         directory_path = os.path.join(target_dir, directory)
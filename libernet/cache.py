@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+""" A storage wrapper that keeps recently used blocks in memory
+
+Both raw blocks (by address) and unpacked data (by url, see block.fetch())
+    are kept, so reading a url again skips the storage and decrypting,
+    decompressing and verifying the block again.
+The least recently used blocks are dropped to stay within max_bytes.
+Blocks being stored are passed through but not kept.
+Anything else (like(), shutdown(), ...) is passed to the wrapped storage.
+"""
+
+
+import threading
+
+from collections import OrderedDict
+
+import libernet.url
+
+
+MAX_BYTES = 64 * 1024 * 1024
+RAW = "raw"
+UNPACKED = "unpacked"
+
+
+class Storage:
+    """LRU cache of blocks in front of another storage"""
+
+    def __init__(self, storage, max_bytes: int = MAX_BYTES):
+        self.__storage = storage
+        self.__max_bytes = max_bytes
+        self.__entries = OrderedDict()  # (RAW, address) or (UNPACKED, url, similar)
+        self.__size = 0
+        self.__lock = threading.Lock()
+        self.__counts = dict.fromkeys(
+            ["hits", "misses", "unpacked_hits", "unpacked_misses"], 0
+        )
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        return getattr(self.__storage, name)
+
+    def __remember(self, key: tuple, data: bytes):
+        if data is None or len(data) > self.__max_bytes:
+            return
+
+        with self.__lock:
+            previous = self.__entries.pop(key, None)
+            self.__size -= 0 if previous is None else len(previous)
+            self.__entries[key] = data
+            self.__size += len(data)
+
+            while self.__size > self.__max_bytes:
+                self.__size -= len(self.__entries.popitem(last=False)[1])
+
+    def __recall(self, key: tuple, counter: str) -> bytes:
+        with self.__lock:
+            data = self.__entries.get(key, None)
+
+            if data is None:
+                self.__counts[counter + "misses"] += 1
+                return None
+
+            self.__entries.move_to_end(key)
+            self.__counts[counter + "hits"] += 1
+            return data
+
+    def get(self, key: str, default: bytes = None) -> bytes:
+        """get a block from the cache or the storage"""
+        data = self.__recall((RAW, key), "")
+
+        if data is None:
+            data = self.__storage.get(key, None)
+            self.__remember((RAW, key), data)
+
+        return default if data is None else data
+
+    def __getitem__(self, key: str) -> bytes:
+        data = self.get(key)
+
+        if data is None:
+            raise KeyError(f"{key} not found")
+
+        return data
+
+    def __setitem__(self, key: str, value: bytes):
+        self.__storage[key] = value
+
+    def __delitem__(self, key: str):
+        del self.__storage[key]
+
+        with self.__lock:
+            for entry in [e for e in self.__entries if self.__address(e) == key]:
+                self.__size -= len(self.__entries.pop(entry))
+
+    @staticmethod
+    def __address(entry: tuple) -> str:
+        return entry[1] if entry[0] == RAW else libernet.url.address_of(entry[1])
+
+    def __contains__(self, key: str) -> bool:
+        with self.__lock:
+            if (RAW, key) in self.__entries:
+                return True
+
+        return key in self.__storage
+
+    def get_many(self, keys: list) -> list:
+        """Get many blocks, only requesting the ones not in the cache"""
+        results = [self.__recall((RAW, k), "") for k in keys]
+        needed = [k for k, r in zip(keys, results) if r is None]
+        get_many = getattr(self.__storage, "get_many", None)
+
+        if needed and get_many is None:
+            found = iter([self.__storage.get(k, None) for k in needed])
+        else:
+            found = iter(get_many(needed) if needed else [])
+
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = next(found)
+                self.__remember((RAW, keys[index]), results[index])
+
+        return results
+
+    def contains_many(self, keys: list) -> list:
+        """Check for many blocks, only asking about the ones not in the cache"""
+        with self.__lock:
+            results = [(RAW, k) in self.__entries for k in keys]
+
+        needed = [k for k, r in zip(keys, results) if not r]
+        contains_many = getattr(self.__storage, "contains_many", None)
+
+        if needed and contains_many is None:
+            found = iter([k in self.__storage for k in needed])
+        else:
+            found = iter(contains_many(needed) if needed else [])
+
+        return [r or next(found) for r in results]
+
+    def get_unpacked(self, url: str, was_similar: bool) -> bytes:
+        """the data block.fetch() unpacked from url before (None if not cached)"""
+        return self.__recall((UNPACKED, url, was_similar), "unpacked_")
+
+    def set_unpacked(self, url: str, was_similar: bool, data: bytes):
+        """remember the data block.fetch() unpacked from url"""
+        self.__remember((UNPACKED, url, was_similar), data)
+
+    def stats(self) -> dict:
+        """hits, misses, unpacked_hits, unpacked_misses, blocks and bytes cached"""
+        with self.__lock:
+            return dict(self.__counts, blocks=len(self.__entries), bytes=self.__size)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+""" Split file contents into blocks
+
+fixed - every block is max_size (except the last one)
+gear - content-defined blocks (FastCDC style Gear rolling hash)
+
+With content-defined blocks, a block ends where the hash of the 64 bytes before
+    it matches a mask, so inserting or removing bytes only changes the blocks
+    around the edit, the rest of the file still has the same blocks.
+The hash table is derived from sha256 so the boundaries never change.
+"""
+
+
+import hashlib
+
+
+FIXED = "fixed"
+GEAR = "gear"
+METHODS = (FIXED, GEAR)
+MIN_SIZE = 128 * 1024  # no boundary is looked for before this
+AVERAGE_SIZE = 256 * 1024
+READ_SIZE = 4 * 1024 * 1024
+HASH_MASK = 0xFFFFFFFFFFFFFFFF
+NORMALIZATION = 2  # bits harder (then easier) to match before (after) average
+GEAR_TABLE = [
+    int.from_bytes(hashlib.sha256(bytes([b])).digest()[:8], "big") for b in range(256)
+]
+
+
+def __mask(bits: int) -> int:
+    """the top bits of the hash must be zero for a boundary"""
+    return ((1 << bits) - 1) << (64 - bits)
+
+
+def __scan(data: bytes, start: int, end: int, mask: int, fingerprint: int):
+    """find the first boundary in data[start:end], returns the end and the hash"""
+    table = GEAR_TABLE
+    index = start
+
+    for byte in data[start:end]:
+        fingerprint = ((fingerprint << 1) + table[byte]) & HASH_MASK
+        index += 1
+
+        if not fingerprint & mask:
+            return index, fingerprint
+
+    return end, fingerprint
+
+
+def cut_point(
+    data: bytes,
+    max_size: int,
+    start: int = 0,
+    min_size: int = MIN_SIZE,
+    average_size: int = AVERAGE_SIZE,
+) -> int:
+    """the end of the block starting at start in data"""
+    end = min(len(data), start + max_size)
+
+    if end - start <= min_size:
+        return end
+
+    bits = average_size.bit_length() - 1
+    normal = min(end, start + average_size)
+    found, fingerprint = __scan(
+        data, start + min_size, normal, __mask(bits + NORMALIZATION), 0
+    )
+
+    if found < normal:
+        return found
+
+    return __scan(data, normal, end, __mask(bits - NORMALIZATION), fingerprint)[0]
+
+
+def fixed(source_file, max_size: int):
+    """generates max_size blocks from the file"""
+    while True:
+        block = source_file.read(max_size)
+
+        if not block:
+            break
+
+        yield block
+
+
+def gear(
+    source_file, max_size: int, min_size: int = MIN_SIZE, average_size=AVERAGE_SIZE
+):
+    """generates content-defined blocks from the file"""
+    buffer = b""
+    start = 0
+    end_of_file = False
+
+    while start < len(buffer) or not end_of_file:
+        if not end_of_file and len(buffer) - start < max_size:
+            data = source_file.read(max(READ_SIZE, max_size))
+            end_of_file = not data
+            buffer = buffer[start:] + data
+            start = 0
+            continue
+
+        end = cut_point(buffer, max_size, start, min_size, average_size)
+        yield buffer[start:end]
+        start = end
+
+
+def blocks(source_file, method: str, max_size: int):
+    """generates blocks from the file using the method (FIXED or GEAR)"""
+    assert method in METHODS, f"unknown chunking method: {method}"
+    return (
+        gear(source_file, max_size) if method == GEAR else fixed(source_file, max_size)
+    )
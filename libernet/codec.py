@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+""" Compression codecs for blocks
+
+Compressed data is identified by the magic bytes each format starts with,
+    so it can be decompressed without knowing which codec compressed it.
+zstd is only available on interpreters that ship compression.zstd (3.14+).
+"""
+
+
+import bz2
+import lzma
+import zlib
+
+try:
+    from compression import zstd
+except ImportError:  # before python 3.14
+    zstd = None
+
+
+ZLIB = "zlib"
+LZMA = "lzma"
+BZ2 = "bz2"
+ZSTD = "zstd"
+LEVELS = {ZLIB: 9, LZMA: 6, BZ2: 9, ZSTD: 3}  # default level for each codec
+MAGIC = {LZMA: b"\xfd7zXZ\x00", BZ2: b"BZh", ZSTD: b"\x28\xb5\x2f\xfd"}
+ZLIB_DEFLATE = 8  # zlib header compression method
+ERRORS = (zlib.error, lzma.LZMAError, OSError, EOFError, ValueError) + (
+    () if zstd is None else (zstd.ZstdError,)
+)  # raised by decompress() for data that is not compressed
+
+
+def available() -> list:
+    """the codecs this interpreter supports"""
+    return [c for c in LEVELS if c != ZSTD or zstd is not None]
+
+
+def compress(data: bytes, codec: str = ZLIB, level: int = None) -> bytes:
+    """compress data with the codec (level None for the codec's default)"""
+    assert codec in available(), f"unsupported codec: {codec}"
+    level = LEVELS[codec] if level is None else level
+
+    if codec == LZMA:
+        return lzma.compress(data, preset=level)
+
+    if codec == BZ2:
+        return bz2.compress(data, level)
+
+    if codec == ZSTD:
+        return zstd.compress(data, level)
+
+    return zlib.compress(data, level)
+
+
+def identify(data: bytes) -> str:
+    """the codec that compressed data (None if it is not recognized)"""
+    for codec, magic in MAGIC.items():
+        if data.startswith(magic):
+            return codec
+
+    if (
+        len(data) >= 2
+        and data[0] & 0x0F == ZLIB_DEFLATE
+        and ((data[0] << 8) | data[1]) % 31 == 0
+    ):
+        return ZLIB
+
+    return None
+
+
+def __decompressor(codec: str):
+    """a decompressor object for the codec and its max_length for no limit"""
+    if codec == LZMA:
+        return lzma.LZMADecompressor(format=lzma.FORMAT_XZ), -1
+
+    if codec == BZ2:
+        return bz2.BZ2Decompressor(), -1
+
+    if codec == ZSTD:
+        if zstd is None:
+            raise ValueError("zstd compressed data needs python 3.14+")
+
+        return zstd.ZstdDecompressor(), -1
+
+    return zlib.decompressobj(), 0
+
+
+def decompress(data: bytes, max_length: int = None) -> bytes:
+    """decompress data compressed by any of the codecs
+    max_length - raises ValueError if data uncompresses to more than this
+    """
+    decompressor, limit = __decompressor(identify(data))
+    limit = limit if max_length is None else max_length + 1
+    uncompressed = decompressor.decompress(data, limit)  # zlib.error if not compressed
+
+    if max_length is not None and len(uncompressed) > max_length:
+        raise ValueError(f"uncompresses to more than {max_length} bytes")
+
+    if not decompressor.eof:
+        raise EOFError("compressed data ended early")
+
+    return uncompressed
@@ -5,27 +5,51 @@
 
 
 import os
-import json
 import random
 import threading
 
 import libernet.url
 
-from libernet.hash import identifier_match_score, IDENTIFIER_SIZE
+from libernet.hash import IDENTIFIER_SIZE
+from libernet.index import BlockIndex
+from libernet.like import LikeIndex
 from libernet.url import LIKE
 
 
 GROUP_NIBBLES = 3
 MAX_LIKE = 100
-LIKE_CACHE_EXT = ".like.json"
+MIN_LIKE_SCORE = 8  # leading bits that must match to be returned from like()
+LOCK_STRIPES = 64
 
 
 class Storage:
-    """data storage on disk as a dict-like object"""
+    """data storage on disk as a dict-like object
+    index - keep an in-memory index of stored blocks
+            (no file system calls to check if a block exists)
+    """
 
-    def __init__(self, path):
+    def __init__(self, path, index=False):
         self.__path = os.path.join(path, "data")
-        self.__lock = threading.Lock()
+        self.__locks = [threading.Lock() for _ in range(0, LOCK_STRIPES)]
+        self.__index = BlockIndex(self.__scan()) if index else None
+        self.__likes = LikeIndex(self.__path, GROUP_NIBBLES)
+
+    def __scan(self):
+        """all the identifiers stored on disk, in order"""
+        if not os.path.isdir(self.__path):
+            return
+
+        for group in sorted(os.listdir(self.__path)):
+            group_dir = os.path.join(self.__path, group)
+
+            if len(group) != GROUP_NIBBLES or not os.path.isdir(group_dir):
+                continue
+
+            yield from sorted(
+                group + n
+                for n in os.listdir(group_dir)
+                if len(n) == IDENTIFIER_SIZE - GROUP_NIBBLES
+            )
 
     def __dir_of(self, identifier):
         directory = os.path.join(self.__path, identifier[:GROUP_NIBBLES])
@@ -34,15 +58,17 @@ class Storage:
     def __path_of(self, identifier):
         return os.path.join(self.__dir_of(identifier), identifier[GROUP_NIBBLES:])
 
-    def __safe_save(self, path: str, data, binary: bool):
+    def __lock_of(self, identifier: str) -> threading.Lock:
+        """writes to the same directory share a lock"""
+        return self.__locks[int(identifier[:GROUP_NIBBLES], 16) % LOCK_STRIPES]
+
+    def __safe_save(self, identifier: str, path: str, data: bytes):
         """returns the contents of a temp file and then moves the temp file into place
-        if not binary it is assumed to be json
+        The move is atomic, so readers see the old or new file, never a partial one
         """
-        mode = "wb" if binary else "w"
-        encoding = None if binary else "utf-8"
         basename, extension = os.path.splitext(path)
 
-        with self.__lock:
+        with self.__lock_of(identifier):
             while True:
                 temp_path = (
                     basename + f"_{random.randrange(0xffffffff):08x}" + extension
@@ -51,70 +77,19 @@ class Storage:
                 if not os.path.exists(temp_path):
                     break
 
-            with open(temp_path, mode, encoding=encoding) as data_file:
-                if binary:
-                    data_file.write(data)
-                else:
-                    json.dump(data, data_file)
+            with open(temp_path, "wb") as data_file:
+                data_file.write(data)
 
-            if os.path.isfile(path):
-                os.remove(path)
+            os.replace(temp_path, path)
 
-            os.rename(temp_path, path)
+    def __read_file(self, path: str) -> bytes:
+        """returns the contents of a file"""
+        try:
+            with open(path, "rb") as data_file:
+                return data_file.read()
 
-    def __read_file(self, path: str, binary: bool):
-        """returns the contents of a file
-        if not binary it is assumed to be json
-        """
-        mode = "rb" if binary else "r"
-        encoding = None if binary else "utf-8"
-
-        with self.__lock:
-            if not os.path.isfile(path):
-                return None
-
-            with open(path, mode, encoding=encoding) as data_file:
-                if binary:
-                    return data_file.read()
-
-                return json.load(data_file)
-
-    @staticmethod
-    def __like_file_path(identifier: str, data_dir: str):
-        return os.path.join(data_dir, identifier[GROUP_NIBBLES:] + LIKE_CACHE_EXT)
-
-    def __load_like_cache(self, like_path: str):
-        contents = self.__read_file(like_path, binary=False)
-        return {} if contents is None else contents
-
-    def __save_like_cache(self, identifier: str, like_path: str, *likes: dict):
-        os.makedirs(os.path.split(like_path)[0], exist_ok=True)
-        merged = {k: v for l in likes for k, v in l.items()}
-        top = list(merged)
-        top.sort(
-            key=lambda u: identifier_match_score(libernet.url.parse(u)[0], identifier),
-            reverse=True,
-        )
-
-        for url in top[MAX_LIKE:]:
-            del merged[url]  # remove everything after the top
-
-        self.__safe_save(like_path, merged, binary=False)
-        return merged
-
-    def __find_like_files(self, identifier: str, data_dir: str):
-        if not os.path.isdir(data_dir):
-            return {}
-
-        potential = [
-            identifier[:GROUP_NIBBLES] + n
-            for n in os.listdir(data_dir)
-            if len(n) == IDENTIFIER_SIZE - GROUP_NIBBLES
-        ]
-        return {
-            libernet.url.for_data_block(i): os.path.getsize(self.__path_of(i))
-            for i in potential
-        }
+        except FileNotFoundError:
+            return None
 
     def __setitem__(self, key: str, value: bytes):
         identifier, _, _, kind = libernet.url.parse(key)
@@ -125,28 +100,51 @@ class Storage:
 
         # we must overwrite every time because previous copy may be corrupt
         os.makedirs(self.__dir_of(identifier), exist_ok=True)
-        self.__safe_save(path, value, binary=True)
+        self.__safe_save(identifier, path, value)
+
+        if self.__index is not None:
+            self.__index.add(identifier)
+
+        self.__likes.add(identifier, len(value))
 
     def get(self, key: str, default: bytes = None) -> bytes:
         """Get the data for a given path"""
         identifier, _, _, _ = libernet.url.parse(key)
         assert len(identifier) == IDENTIFIER_SIZE, f"{len(identifier)} {identifier}"
+
+        if self.__index is not None and identifier not in self.__index:
+            return default
+
         path = self.__path_of(identifier)
-        contents = self.__read_file(path, binary=True)
+        contents = self.__read_file(path)
         return default if contents is None else contents
 
+    def open(self, key: str):
+        """Open the block for reading without reading it into memory
+        returns (binary file object, size in bytes) or None if not found
+        """
+        identifier, _, _, _ = libernet.url.parse(key)
+        assert len(identifier) == IDENTIFIER_SIZE, f"{len(identifier)} {identifier}"
+
+        if self.__index is not None and identifier not in self.__index:
+            return None
+
+        try:
+            # pylint: disable-next=consider-using-with
+            block_file = open(self.__path_of(identifier), "rb")
+
+        except FileNotFoundError:
+            return None
+
+        return block_file, os.fstat(block_file.fileno()).st_size
+
     def like(self, key: str, initial: dict = None) -> dict:
         """Gets list of identifiers that best match this one
-        initial - values to add to the cache
+        initial - values to add to the like index
         returns dictionary of urls to size of data on disk
         """
-        initial = {} if initial is None else initial
         identifier = libernet.url.parse(key)[0]
-        data_dir = self.__dir_of(identifier)
-        like_path = Storage.__like_file_path(identifier, data_dir)
-        cached = self.__load_like_cache(like_path)
-        on_disk = self.__find_like_files(identifier, data_dir)
-        return self.__save_like_cache(identifier, like_path, initial, cached, on_disk)
+        return self.__likes.like(identifier, MAX_LIKE, MIN_LIKE_SCORE, initial)
 
     def __getitem__(self, key: str) -> bytes:
         """Just calls get() to get data from server, after send queue is flushed"""
@@ -157,5 +155,26 @@ class Storage:
 
         return result
 
+    def __delitem__(self, key: str):
+        identifier = libernet.url.parse(key)[0]
+        assert len(identifier) == IDENTIFIER_SIZE, f"{len(identifier)} {identifier}"
+
+        try:
+            with self.__lock_of(identifier):
+                os.remove(self.__path_of(identifier))
+
+        except FileNotFoundError as error:
+            raise KeyError(f"{key} not found in {self.__path}") from error
+
+        if self.__index is not None:
+            self.__index.discard(identifier)
+
+        self.__likes.discard(identifier)
+
     def __contains__(self, key: str) -> bool:
-        return os.path.isfile(self.__path_of(libernet.url.parse(key)[0]))
+        identifier = libernet.url.parse(key)[0]
+
+        if self.__index is not None:
+            return identifier in self.__index
+
+        return os.path.isfile(self.__path_of(identifier))
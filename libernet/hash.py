@@ -15,14 +15,19 @@ def sha256_hasher(data):
     return Crypto.Hash.SHA256.new(data)
 
 
-def sha256_data_identifier(data):
-    """get sha256 identifier of data"""
-    identifier = sha256_hasher(data).hexdigest().lower()
+def hasher_identifier(hasher):
+    """get the identifier of the data fed to a hasher so far"""
+    identifier = hasher.hexdigest().lower()
     padded = ("" if len(identifier) % 2 == 0 else "0") + identifier
     assert not VALIDATE_IDENTIFIER_SIZE or len(padded) == IDENTIFIER_SIZE, len(padded)
     return padded
 
 
+def sha256_data_identifier(data):
+    """get sha256 identifier of data"""
+    return hasher_identifier(sha256_hasher(data))
+
+
 def binary_from_identifier(identifier):
     """get the binary form of an identifier"""
     assert (
@@ -31,11 +36,12 @@ def binary_from_identifier(identifier):
     return bytes.fromhex(("" if len(identifier) % 2 == 0 else "0") + identifier)
 
 
-def __identifier_to_bits(identifier):
-    """convert identifier to string that represents the binary"""
-    as_bytes = binary_from_identifier(identifier)
-    as_binary = [bin(b).lstrip("0b").zfill(8) for b in as_bytes]
-    return "".join(as_binary)
+def __identifier_to_int(identifier) -> (int, int):
+    """convert identifier to an integer and the width in bits of its binary form"""
+    assert (
+        not VALIDATE_IDENTIFIER_SIZE or len(identifier) == IDENTIFIER_SIZE
+    ), f"{len(identifier)} vs {IDENTIFIER_SIZE} {identifier}"
+    return int(identifier, 16), (len(identifier) + 1) // 2 * 8
 
 
 def identifier_match_score(id1, id2):
@@ -57,14 +63,20 @@ def identifier_match_score(id1, id2):
      31 456,467,984:1 (2) 4.3 hours
      33 912,935,968:1 (1) 8.7 hours
     """
-    bits1 = __identifier_to_bits(id1)
-    bits2 = __identifier_to_bits(id2)
-    widest = max(len(bits1), len(bits2))
-    padded_bits1 = bits1.zfill(widest)
-    padded_bits2 = bits2.zfill(widest)
+    value1, width1 = __identifier_to_int(id1)
+    value2, width2 = __identifier_to_int(id2)
+    return max(width1, width2) - (value1 ^ value2).bit_length()
+
+
+def identifier_match_scores(identifier, identifiers) -> [int]:
+    """score identifier against many identifiers
+    returns the identifier_match_score for each of identifiers, in order
+    """
+    value, width = __identifier_to_int(identifier)
+    scores = []
 
-    for index, bit1_2 in enumerate(zip(padded_bits1, padded_bits2)):
-        if bit1_2[0] != bit1_2[1]:
-            return index
+    for other in identifiers:
+        other_value, other_width = __identifier_to_int(other)
+        scores.append(max(width, other_width) - (value ^ other_value).bit_length())
 
-    return len(padded_bits1)
+    return scores
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+""" In-memory index of block identifiers
+"""
+
+
+import bisect
+import threading
+
+from libernet.hash import binary_from_identifier
+
+
+KEY_SIZE = 32  # bytes in a binary sha256 identifier
+MERGE_SIZE = 4096  # pending keys to collect before merging into the sorted keys
+
+
+# pylint: disable-next=too-many-arguments
+def nearest(key: bytes, below, above, count: int, minimum: int = 0) -> [bytes]:
+    """Find the keys with the longest common prefix with key
+    below - iterator of keys less than key, in descending order
+    above - iterator of keys not less than key, in ascending order
+    count - the maximum number of keys to return
+    minimum - the minimum number of leading bits that must match
+    Moving away from key in sorted order never increases the common prefix,
+        so we only need to take the better of the next key on each side.
+    returns the keys, best matches first
+    """
+    target = int.from_bytes(key, "big")
+    too_far = 1 << (len(key) * 8 - minimum)  # distance with fewer than minimum bits
+    lower = next(below, None)
+    upper = next(above, None)
+    found = []
+
+    def distance(other: bytes) -> int:  # smaller means a longer common prefix
+        return target ^ int.from_bytes(other, "big")
+
+    while len(found) < count and (lower is not None or upper is not None):
+        if upper is None or (lower is not None and distance(lower) < distance(upper)):
+            closest = lower
+            lower = next(below, None)
+        else:
+            closest = upper
+            upper = next(above, None)
+
+        if distance(closest) >= too_far:
+            break
+
+        found.append(closest)
+
+    return found
+
+
+def find(packed: bytearray, count: int, key: bytes) -> int:
+    """the index of the first of count sorted, packed keys that is not less than key"""
+    low = 0
+    high = count
+
+    while low < high:
+        middle = (low + high) // 2
+
+        if packed[middle * KEY_SIZE : (middle + 1) * KEY_SIZE] < key:
+            low = middle + 1
+        else:
+            high = middle
+
+    return low
+
+
+class BlockIndex:
+    """A set of block identifiers
+    Identifiers are kept as 32 byte keys packed, in order, into one bytearray.
+    Recently added keys are kept in a sorted list until MERGE_SIZE are pending.
+    """
+
+    def __init__(self, identifiers=()):
+        self.__packed = bytearray()
+        self.__count = 0
+        self.__pending = []  # sorted
+        self.__lock = threading.Lock()
+        self.update(identifiers)
+
+    def __key(self, index: int) -> bytes:
+        return self.__packed[index * KEY_SIZE : (index + 1) * KEY_SIZE]
+
+    def __find(self, key: bytes) -> int:
+        return find(self.__packed, self.__count, key)
+
+    def __pending_contains(self, key: bytes) -> bool:
+        index = bisect.bisect_left(self.__pending, key)
+        return index < len(self.__pending) and self.__pending[index] == key
+
+    def __packed_contains(self, key: bytes) -> bool:
+        index = self.__find(key)
+        return index < self.__count and self.__key(index) == key
+
+    def __merge(self):
+        """move the pending keys into the packed keys"""
+        keys = self.__pending
+        self.__pending = []
+
+        if self.__count == 0 or keys[0] > self.__key(self.__count - 1):
+            self.__packed.extend(b"".join(keys))
+            self.__count += len(keys)
+            return
+
+        pieces = []
+        start = 0
+
+        for key in keys:
+            position = self.__find(key) * KEY_SIZE
+            pieces.extend((memoryview(self.__packed)[start:position], key))
+            start = position
+
+        pieces.append(memoryview(self.__packed)[start:])
+        self.__packed = bytearray().join(pieces)
+        self.__count += len(keys)
+
+    def __add(self, key: bytes):
+        """add a key to the pending keys if it is not already packed"""
+        if self.__count > 0:
+            last = self.__key(self.__count - 1)
+
+            if key <= last and self.__packed_contains(key):
+                return
+
+        if self.__pending_contains(key):
+            return
+
+        bisect.insort(self.__pending, key)
+
+        if len(self.__pending) >= MERGE_SIZE:
+            self.__merge()
+
+    def add(self, identifier: str):
+        """add an identifier to the index"""
+        key = binary_from_identifier(identifier)
+
+        with self.__lock:
+            self.__add(key)
+
+    def discard(self, identifier: str):
+        """remove an identifier from the index if it is there"""
+        key = binary_from_identifier(identifier)
+
+        with self.__lock:
+            if self.__pending_contains(key):
+                del self.__pending[bisect.bisect_left(self.__pending, key)]
+
+            elif self.__packed_contains(key):
+                position = self.__find(key) * KEY_SIZE
+                del self.__packed[position : position + KEY_SIZE]
+                self.__count -= 1
+
+    def update(self, identifiers):
+        """add many identifiers to the index
+        This is fastest when the identifiers arrive in order.
+        """
+        with self.__lock:
+            for identifier in identifiers:
+                self.__add(binary_from_identifier(identifier))
+
+    def __contains__(self, identifier: str) -> bool:
+        key = binary_from_identifier(identifier)
+
+        with self.__lock:
+            return self.__pending_contains(key) or self.__packed_contains(key)
+
+    def nearest(self, identifier: str, count: int, minimum: int = 0) -> [str]:
+        """the count identifiers with the longest common prefix with identifier
+        minimum - the minimum number of leading bits that must match
+        """
+        key = binary_from_identifier(identifier)
+
+        with self.__lock:
+            position = self.__find(key)
+            below = (self.__key(i) for i in range(position - 1, -1, -1))
+            above = (self.__key(i) for i in range(position, self.__count))
+            found = nearest(key, below, above, count, minimum)
+            pending = self.__pending
+            position = bisect.bisect_left(pending, key)
+            below = (pending[i] for i in range(position - 1, -1, -1))
+            above = (pending[i] for i in range(position, len(pending)))
+            found.extend(nearest(key, below, above, count, minimum))
+
+        target = int.from_bytes(key, "big")
+        found.sort(key=lambda k: target ^ int.from_bytes(k, "big"))
+        return [k.hex() for k in found[:count]]
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__count + len(self.__pending)
+
+    def __iter__(self):
+        with self.__lock:
+            if self.__pending:
+                self.__merge()
+
+            packed = bytes(self.__packed)
+            count = self.__count
+
+        for index in range(0, count):
+            yield packed[index * KEY_SIZE : (index + 1) * KEY_SIZE].hex()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+""" Blocks known to be on a server, so they do not need to be sent again
+
+{path} - binary identifiers (32 bytes each), appended as blocks are found on the server
+
+The file is only read the first time it is needed.
+It is rewritten when blocks turn out not to be on the server (see discard()).
+"""
+
+
+import os
+import threading
+
+from libernet.index import BlockIndex, KEY_SIZE
+
+
+class KnownBlocks:
+    """A persistent set of identifiers of blocks a server has"""
+
+    def __init__(self, path: str):
+        self.__path = path
+        self.__index = None
+        self.__lock = threading.Lock()
+
+    def __load(self) -> BlockIndex:
+        """get the index, reading it from disk the first time (call with __lock held)"""
+        if self.__index is not None:
+            return self.__index
+
+        keys = b""
+
+        if os.path.isfile(self.__path):
+            with open(self.__path, "rb") as known_file:
+                keys = known_file.read()
+
+            complete = len(keys) - len(keys) % KEY_SIZE
+
+            if complete != len(keys):  # partially written last identifier
+                os.truncate(self.__path, complete)
+
+            keys = keys[:complete]
+
+        self.__index = BlockIndex(
+            sorted(keys[i : i + KEY_SIZE].hex() for i in range(0, len(keys), KEY_SIZE))
+        )
+        return self.__index
+
+    def __contains__(self, identifier: str) -> bool:
+        with self.__lock:
+            return identifier in self.__load()
+
+    def update(self, identifiers):
+        """record that the server has these blocks"""
+        with self.__lock:
+            index = self.__load()
+            new = list(dict.fromkeys(i for i in identifiers if i not in index))
+
+            if not new:
+                return
+
+            os.makedirs(os.path.dirname(self.__path) or ".", exist_ok=True)
+
+            with open(self.__path, "ab") as known_file:
+                known_file.write(b"".join(bytes.fromhex(i) for i in new))
+
+            index.update(new)
+
+    def add(self, identifier: str):
+        """record that the server has this block"""
+        self.update([identifier])
+
+    def difference_update(self, identifiers):
+        """record that the server does not have these blocks"""
+        with self.__lock:
+            index = self.__load()
+            lost = [i for i in dict.fromkeys(identifiers) if i in index]
+
+            if not lost:
+                return
+
+            for identifier in lost:
+                index.discard(identifier)
+
+            os.makedirs(os.path.dirname(self.__path) or ".", exist_ok=True)
+            temporary_path = self.__path + ".tmp"
+
+            with open(temporary_path, "wb") as known_file:
+                known_file.write(b"".join(bytes.fromhex(i) for i in index))
+
+            os.replace(temporary_path, self.__path)
+
+    def discard(self, identifier: str):
+        """record that the server does not have this block"""
+        self.difference_update([identifier])
+
+    def clear(self):
+        """forget every block (for a new or reset server)"""
+        with self.__lock:
+            self.__index = BlockIndex()
+
+            if os.path.isfile(self.__path):
+                os.remove(self.__path)
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__load())
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+""" Index of the blocks in each group directory for like() queries
+
+data/{group}/like.bin - records of binary identifier (32 bytes) and size (4 bytes)
+    a size of REMOVED means the block was removed
+
+Records are appended when a block is stored (or provided to like()),
+so like() never has to list the directory or rewrite a file.
+The first time a group without a like.bin is used,
+the directory (and any old .like.json caches) are scanned to create it.
+
+Groups are loaded into memory as they are needed and kept in sorted order,
+    packed into a bytearray of identifiers and an array of sizes.
+Each group has its own lock, so blocks in different groups are added at once.
+Since the groups are also in order, together they are a sorted index of all blocks.
+like() walks out from where the identifier would be, crossing into neighboring
+groups when needed, so a match with a different group prefix is still found.
+"""
+
+
+import os
+import json
+import array
+import struct
+import threading
+
+import libernet.url
+
+from libernet.hash import IDENTIFIER_SIZE
+from libernet.index import nearest, find, KEY_SIZE
+
+
+RECORD = struct.Struct(">32sI")  # binary identifier, size
+REMOVED = 0xFFFFFFFF  # size recorded when a block is removed
+LIKE_INDEX_NAME = "like.bin"
+LIKE_CACHE_EXT = ".like.json"  # old per-identifier caches of like() results
+
+
+class LikeGroup:
+    """The identifiers and sizes of the blocks in one group, in order"""
+
+    def __init__(self, records: dict):
+        ordered = sorted(records)
+        self.__keys = bytearray(b"".join(ordered))
+        self.__sizes = array.array("I", (records[k] for k in ordered))
+
+    def __key(self, index: int) -> bytes:
+        return bytes(self.__keys[index * KEY_SIZE : (index + 1) * KEY_SIZE])
+
+    def find(self, key: bytes) -> int:
+        """the index of the first key that is not less than key"""
+        return find(self.__keys, len(self.__sizes), key)
+
+    def size(self, key: bytes) -> int:
+        """the size of the block (None if it is not in the group)"""
+        index = self.find(key)
+
+        if index < len(self.__sizes) and self.__key(index) == key:
+            return self.__sizes[index]
+
+        return None
+
+    def set(self, key: bytes, size: int):
+        """add the block or change its size"""
+        index = self.find(key)
+
+        if index < len(self.__sizes) and self.__key(index) == key:
+            self.__sizes[index] = size
+            return
+
+        self.__keys[index * KEY_SIZE : index * KEY_SIZE] = key
+        self.__sizes.insert(index, size)
+
+    def remove(self, key: bytes):
+        """remove the block (it must be in the group)"""
+        index = self.find(key)
+        del self.__keys[index * KEY_SIZE : (index + 1) * KEY_SIZE]
+        del self.__sizes[index]
+
+    def before(self, key: bytes) -> bytes:
+        """the last key less than key (None if there is none)"""
+        index = self.find(key)
+        return self.__key(index - 1) if index > 0 else None
+
+    def after(self, key: bytes) -> bytes:
+        """the first key not less than key (None if there is none)"""
+        index = self.find(key)
+        return self.__key(index) if index < len(self.__sizes) else None
+
+    def __len__(self) -> int:
+        return len(self.__sizes)
+
+
+class LikeIndex:
+    """The identifiers and sizes of blocks, grouped like the data directory"""
+
+    def __init__(self, path: str, group_nibbles: int):
+        self.__path = path
+        self.__group_nibbles = group_nibbles
+        self.__groups = {}  # group -> LikeGroup
+        self.__locks = {}  # group -> Lock for loading and changing the group
+        self.__upgrades = []  # (identifier, size) found in other groups' caches
+        self.__lock = threading.Lock()
+
+    def __index_path(self, group: str) -> str:
+        return os.path.join(self.__path, group, LIKE_INDEX_NAME)
+
+    def __read(self, group: str) -> dict:
+        """read the records for a group"""
+        index_path = self.__index_path(group)
+
+        with open(index_path, "rb") as index_file:
+            records = index_file.read()
+
+        complete = len(records) - len(records) % RECORD.size
+
+        if complete != len(records):  # partially written last record
+            os.truncate(index_path, complete)
+
+        found = dict(RECORD.iter_unpack(records[:complete]))
+        return {k: s for k, s in found.items() if s != REMOVED}
+
+    def __scan(self, group: str) -> dict:
+        """find the blocks and old like caches in a group directory
+        entries from old like caches that are in other groups are queued to be added
+        """
+        group_dir = os.path.join(self.__path, group)
+        name_size = IDENTIFIER_SIZE - self.__group_nibbles
+        found = {}
+        upgrades = []
+
+        if not os.path.isdir(group_dir):
+            return found
+
+        for name in os.listdir(group_dir):
+            path = os.path.join(group_dir, name)
+
+            if len(name) == name_size:
+                found[bytes.fromhex(group + name)] = os.path.getsize(path)
+
+            elif name.endswith(LIKE_CACHE_EXT):
+                with open(path, "r", encoding="utf-8") as like_file:
+                    cached = json.load(like_file)
+
+                for url, size in cached.items():
+                    identifier = libernet.url.parse(url)[0]
+
+                    if identifier.startswith(group):
+                        found[bytes.fromhex(identifier)] = size
+                    else:
+                        upgrades.append((identifier, size))
+
+        temp_path = self.__index_path(group) + ".tmp"  # a crash leaves no short index
+
+        with open(temp_path, "wb") as index_file:
+            index_file.write(b"".join(RECORD.pack(*r) for r in found.items()))
+
+        os.replace(temp_path, self.__index_path(group))
+
+        with self.__lock:
+            self.__upgrades.extend(upgrades)
+
+        return found
+
+    def __lock_of(self, group: str) -> threading.Lock:
+        with self.__lock:
+            return self.__locks.setdefault(group, threading.Lock())
+
+    def __load(self, group: str) -> LikeGroup:
+        """get a group, reading it from disk the first time (call with its lock)"""
+        records = self.__groups.get(group, None)
+
+        if records is None:
+            if os.path.isfile(self.__index_path(group)):
+                records = LikeGroup(self.__read(group))
+            else:
+                records = LikeGroup(self.__scan(group))
+
+            self.__groups[group] = records
+
+        return records
+
+    def __upgrade(self):
+        """add the entries found in other groups' old like caches"""
+        while True:
+            with self.__lock:
+                if not self.__upgrades:
+                    return
+
+                identifier, size = self.__upgrades.pop()
+
+            self.__add(identifier, size)
+
+    def __group_name(self, number: int) -> str:
+        return f"{number:0{self.__group_nibbles}x}"
+
+    def __group_range(self, group: str, minimum: int) -> (int, int):
+        """first and last group that can have keys matching minimum bits of group"""
+        group_bits = self.__group_nibbles * 4
+        free_bits = max(0, group_bits - minimum)
+        first = int(group, 16) >> free_bits << free_bits
+        return first, first + (1 << free_bits) - 1
+
+    def __next(self, group: str, key: bytes, descending: bool) -> bytes:
+        """the key in a group before key (descending) or not less than key"""
+        with self.__lock_of(group):
+            records = self.__load(group)
+            return records.before(key) if descending else records.after(key)
+
+    def __walk(self, numbers, key: bytes, descending: bool):
+        """keys from key through the numbered groups, in order, one at a time
+        each group is only loaded once the keys before it have been used
+        """
+        for number in numbers:
+            group = self.__group_name(number)
+            self.__upgrade()  # groups scanned so far may have found keys in this one
+            found = self.__next(group, key, descending)
+
+            while found is not None:
+                yield found
+                key = found if descending else found + b"\x00"  # just after found
+                found = self.__next(group, key, descending)
+
+    def __descending(self, key: bytes, minimum: int):
+        """keys less than key, in descending order, that may match minimum bits"""
+        group = key.hex()[: self.__group_nibbles]
+        first, _ = self.__group_range(group, minimum)
+        return self.__walk(range(int(group, 16), first - 1, -1), key, True)
+
+    def __ascending(self, key: bytes, minimum: int):
+        """keys not less than key, in ascending order, that may match minimum bits"""
+        group = key.hex()[: self.__group_nibbles]
+        _, last = self.__group_range(group, minimum)
+        return self.__walk(range(int(group, 16), last + 1), key, False)
+
+    def __add(self, identifier: str, size: int):
+        group = identifier[: self.__group_nibbles]
+        key = bytes.fromhex(identifier)
+
+        with self.__lock_of(group):
+            records = self.__load(group)
+
+            if records.size(key) == size:
+                return
+
+            os.makedirs(os.path.join(self.__path, group), exist_ok=True)
+
+            with open(self.__index_path(group), "ab") as index_file:
+                index_file.write(RECORD.pack(key, size))
+
+            records.set(key, size)
+
+    def __size(self, key: bytes) -> int:
+        group = key.hex()[: self.__group_nibbles]
+
+        with self.__lock_of(group):
+            return self.__load(group).size(key)
+
+    def discard(self, identifier: str):
+        """record that a block is no longer available"""
+        group = identifier[: self.__group_nibbles]
+        key = bytes.fromhex(identifier)
+
+        with self.__lock_of(group):
+            records = self.__load(group)
+
+            if records.size(key) is None:
+                return
+
+            with open(self.__index_path(group), "ab") as index_file:
+                index_file.write(RECORD.pack(key, REMOVED))
+
+            records.remove(key)
+
+        self.__upgrade()
+
+    def add(self, identifier: str, size: int):
+        """record that a block of the given size is available"""
+        self.__add(identifier, size)
+        self.__upgrade()
+
+    # pylint: disable-next=too-many-arguments
+    def like(self, identifier: str, count: int, minimum: int, initial=None) -> dict:
+        """Gets the blocks that best match identifier (from any group)
+        count - the maximum number of blocks to return
+        minimum - the minimum number of leading bits that must match
+        initial - urls to sizes to add to the index
+        returns dictionary of urls to size of data
+        """
+        key = bytes.fromhex(identifier)
+
+        for url, size in (initial or {}).items():
+            self.__add(libernet.url.parse(url)[0], size)
+
+        self.__upgrade()
+        below = self.__descending(key, minimum)
+        above = self.__ascending(key, minimum)
+        found = nearest(key, below, above, count, minimum)
+        self.__upgrade()
+        sizes = {k: self.__size(k) for k in found}
+        return {
+            libernet.url.for_data_block(k.hex()): s
+            for k, s in sizes.items()
+            if s is not None  # discarded since it was found
+        }
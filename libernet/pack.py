@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+""" Stores blocks appended to large segment files
+
+pack/segment_000000.bin - records: header (identifier, size, crc32) then the data
+pack/index.bin - entries: identifier, segment, offset of data, size, crc32
+pack/like.json - like() results that were provided to us (initial)
+
+Blocks are appended to the last segment then the index entry is appended.
+If we crash between the two, the end of the last segment is rescanned on startup.
+A block's crc32 is checked whenever it is read (finding or opening it only uses
+    the index), a corrupt block is forgotten so it can be stored again.
+"""
+
+
+import io
+import os
+import json
+import struct
+import threading
+import zlib
+
+import libernet.url
+import libernet.disk
+
+from libernet.index import BlockIndex
+from libernet.hash import identifier_match_scores, IDENTIFIER_SIZE
+from libernet.hash import binary_from_identifier
+from libernet.url import LIKE
+
+
+SEGMENT_SIZE = 1024 * 1024 * 1024
+RECORD_HEADER = struct.Struct(">32sII")  # identifier, size, crc32
+INDEX_ENTRY = struct.Struct(">32sIQII")  # identifier, segment, offset, size, crc32
+SEGMENT_NAME = "segment_{:06d}.bin"
+INDEX_NAME = "index.bin"
+LIKE_NAME = "like.json"
+
+
+class BlockReader(io.RawIOBase):
+    """Read-only file object for one block in a segment file
+    Note: the crc32 is not checked when streaming a block
+    """
+
+    def __init__(self, descriptor: int, offset: int, size: int):
+        super().__init__()
+        self.__descriptor = descriptor
+        self.__position = offset
+        self.__end = offset + size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self.__end - self.__position)
+        data = os.pread(self.__descriptor, size, self.__position)
+        buffer[: len(data)] = data
+        self.__position += len(data)
+        return len(data)
+
+
+class Storage:  # pylint: disable=too-many-instance-attributes
+    """data storage in append-only segment files as a dict-like object"""
+
+    def __init__(self, path):
+        self.__path = os.path.join(path, "pack")
+        self.__lock = threading.Lock()
+        self.__blocks = {}  # identifier -> (segment, offset, size, crc32)
+        self.__readers = {}  # segment -> file descriptor
+        self.__likes = {}  # identifier -> {url: size} provided to like()
+        os.makedirs(self.__path, exist_ok=True)
+        self.__segment = self.__load_index()
+        self.__recover()
+        self.__sorted = BlockIndex(sorted(self.__blocks))  # for like()
+        # pylint: disable=consider-using-with
+        self.__writer = open(self.__segment_path(self.__segment), "ab")
+        self.__index = open(os.path.join(self.__path, INDEX_NAME), "ab")
+        self.__load_likes()
+
+    def __segment_path(self, segment: int) -> str:
+        return os.path.join(self.__path, SEGMENT_NAME.format(segment))
+
+    def __remember(self, key: bytes, location: tuple):
+        identifier = key.hex()
+        self.__blocks[identifier] = location
+
+    def __load_index(self) -> int:
+        """load the index entries, returns the last segment in the index"""
+        index_path = os.path.join(self.__path, INDEX_NAME)
+        last_segment = 0
+
+        if not os.path.isfile(index_path):
+            return last_segment
+
+        with open(index_path, "rb") as index_file:
+            entries = index_file.read()
+
+        complete = len(entries) - len(entries) % INDEX_ENTRY.size
+
+        if complete != len(entries):  # partially written last entry
+            os.truncate(index_path, complete)
+
+        for key, *location in INDEX_ENTRY.iter_unpack(entries[:complete]):
+            self.__remember(key, tuple(location))
+            last_segment = max(last_segment, location[0])
+
+        return last_segment
+
+    def __recover(self):
+        """add records written after the last index entry, drop partial records"""
+        while os.path.isfile(self.__segment_path(self.__segment + 1)):
+            self.__segment += 1
+
+        path = self.__segment_path(self.__segment)
+        indexed_end = max(
+            (o + s for g, o, s, _ in self.__blocks.values() if g == self.__segment),
+            default=0,
+        )
+        recovered = []
+
+        if not os.path.isfile(path):
+            return
+
+        with open(path, "rb") as segment_file:
+            segment_file.seek(indexed_end)
+
+            while True:
+                header = segment_file.read(RECORD_HEADER.size)
+
+                if len(header) < RECORD_HEADER.size:
+                    break
+
+                key, size, crc = RECORD_HEADER.unpack(header)
+                data = segment_file.read(size)
+
+                if len(data) < size or zlib.crc32(data) != crc:
+                    break
+
+                offset = indexed_end + RECORD_HEADER.size
+                recovered.append((key, (self.__segment, offset, size, crc)))
+                indexed_end = offset + size
+
+        os.truncate(path, indexed_end)
+
+        with open(os.path.join(self.__path, INDEX_NAME), "ab") as index_file:
+            for key, location in recovered:
+                index_file.write(INDEX_ENTRY.pack(key, *location))
+                self.__remember(key, location)
+
+    def __load_likes(self):
+        like_path = os.path.join(self.__path, LIKE_NAME)
+
+        if os.path.isfile(like_path):
+            with open(like_path, "r", encoding="utf-8") as like_file:
+                self.__likes = json.load(like_file)
+
+    def __save_likes(self):
+        like_path = os.path.join(self.__path, LIKE_NAME)
+        temp_path = like_path + ".tmp"
+
+        with open(temp_path, "w", encoding="utf-8") as like_file:
+            json.dump(self.__likes, like_file)
+
+        os.replace(temp_path, like_path)
+
+    def __reader(self, segment: int) -> int:
+        """get a file descriptor to read the segment"""
+        reader = self.__readers.get(segment, None)
+
+        if reader is None:
+            with self.__lock:
+                reader = self.__readers.get(segment, None)
+
+                if reader is None:
+                    reader = os.open(self.__segment_path(segment), os.O_RDONLY)
+                    self.__readers[segment] = reader
+
+        return reader
+
+    def __forget(self, identifier: str, location: tuple):
+        """drop a corrupt block (unless it has been stored again since)"""
+        with self.__lock:
+            if self.__blocks.get(identifier, None) == location:
+                del self.__blocks[identifier]
+                self.__sorted.discard(identifier)
+
+    def __read(self, identifier: str) -> bytes:
+        """the block's data, None if not found or corrupt"""
+        location = self.__blocks.get(identifier, None)
+
+        if location is None:
+            return None
+
+        segment, offset, size, crc = location
+        contents = os.pread(self.__reader(segment), size, offset)
+
+        if zlib.crc32(contents) != crc:
+            self.__forget(identifier, location)
+            return None
+
+        return contents
+
+    def __setitem__(self, key: str, value: bytes):
+        identifier, _, _, kind = libernet.url.parse(key)
+        assert len(identifier) == IDENTIFIER_SIZE, f"{len(identifier)} {identifier}"
+        assert kind != LIKE
+        binary = binary_from_identifier(identifier)
+        crc = zlib.crc32(value)
+        existing = self.__blocks.get(identifier, None)
+
+        if existing is not None and existing[2:] == (len(value), crc):
+            return
+
+        with self.__lock:
+            if self.__writer.tell() + RECORD_HEADER.size + len(value) > SEGMENT_SIZE:
+                self.__writer.close()
+                self.__segment += 1
+                # pylint: disable-next=consider-using-with
+                self.__writer = open(self.__segment_path(self.__segment), "ab")
+
+            offset = self.__writer.tell() + RECORD_HEADER.size
+            location = (self.__segment, offset, len(value), crc)
+            self.__writer.write(RECORD_HEADER.pack(binary, len(value), crc) + value)
+            self.__writer.flush()
+            self.__index.write(INDEX_ENTRY.pack(binary, *location))
+            self.__index.flush()
+            self.__remember(binary, location)
+            self.__sorted.add(identifier)
+
+    def get(self, key: str, default: bytes = None) -> bytes:
+        """Get the data for a given path"""
+        identifier, _, _, _ = libernet.url.parse(key)
+        assert len(identifier) == IDENTIFIER_SIZE, f"{len(identifier)} {identifier}"
+        contents = self.__read(identifier)
+        return default if contents is None else contents
+
+    def open(self, key: str):
+        """Open the block for reading without reading it into memory
+        returns (binary file object, size in bytes) or None if not found
+        """
+        identifier, _, _, _ = libernet.url.parse(key)
+        assert len(identifier) == IDENTIFIER_SIZE, f"{len(identifier)} {identifier}"
+        location = self.__blocks.get(identifier, None)
+
+        if location is None:
+            return None
+
+        segment, offset, size, _ = location
+        return BlockReader(self.__reader(segment), offset, size), size
+
+    def like(self, key: str, initial: dict = None) -> dict:
+        """Gets list of identifiers that best match this one
+        initial - values to add to the results
+        returns dictionary of urls to size of data
+        """
+        identifier = libernet.url.parse(key)[0]
+        nearest = self.__sorted.nearest(
+            identifier, libernet.disk.MAX_LIKE, libernet.disk.MIN_LIKE_SCORE
+        )
+        locations = {i: self.__blocks.get(i, None) for i in nearest}
+        found = {  # a block may have been found to be corrupt since
+            libernet.url.for_data_block(i): l[2] for i, l in locations.items() if l
+        }
+
+        with self.__lock:
+            provided = self.__likes.get(identifier, {})
+            added = {k: v for k, v in (initial or {}).items() if k not in provided}
+
+            if added:
+                self.__likes[identifier] = {**provided, **added}
+                self.__save_likes()
+
+            found.update(self.__likes.get(identifier, {}))
+
+        top = list(found)
+        scores = dict(
+            zip(
+                top,
+                identifier_match_scores(
+                    identifier, [libernet.url.parse(u)[0] for u in top]
+                ),
+            )
+        )
+        top.sort(key=scores.get, reverse=True)
+        return {u: found[u] for u in top[: libernet.disk.MAX_LIKE]}
+
+    def __getitem__(self, key: str) -> bytes:
+        result = self.get(key)
+
+        if result is None:
+            raise KeyError(f"{key} not found in {self.__path}")
+
+        return result
+
+    def __contains__(self, key: str) -> bool:
+        return libernet.url.parse(key)[0] in self.__blocks
+
+    def close(self):
+        """close all open files"""
+        with self.__lock:
+            self.__writer.close()
+            self.__index.close()
+
+            for reader in self.__readers.values():
+                os.close(reader)
+
+            self.__readers = {}
@@ -12,32 +12,125 @@ import json
 import requests
 
 import libernet.url
-
-
-class Storage(threading.Thread):
-    """Proxy storage class to remote server"""
-
-    def __init__(self, server: str, port: int):
+import libernet.batch
+import libernet.disk
+
+from libernet.hash import identifier_match_scores
+
+
+UPLOADERS = 4  # concurrent PUT requests
+MAX_QUEUED_BYTES = 64 * 1024 * 1024  # waiting to be sent before we block (or spill)
+
+
+class Storage(threading.Thread):  # pylint: disable=too-many-instance-attributes
+    """Proxy storage class to remote server
+    uploaders - the number of concurrent PUT requests
+    max_queued_bytes - the most data to hold in memory waiting to be sent
+    spill - a storage to hold data to be sent when max_queued_bytes are queued
+            (instead of blocking), blocks are removed from it once they are sent
+    known - a KnownBlocks of blocks the server has, they are not sent again
+            blocks are added as they are sent or found on the server (see warm())
+            and removed when the server says it does not have them
+    Reads do not wait for queued data to be sent,
+        data that is still waiting to be sent is returned from memory (or spill).
+    """
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(
+        self,
+        server: str,
+        port: int,
+        uploaders=UPLOADERS,
+        max_queued_bytes=MAX_QUEUED_BYTES,
+        spill=None,
+        known=None,
+    ):
         self.__base_url = f"http://{server}:{port}"
         self.__running = True
+        self.__uploaders = uploaders
         self.__session = requests.Session()
         self.__session_lock = threading.Lock()
-        self.__input = queue.Queue()
-        self.__event = threading.Event()
+        self.__input = queue.Queue()  # (key, data or None if spilled)
+        self.__spill = spill
+        self.__known = known
+        self.__max_queued_bytes = max_queued_bytes
+        self.__queued_bytes = 0
+        self.__pending = {}  # key -> [times queued, data or None if spilled, size]
+        self.__space = threading.Condition()  # notified when data has been sent
         threading.Thread.__init__(self)
         self.daemon = False  # make sure we can send all data before shutting down
         self.start()
 
     def __setitem__(self, key: str, value: bytes):
-        """Queues data to be sent"""
+        """Queues data to be sent
+        blocks (or spills) while max_queued_bytes are waiting to be sent
+        """
         assert self.__running, "Proxy has been shutdown()"
-        self.__input.put((key, value))
-        self.__event.clear()
+
+        if self.__known is not None and libernet.url.parse(key)[0] in self.__known:
+            return
+
+        with self.__space:
+            spilled = (
+                self.__spill is not None
+                and self.__queued_bytes + len(value) > self.__max_queued_bytes
+            )
+
+            while (
+                not spilled
+                and self.__queued_bytes > 0
+                and self.__queued_bytes + len(value) > self.__max_queued_bytes
+            ):
+                self.__space.wait()
+
+            if not spilled:
+                self.__queued_bytes += len(value)
+                self.__remember(key, value, len(value))
+
+        if spilled:
+            self.__spill[key] = value
+
+            with self.__space:  # only after it can be read from spill
+                self.__remember(key, None, len(value))
+
+            self.__input.put((key, None))
+        else:
+            self.__input.put((key, value))
+
+    def __remember(self, key: str, value: bytes, size: int):
+        """track data waiting to be sent (call with __space held)"""
+        pending = self.__pending.setdefault(key, [0, None, size])
+        pending[0] += 1
+        pending[1] = value if pending[1] is None else pending[1]
+
+    def __forget(self, key: str):
+        """data has been sent (call with __space held)"""
+        pending = self.__pending[key]
+        pending[0] -= 1
+
+        if pending[0] == 0:
+            del self.__pending[key]
+
+    def __get_pending(self, key: str) -> bytes:
+        """data waiting to be sent or None if it is not (or no longer) waiting"""
+        with self.__space:
+            pending = self.__pending.get(key, None)
+
+        if pending is None:
+            return None
+
+        if pending[1] is not None:
+            return pending[1]
+
+        return self.__spill.get(key)  # None if sent since we looked
 
     def get(self, key: str, default: bytes = None) -> bytes:
-        """Waits for all sent items to be flushed then requests data"""
+        """Get data waiting to be sent or request the data from the server"""
         assert self.__running, "Proxy has been shutdown()"
-        self.__event.wait()  # wait for all sent items to be flushed
+        pending = self.__get_pending(key)
+
+        if pending is not None:
+            return pending
 
         with self.__session_lock:
             response = self.__session.get(self.__base_url + key)
@@ -47,24 +140,152 @@ class Storage(threading.Thread):
 
         return response.content
 
+    def get_many(self, keys: list) -> list:
+        """Get many blocks, requesting the ones not waiting to be sent
+        returns the data for each key (None if not found)
+        """
+        assert self.__running, "Proxy has been shutdown()"
+        results = [self.__get_pending(k) for k in keys]
+        needed = [i for i, r in enumerate(results) if r is None]
+        found = self.__request_many([keys[i] for i in needed])
+
+        for index, data in zip(needed, found):
+            results[index] = data
+
+        return results
+
+    def __request_many(self, keys: list) -> list:
+        """request many blocks from the server, None for each block not found"""
+        results = []
+
+        for start in range(0, len(keys), libernet.batch.MAX_BATCH):
+            identifiers = [
+                libernet.url.parse(k)[0]
+                for k in keys[start : start + libernet.batch.MAX_BATCH]
+            ]
+
+            with self.__session_lock:
+                with self.__session.post(
+                    f"{self.__base_url}/{libernet.url.SHA256}/many",
+                    data=libernet.batch.pack_identifiers(identifiers),
+                    stream=True,
+                ) as response:
+                    if response.status_code != 200:
+                        results.extend(None for _ in identifiers)
+                        continue
+
+                    results.extend(
+                        libernet.batch.read_frames(response.raw, len(identifiers))
+                    )
+
+        return results
+
+    def contains_many(self, keys: list) -> list:
+        """Checks for many blocks, asking the server about those not waiting to be sent
+        returns if each key exists (or will once it is sent)
+        """
+        assert self.__running, "Proxy has been shutdown()"
+
+        with self.__space:
+            results = [k in self.__pending for k in keys]
+
+        needed = [i for i, r in enumerate(results) if not r]
+        found = self.__request_contains_many([keys[i] for i in needed])
+
+        for index, exists in zip(needed, found):
+            results[index] = bool(exists)
+
+        self.__found([keys[i] for i, e in zip(needed, found) if e])
+        self.__lost([keys[i] for i, e in zip(needed, found) if e is False])
+        return results
+
+    def warm(self, keys: list):
+        """find which of these blocks the server has, so they are not sent again
+        (and which it no longer has, so they are)
+        """
+        assert self.__known is not None, "No KnownBlocks to warm"
+        self.contains_many(keys)
+
+    def known_blocks(self) -> int:
+        """how many blocks the server is known to have (None if they are not kept)"""
+        return None if self.__known is None else len(self.__known)
+
+    def __found(self, keys: list):
+        """remember that the server has these blocks"""
+        if self.__known is not None:
+            self.__known.update(libernet.url.parse(k)[0] for k in keys)
+
+    def __lost(self, keys: list):
+        """the server does not have these blocks (even if it did)"""
+        if self.__known is not None and keys:
+            self.__known.difference_update(libernet.url.parse(k)[0] for k in keys)
+
+    def __request_contains_many(self, keys: list) -> list:
+        """ask the server if it has each of the blocks (None if it did not answer)"""
+        results = []
+
+        for start in range(0, len(keys), libernet.batch.MAX_BATCH):
+            identifiers = [
+                libernet.url.parse(k)[0]
+                for k in keys[start : start + libernet.batch.MAX_BATCH]
+            ]
+
+            with self.__session_lock:
+                response = self.__session.post(
+                    f"{self.__base_url}/{libernet.url.SHA256}/exists",
+                    data=libernet.batch.pack_identifiers(identifiers),
+                )
+
+            if response.status_code != 200:
+                results.extend(None for _ in identifiers)
+                continue
+
+            results.extend(
+                libernet.batch.unpack_bitmap(response.content, len(identifiers))
+            )
+
+        return results
+
     def like(self, key: str) -> dict:
-        """gets a list of keys that are best-matches to given key"""
+        """gets a list of keys that are best-matches to given key
+        includes matching data that is waiting to be sent
+        """
         assert self.__running, "Proxy has been shutdown()"
-        self.__event.wait()  # wait for all sent items to be flushed
         identifier, _, _, _ = libernet.url.parse(key)
+        pending = self.__pending_like(identifier)  # before sent data leaves pending
 
         with self.__session_lock:
             response = self.__session.get(
                 f"{self.__base_url}{libernet.url.for_data_block(identifier, like=True)}"
             )
 
-        if response.status_code != 200:
-            return {}
+        found = {}
 
-        return json.loads(response.content.decode("utf-8"))
+        if response.status_code == 200:
+            found = json.loads(response.content.decode("utf-8"))
+
+        found.update(pending)
+        return found
+
+    def __pending_like(self, identifier: str) -> dict:
+        """the urls and sizes of data waiting to be sent that match identifier"""
+        url_size = len(libernet.url.for_data_block(identifier))
+
+        with self.__space:
+            pending = {
+                k: p[2]
+                for k, p in self.__pending.items()
+                if len(k) == url_size and k.startswith(f"/{libernet.url.SHA256}/")
+            }
+
+        scores = identifier_match_scores(identifier, [k.split("/")[2] for k in pending])
+        matches = sorted(
+            (s, k) for s, k in zip(scores, pending) if s >= libernet.disk.MIN_LIKE_SCORE
+        )
+        return {k: pending[k] for _, k in matches[-libernet.disk.MAX_LIKE :]}
 
     def __getitem__(self, key: str) -> bytes:
-        """Just calls get() to get data from server, after send queue is flushed"""
+        """Just calls get() to get data from the queue or server"""
         assert self.__running, "Proxy has been shutdown()"
         result = self.get(key)
 
@@ -74,76 +295,110 @@ class Storage(threading.Thread):
         return result
 
     def __contains__(self, key: str) -> bool:
-        """Does the block exist in the server"""
+        """Does the block exist in the server (or is it waiting to be sent)"""
         assert self.__running, "Proxy has been shutdown()"
-        self.__event.wait()  # wait for all sent items to be flushed
+
+        with self.__space:
+            if key in self.__pending:
+                return True
 
         with self.__session_lock:
             response = self.__session.head(self.__base_url + key)
 
-        return response.status_code == 200
-
-    def __fetch_message(self, block=False) -> (bytes, str):
-        """Get a message from the queue and return None if not blocking"""
-        try:
-            return self.__input.get(block=block)
-        except queue.Empty:
-            return None
-
-    def __fetch_messages(self) -> [(bytes, str)]:
-        """Get all pending messages in the queue"""
-        self.__event.set()
-        first_message = self.__fetch_message(block=True)
-        self.__event.clear()
-        messages = [first_message]
-
-        while True:
-            message = self.__fetch_message()
-
-            if message is None:
-                break
+        if response.status_code == 200:
+            self.__found([key])
 
-            messages.append(message)
+        else:  # sending it again is safer than assuming the server has it
+            self.__lost([key])
 
-        return messages
+        return response.status_code == 200
 
     def active(self) -> bool:
         """Are we still processing"""
         if self.__running:
             return True
 
-        return self.__input.qsize() > 0
+        return self.__input.unfinished_tasks > 0
 
     def shutdown(self):
         """no more messages will be sent"""
         self.__running = False
         self.__input.put(None)
 
+    def __send(self, session: requests.Session, key: str, value: bytes):
+        logging.info(
+            "Sending %d bytes of data to %s", len(value), self.__base_url + key
+        )
+        response = session.put(self.__base_url + key, data=value)
+
+        if response.status_code == 200:
+            self.__found([key])
+
+        else:
+            logging.warning(
+                "Sending %d bytes of data to %s -> %d: %s",
+                len(value),
+                self.__base_url + key,
+                response.status_code,
+                response.content,
+            )
+
+    def __send_message(self, session: requests.Session, key: str, value: bytes):
+        """send queued data (or spilled data if value is None)"""
+        if value is not None:
+            try:
+                self.__send(session, key, value)
+
+            finally:  # even if sending failed, or the space is never given back
+                with self.__space:
+                    self.__queued_bytes -= len(value)
+                    self.__forget(key)
+                    self.__space.notify_all()
+
+            return
+
+        spilled = self.__spill.get(key)
+
+        if spilled is not None:  # None if the same block was spilled twice and sent
+            self.__send(session, key, spilled)
+
+        with self.__space:
+            self.__forget(key)
+
+        try:
+            del self.__spill[key]
+
+        except KeyError:  # the same block was spilled twice and already removed
+            pass
+
+    def __upload(self):
+        """An upload thread, sends queued data until shutdown"""
+        with requests.Session() as session:
+            while True:
+                message = self.__input.get()
+
+                try:
+                    if message is None:
+                        self.__input.put(None)  # let the other uploaders know
+                        break
+
+                    self.__send_message(session, *message)
+
+                finally:
+                    self.__input.task_done()
+
     def run(self):
-        """The queued data-send thread"""
-        while self.active():
-            messages = self.__fetch_messages()
-
-            for message in messages:
-                if message is None:
-                    continue
-
-                logging.info(
-                    "Sending %d bytes of data to %s",
-                    len(message[1]),
-                    self.__base_url + message[0],
-                )
+        """Runs the upload threads until shutdown and everything is sent"""
+        uploaders = [
+            threading.Thread(target=self.__upload, daemon=False)
+            for _ in range(0, self.__uploaders)
+        ]
 
-                with self.__session_lock:
-                    response = self.__session.put(
-                        self.__base_url + message[0], data=message[1]
-                    )
+        for uploader in uploaders:
+            uploader.start()
 
-                if response.status_code != 200:
-                    logging.warning(
-                        "Sending %d bytes of data to %s -> %d: %s",
-                        len(message[1]),
-                        self.__base_url + message[0],
-                        response.status_code,
-                        response.content,
-                    )
+        for uploader in uploaders:
+            uploader.join()
+
+        self.__input.get()  # the shutdown marker passed along by the last uploader
+        self.__input.task_done()
@@ -14,9 +14,12 @@ import zipfile
 from zipfile import ZipFile
 
 import flask
+import werkzeug.wsgi
 
 import libernet.url
 import libernet.message
+import libernet.pack
+import libernet.batch
 
 from libernet.disk import Storage
 from libernet.url import SHA256, LIKE
@@ -27,12 +30,80 @@ JSON_MIMETYPE = "application/json"
 DEFAULT_PORT = 8042
 DEFAULT_STORAGE = os.path.join(os.environ["HOME"], ".libernet")
 ONE_GIGABYTE = 1024 * 1024 * 1024
+DISK_BACKEND = "disk"
+PACK_BACKEND = "pack"
+BACKENDS = [DISK_BACKEND, PACK_BACKEND]
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def __stream_blocks(storage, identifiers: list):
+    """yields the framed blocks for a /sha256/many response"""
+    for identifier in identifiers:
+        opened = storage.open(libernet.url.for_data_block(identifier))
+
+        if opened is None:
+            yield libernet.batch.frame_header(None)
+            continue
+
+        block_file, size = opened
+        yield libernet.batch.frame_header(size)
+
+        with block_file:
+            while True:
+                chunk = block_file.read(STREAM_CHUNK_SIZE)
+
+                if not chunk:
+                    break
+
+                yield chunk
 
 
 def create_app(storage: Storage, messages: libernet.message.Center):
     """Creates the Flask app"""
     app = flask.Flask(__name__)
 
+    def send_request_messages(identifiers: list, found: list):
+        for identifier, was_found in zip(identifiers, found):
+            messages.send(
+                {
+                    "type": "request",
+                    "style": "data",
+                    "method": SHA256,
+                    "identifier": identifier,
+                    "found": was_found,
+                    "node": None,  # TODO: add node identifier  # pylint: disable=fixme
+                    "address": None,  # TODO: add inet address  # pylint: disable=fixme
+                }
+            )
+
+    @app.route(f"/{SHA256}/many", methods=["POST"])
+    def post_sha256_many():
+        """Return many blocks in one response (see libernet.batch)"""
+        identifiers = libernet.batch.unpack_identifiers(flask.request.get_data())
+
+        if identifiers is None:
+            return "Invalid list of identifiers", 400
+
+        send_request_messages(
+            identifiers,
+            [libernet.url.for_data_block(i) in storage for i in identifiers],
+        )
+        return flask.Response(
+            __stream_blocks(storage, identifiers), mimetype=DATA_MIMETYPE
+        )
+
+    @app.route(f"/{SHA256}/exists", methods=["POST"])
+    def post_sha256_exists():
+        """Return a bitmap of which blocks are available (see libernet.batch)"""
+        identifiers = libernet.batch.unpack_identifiers(flask.request.get_data())
+
+        if identifiers is None:
+            return "Invalid list of identifiers", 400
+
+        found = [libernet.url.for_data_block(i) in storage for i in identifiers]
+        send_request_messages(identifiers, found)
+        return flask.Response(libernet.batch.pack_bitmap(found), mimetype=DATA_MIMETYPE)
+
     @app.route(f"/{SHA256}/<path:path>", methods=["GET"])
     def get_sha256(path: str):
         """Return the requested data"""
@@ -60,9 +131,9 @@ def create_app(storage: Storage, messages: libernet.message.Center):
             )
             return response
 
-        contents = storage.get(data_block_url)
+        opened = storage.open(data_block_url)
 
-        if contents is None:
+        if opened is None:
             messages.send(
                 {
                     "type": "request",
@@ -76,7 +147,13 @@ def create_app(storage: Storage, messages: libernet.message.Center):
             )
             return "Data not currently on node", 504
 
-        response = flask.Response(contents, mimetype=DATA_MIMETYPE)
+        block_file, size = opened
+        response = flask.Response(
+            werkzeug.wsgi.wrap_file(flask.request.environ, block_file),
+            mimetype=DATA_MIMETYPE,
+            direct_passthrough=True,  # stream the file, do not read it into memory
+        )
+        response.content_length = size
         response.status = 200
         messages.send(
             {
@@ -132,13 +209,21 @@ def rotate(path):
     return zip_path
 
 
+def create_storage(args):
+    """Create the block storage selected by the arguments"""
+    if getattr(args, "backend", DISK_BACKEND) == PACK_BACKEND:
+        return libernet.pack.Storage(args.storage)
+
+    return Storage(args.storage, index=getattr(args, "index", False))
+
+
 def serve(args):  # NOT TESTED (not reported as tested, tested in tests/test_proxy.py)
     """Start the libernet web server"""
     log_path = os.path.join(args.storage, "log.txt")
     rotate(log_path)
     log_level = logging.DEBUG if args.debug else logging.WARNING
     logging.basicConfig(filename=log_path, level=log_level)
-    storage = Storage(args.storage)
+    storage = create_storage(args)
     messages = libernet.message.Center()
     libernet.message.Logger(messages)
     app = create_app(storage, messages)
@@ -215,6 +300,20 @@ def get_arg_parser():
         default=DEFAULT_STORAGE,
         help=f"Directory to store data (default {DEFAULT_STORAGE})",
     )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=BACKENDS,
+        default=DISK_BACKEND,
+        help=f"How blocks are stored on disk (default {DISK_BACKEND})",
+    )
+    parser.add_argument(
+        "-i",
+        "--index",
+        default=False,
+        action="store_true",
+        help="Keep an in-memory index of the stored blocks.",
+    )
     parser.add_argument(
         "-d", "--debug", default=False, action="store_true", help="Run debug serve."
     )
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+""" The files of the last backup of a source, so it does not need to be inflated
+
+{path} - json {"url": url of the backup, "files": {relative path: file entry}}
+
+File entries include the local only keys (see bundle.create(files=)),
+    so unchanged files are found exactly, without fetching anything.
+The files are only used for the backup they were saved for.
+"""
+
+
+import json
+import os
+
+from libernet.bundle import FILES, URL
+
+
+class StatCache:
+    """The files of a backup, kept next to the settings"""
+
+    def __init__(self, path: str):
+        self.__path = path
+
+    def load(self, url: str) -> dict:
+        """a bundle-like {"files": ...} of the backup at url (None if not saved)"""
+        try:
+            with open(self.__path, "r", encoding="utf-8") as cache_file:
+                cached = json.load(cache_file)
+
+        except (FileNotFoundError, ValueError):  # missing or partially written
+            return None
+
+        if not isinstance(cached, dict) or cached.get(URL, None) != url:
+            return None
+
+        return {FILES: cached.get(FILES, {})}
+
+    def save(self, url: str, files: dict):
+        """record the files of the backup at url"""
+        os.makedirs(os.path.dirname(self.__path) or ".", exist_ok=True)
+        temporary_path = self.__path + ".tmp"
+
+        with open(temporary_path, "w", encoding="utf-8") as cache_file:
+            json.dump({URL: url, FILES: files}, cache_file, separators=(",", ":"))
+
+        os.replace(temporary_path, self.__path)
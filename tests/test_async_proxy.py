@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+
+import asyncio
+import time
+
+from random import randbytes
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from multiprocessing import Process
+
+from libernet.server import serve
+from libernet.block import store, fetch
+from libernet.async_proxy import Storage
+from libernet.hash import sha256_data_identifier
+from libernet.url import address_of
+
+SERVER_PORT = 4243
+STARTUP_WAIT = 0.200  # seconds
+SHUTDOWN_WAIT = 0.100  # seconds
+
+
+def test_basics():
+    test_set = [randbytes(c * 4099) for c in range(0, 40)]
+    test_set.extend(('testing '*c).encode('utf-8') for c in range(0, 100))
+    missing = f"/sha256/{sha256_data_identifier(b'no way')}"
+
+    with TemporaryDirectory() as working_dir:
+        server = Process(target=serve,
+                args=(SimpleNamespace(storage=working_dir, port=SERVER_PORT, debug=False),))
+        server.start()
+        time.sleep(STARTUP_WAIT)  # wait for the server to come up
+        proxy = Storage("localhost", SERVER_PORT, 4, 8)
+        urls = []
+
+        for data in test_set:
+            urls.append(store(data, proxy, encrypt=False)[0])
+            assert address_of(urls[-1]) in proxy
+            assert fetch(urls[-1], proxy) == data
+
+        proxy.flush()
+        addresses = [address_of(u) for u in urls]
+
+        for url, data in zip(urls, test_set):
+            assert address_of(url) in proxy
+            assert fetch(url, proxy) == data
+            found = proxy.like(address_of(url))
+            assert address_of(url) in found, f"{address_of(url)} vs {found}"
+
+        assert proxy.contains_many(addresses + [missing]) == [True] * len(urls) + [False]
+        blocks = proxy.get_many(addresses + [missing])
+        assert blocks == [proxy[a] for a in addresses] + [None]
+        assert missing not in proxy
+        assert proxy.get(missing) is None
+
+        try:
+            value = proxy[missing]
+            assert False, f"We got {value} but should not have"
+        except KeyError:
+            pass
+
+        async def use_async():
+            assert await proxy.acontains(addresses[0])
+            assert not await proxy.acontains(missing)
+            await proxy.aput(addresses[0], proxy[addresses[0]])
+            results = await proxy.aget_many(addresses)
+            assert results == blocks[:-1]
+            assert await proxy.acontains_many(addresses) == [True] * len(addresses)
+            assert addresses[1] in await proxy.alike(addresses[1])
+            await proxy.aclose()
+
+        asyncio.run(use_async())
+        asyncio.run(use_async())  # new event loop, new connections
+        proxy.shutdown()
+        proxy.shutdown()
+        server.kill()
+        time.sleep(SHUTDOWN_WAIT)  # wait for the server to shutdown
+
+
+def test_errors():
+    with TemporaryDirectory() as working_dir:
+        server = Process(target=serve,
+                args=(SimpleNamespace(storage=working_dir, port=SERVER_PORT, debug=False),))
+        server.start()
+        time.sleep(STARTUP_WAIT)  # wait for the server to come up
+        proxy = Storage("localhost", SERVER_PORT)
+        assert proxy.like(f"/sha256/{sha256_data_identifier(b'no way')}") == {}
+        proxy['/hello'] = b'oh, no'
+        proxy.flush()
+        url, _ = store(b'hello', {}, encrypt=False)
+        assert proxy.contains_many([address_of(url)]) == [False]
+        server.kill()
+        time.sleep(SHUTDOWN_WAIT)  # wait for the server to shutdown
+        proxy[address_of(url)] = b'no server'
+        proxy.flush()
+
+        try:
+            proxy.get(address_of(url))
+            assert False, "server is not running"
+        except ConnectionError:
+            pass
+
+        proxy.shutdown()
+
+
+if __name__ == "__main__":
+    test_basics()
+    test_errors()
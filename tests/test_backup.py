@@ -12,6 +12,7 @@ from tempfile import TemporaryDirectory
 
 import libernet.block
 import libernet.backup
+import libernet.bundle
 import libernet.server
 import libernet.disk
 
@@ -71,6 +72,20 @@ class Store:
         return str(self.data)
 
 
+class WarmStore(Store):
+    def __init__(self):
+        super().__init__()
+        self.known = set()
+        self.warmed = []
+
+    def known_blocks(self) -> int:
+        return len(self.known)
+
+    def warm(self, keys: list):
+        self.warmed.append(keys)
+        self.known.update(k for k in keys if k in self.data)
+
+
 def create_file(directory:str, name:str, contents:str):
     with open(os.path.join(directory, name), 'w') as file:
         file.write(contents)
@@ -613,6 +628,70 @@ def test_no_server():
         ret_value = libernet.backup.main(add_args)
         assert ret_value
 
+
+def test_stat_cache():
+    inflate = libernet.bundle.inflate
+    inflated = []
+    libernet.bundle.inflate = lambda u, s: inflated.append(u) or inflate(u, s)
+    proxy = Store()
+
+    try:
+        with TemporaryDirectory() as working_dir:
+            storage = os.path.join(working_dir, 'storage')
+            source_dir = os.path.join(working_dir, 'source')
+            dest_dir = os.path.join(working_dir, 'restored')
+            os.makedirs(source_dir)
+            create_file(source_dir, 'file1.txt', 'file1 contents')
+            create_file(source_dir, 'file2.txt', 'file2 contents')
+            common = dict(storage=storage, server='localhost', port=8000, months=12, user='John', passphrase='Setec Astronomy', machine='localhost')
+            add_args = SimpleNamespace(**common, action='add', source=[source_dir], yes=True)
+            backup_args = SimpleNamespace(**common, action='backup', source=[])
+            restore_args = SimpleNamespace(**common, action='restore', source=[], destination=dest_dir)
+
+            libernet.backup.main(add_args, proxy)
+            libernet.backup.main(backup_args, proxy)
+            assert len(os.listdir(os.path.join(storage, libernet.backup.STAT_DIR))) == 1
+            create_file(source_dir, 'file2.txt', 'file2 changed!')
+            inflated.clear()
+            libernet.backup.main(backup_args, proxy)
+            assert not inflated, inflated  # the previous backup was not fetched
+            libernet.backup.main(restore_args, proxy)
+            assert validate_file(dest_dir, 'file1.txt', 'file1 contents')
+            assert validate_file(dest_dir, 'file2.txt', 'file2 changed!')
+
+            for name in os.listdir(os.path.join(storage, libernet.backup.STAT_DIR)):
+                os.unlink(os.path.join(storage, libernet.backup.STAT_DIR, name))
+
+            inflated.clear()
+            libernet.backup.main(backup_args, proxy)
+            assert len(inflated) == 1, inflated
+
+    finally:
+        libernet.bundle.inflate = inflate
+
+
+def test_warm():
+    proxy = WarmStore()
+
+    with TemporaryDirectory() as working_dir:
+        storage = os.path.join(working_dir, 'storage')
+        source_dir = os.path.join(working_dir, 'source')
+        os.makedirs(source_dir)
+        create_file(source_dir, 'file1.txt', 'file1 contents')
+        common = dict(storage=storage, server='localhost', port=8000, months=12, user='John', passphrase='Setec Astronomy', machine='localhost')
+        libernet.backup.main(SimpleNamespace(**common, action='add', source=[source_dir], yes=True), proxy)
+        backup_args = SimpleNamespace(**common, action='backup', source=[])
+        libernet.backup.main(backup_args, proxy)
+        assert not proxy.warmed, proxy.warmed  # there was no previous backup
+        libernet.backup.main(backup_args, proxy)
+        assert len(proxy.warmed) == 1 and len(proxy.known) == 1, proxy.warmed
+        libernet.backup.main(backup_args, proxy)
+        assert len(proxy.warmed) == 1, proxy.warmed  # already known, no requests
+        proxy.known.clear()  # --reset-known
+        libernet.backup.main(backup_args, proxy)
+        assert len(proxy.warmed) == 2, proxy.warmed
+
+
 if __name__ == "__main__":
     test_no_server()
     test_arg_processor()
@@ -633,3 +712,5 @@ if __name__ == "__main__":
     test_input()
     test_max_like()
     test_no_dir()
+    test_stat_cache()
+    test_warm()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+
+import io
+
+import libernet.batch
+
+from libernet.hash import sha256_data_identifier
+
+
+def test_identifiers():
+    identifiers = [sha256_data_identifier(str(i).encode('utf-8')) for i in range(0, 10)]
+    body = libernet.batch.pack_identifiers(identifiers)
+    assert len(body) == 32 * len(identifiers), len(body)
+    assert libernet.batch.unpack_identifiers(body) == identifiers
+    assert libernet.batch.unpack_identifiers(b'') == []
+    assert libernet.batch.unpack_identifiers(body[:-1]) is None
+    too_many = b'\0' * 32 * (libernet.batch.MAX_BATCH + 1)
+    assert libernet.batch.unpack_identifiers(too_many) is None
+
+
+def test_frames():
+    blocks = [b'hello', None, b'', b'x' * 100000, None]
+    stream = b''.join(
+        libernet.batch.frame_header(None if b is None else len(b)) + (b or b'')
+        for b in blocks
+    )
+    assert list(libernet.batch.read_frames(io.BytesIO(stream), len(blocks))) == blocks
+
+    try:
+        list(libernet.batch.read_frames(io.BytesIO(stream[:-10]), len(blocks) + 1))
+        assert False, "should have run out of data"
+    except EOFError:
+        pass
+
+
+def test_bitmap():
+    for count in range(0, 20):
+        flags = [i % 3 == 0 for i in range(0, count)]
+        bitmap = libernet.batch.pack_bitmap(flags)
+        assert len(bitmap) == (count + 7) // 8, f"{count}: {len(bitmap)}"
+        assert libernet.batch.unpack_bitmap(bitmap, count) == flags
+
+    assert libernet.batch.pack_bitmap([True, False, False, False, False, False, False, True]) == b'\x81'
+
+
+if __name__ == "__main__":
+    test_identifiers()
+    test_frames()
+    test_bitmap()
@@ -1,8 +1,15 @@
 #!/usr/bin/env python3
 
 
+import bz2
+import lzma
+import random
+import zlib
+
 import libernet.block
+import libernet.codec
 
+from libernet.block import PARALLEL_SCORE
 from libernet.hash import sha256_data_identifier, identifier_match_score
 from libernet.url import address_of
 
@@ -55,7 +62,176 @@ def test_password():
         assert identifier_match_score(url.split('/')[2], similar) >= 12, (url.split('/')[2], similar)
 
 
+def test_parallel_mining():
+    storage = {}
+    similar = sha256_data_identifier('match me'.encode('utf-8'))
+    password = "Setec Astronomy"
+
+    for encrypt in (True, False, password):
+        stats = {}
+        url, _ = libernet.block.store(b'testing', storage, encrypt=encrypt, similar=similar, score=PARALLEL_SCORE, workers=4, stats=stats)
+        assert identifier_match_score(url.split('/')[2], similar) >= PARALLEL_SCORE, (url.split('/')[2], similar)
+        assert stats['attempts'] >= 1, stats
+        assert stats['mining_seconds'] > 0, stats
+        assert stats['attempts_per_second'] > 0, stats
+        fetch_url = address_of(url) if encrypt == password else url
+        duplicate = libernet.block.fetch(fetch_url, storage, was_similar=True, password=password if encrypt == password else None)
+        assert duplicate == b'testing', duplicate
+
+    stats = {}
+    libernet.block.store(b'testing', storage, stats=stats)
+    assert stats == {}, stats
+    compression = {}  # only collected when mining in this process
+    libernet.block.store(b'testing', storage, similar=similar, score=12, workers=4, compression=compression)
+    assert compression['compress_input'] > 0, compression
+
+
+def test_encrypted_mining_identifier():
+    storage = {}
+    similar = sha256_data_identifier('match me'.encode('utf-8'))
+
+    for encrypt in (True, "Setec Astronomy"):
+        url, block = libernet.block.store(b'testing'*1000, storage, encrypt=encrypt, similar=similar, score=16)
+        assert sha256_data_identifier(block) == url.split('/')[2], url
+        assert storage[address_of(url)] == block
+        assert identifier_match_score(url.split('/')[2], similar) >= 16, (url.split('/')[2], similar)
+
+
+def test_compression():
+    storage = {}
+    noise = random.randbytes(1000000)
+    text = b' '.join(b'line %d' % i for i in range(0, 100000))[:1000000]
+    similar = sha256_data_identifier(b'match me')
+
+    for data, level, skipped, compressed in [
+        (noise, None, 1, False),
+        (text, None, 0, True),
+        (text, 1, 0, True),
+        (text, 0, 1, False),
+        (b'short', None, 0, False),  # too small to probe, but grows when compressed
+    ]:
+        for encrypt in (True, False):
+            stats = {}
+            url, block = libernet.block.store(data, storage, encrypt=encrypt, level=level, compression=stats)
+            assert libernet.block.fetch(url, storage) == data
+            assert stats['compress_skipped'] == skipped, stats
+            assert stats['compress_input'] == len(data), stats
+            assert (stats['compress_output'] < len(data)) == compressed, stats
+            assert stats['compress_seconds'] >= 0, stats
+            assert (len(block) < len(data)) == compressed, (len(block), len(data))
+
+    stats = {}
+    url, _ = libernet.block.store(text[:10000], storage, encrypt=False, similar=similar, score=4, compression=stats)
+    assert libernet.block.fetch(url, storage, was_similar=True) == text[:10000]
+    assert stats['compress_input'] > 10000, stats  # includes padding (every attempt)
+    assert stats['compress_output'] < stats['compress_input'], stats
+
+
+def test_codecs():
+    storage = {}
+    text = b' '.join(b'line %d' % i for i in range(0, 10000))
+    zlib_url, _ = libernet.block.store(text, storage)
+
+    for codec in libernet.codec.available():
+        for encrypt in (True, False):
+            url, block = libernet.block.store(text, storage, encrypt=encrypt, codec=codec)
+            assert len(block) < len(text), (codec, len(block))
+            assert libernet.block.fetch(url, storage) == text, codec
+
+            if codec == 'zlib' and encrypt:
+                assert url == zlib_url  # zlib is the default
+
+
+def test_looks_compressed():
+    storage = {}
+
+    for prefix in (b'x\x9c', b'BZh9', b'\xfd7zXZ\x00', b'\x28\xb5\x2f\xfd'):
+        data = prefix + random.randbytes(100)
+
+        for encrypt in (True, False):
+            url, block = libernet.block.store(data, storage, encrypt=encrypt, level=0)
+            assert libernet.block.fetch(url, storage) == data, (prefix, encrypt)
+
+
+def test_single_hash():
+    storage = {}
+    text = b' '.join(b'line %d' % i for i in range(0, 10000))
+    old_identifier = libernet.block.sha256_data_identifier
+    hashed = []
+
+    def counting_identifier(data):
+        hashed.append(len(data))
+        return old_identifier(data)
+
+    libernet.block.sha256_data_identifier = counting_identifier
+
+    try:
+        for data in (text, random.randbytes(len(text))):
+            for encrypt in (True, False):
+                url, _ = libernet.block.store(data, storage, encrypt=encrypt)
+                hashed.clear()
+                assert libernet.block.fetch(url, storage) == data
+                assert hashed == [len(data)], (encrypt, hashed)
+
+    finally:
+        libernet.block.sha256_data_identifier = old_identifier
+
+
+def test_compressed_contents():
+    storage = {}
+    streams = [
+        lzma.compress(bytes(16 * 1024 * 1024), preset=0),
+        bz2.compress(bytes(16 * 1024 * 1024), 1),
+        zlib.compress(bytes(libernet.block.MAX_UNCOMPRESSED_SIZE + 1)),
+    ]  # files that are already compressed, stored as they are
+    old_identifier = libernet.block.sha256_data_identifier
+    hashed = []
+
+    def counting_identifier(data):
+        hashed.append(len(data))
+        return old_identifier(data)
+
+    libernet.block.sha256_data_identifier = counting_identifier
+
+    try:
+        for data in streams:
+            for encrypt in (True, False):
+                url, _ = libernet.block.store(data, storage, encrypt=encrypt, level=0)
+                hashed.clear()
+                assert libernet.block.fetch(url, storage) == data
+                assert hashed == [len(data)], (encrypt, hashed)
+
+    finally:
+        libernet.block.sha256_data_identifier = old_identifier
+
+
+def test_unsupported_codec():
+    if 'zstd' in libernet.codec.available():
+        return
+
+    data = b'\x28\xb5\x2f\xfd' + random.randbytes(100)  # zstd magic
+    storage = {}
+    url, _ = libernet.block.store(data, storage, encrypt=False)
+    assert libernet.block.fetch(url, storage) == data  # not compressed, just looks it
+    storage[address_of(url)] = data[:-1]  # as if compressed by a newer python
+
+    try:
+        libernet.block.fetch(url, storage)
+        raise AssertionError('read zstd data without zstd')
+
+    except ValueError as error:
+        assert 'zstd' in str(error), error
+
+
 if __name__ == "__main__":
     test_basic()
     test_padding()
     test_password()
+    test_parallel_mining()
+    test_encrypted_mining_identifier()
+    test_compression()
+    test_codecs()
+    test_looks_compressed()
+    test_single_hash()
+    test_compressed_contents()
+    test_unsupported_codec()
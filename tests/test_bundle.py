@@ -2,11 +2,14 @@
 
 
 import os
+import random
+import resource
 import stat
 import tempfile
 import time
 
 import libernet.bundle
+import libernet.url
 
 class FakeMessages:
     def __init__(self):
@@ -467,6 +470,234 @@ def test_extra_keys():
     assert info['mime'] == 'text/plain'
 
 
+def test_content_chunking():
+    storage = {}
+    data = random.randbytes(3 * 1024 * 1024)
+
+    with (tempfile.TemporaryDirectory() as working_dir,
+            tempfile.TemporaryDirectory() as destination_dir):
+        with open(os.path.join(working_dir, "file.bin"), "wb") as file:
+            file.write(data)
+
+        url = libernet.bundle.create(working_dir, storage, chunking='gear')
+        contents = libernet.bundle.inflate(url, storage)['files']['file.bin']['contents']
+        assert len(contents) > 3, len(contents)
+        assert all(b['size'] <= libernet.bundle.MAX_RAW_BLOCK_SIZE for b in contents)
+        assert sum(b['size'] for b in contents) == len(data)
+        missing = libernet.bundle.restore(url, destination_dir, storage)
+        assert not missing, missing
+
+        with open(os.path.join(destination_dir, "file.bin"), "rb") as file:
+            assert file.read() == data
+
+
+def test_threads_deterministic():
+    old_bundle_max = libernet.bundle.MAX_BUNDLE_SIZE
+    libernet.bundle.MAX_BUNDLE_SIZE = 8192  # force sub-bundles
+    urls = set()
+
+    try:
+        with tempfile.TemporaryDirectory() as working_dir:
+            for file_index in range(0, 200):
+                makefile(os.path.join(working_dir, f'dir_{file_index % 7}', f'file_{file_index}.txt'),
+                         f'file #{file_index}' * (file_index + 1))
+
+            for threads in (1, 2, 8):
+                storage = {}
+                url = libernet.bundle.create(working_dir, storage, threads=threads)
+                urls.add(url)
+
+    finally:
+        libernet.bundle.MAX_BUNDLE_SIZE = old_bundle_max
+
+    assert len(urls) == 1, urls
+    restored = libernet.bundle.inflate(url, storage)
+    assert len(storage) > 201, len(storage)  # files, sub-bundles and the bundle
+    assert len(restored['files']) == 200, len(restored['files'])
+
+
+def test_large_file_threads():
+    old_pread = libernet.bundle.os.pread
+    data = random.randbytes(5 * libernet.bundle.MAX_RAW_BLOCK_SIZE + 1000)
+    contents = []
+
+    with (tempfile.TemporaryDirectory() as working_dir,
+            tempfile.TemporaryDirectory() as destination_dir):
+        with open(os.path.join(working_dir, "file.bin"), "wb") as file:
+            file.write(data)
+
+        for threads in (1, 4):
+            storage = {}
+            messages = FakeMessages()
+            stats = {}
+            url = libernet.bundle.create(working_dir, storage, threads=threads, messages=messages, stats=stats)
+            restored = libernet.bundle.inflate(url, storage)
+            contents.append(restored['files']['file.bin']['contents'])
+            assert sum(m[1] for m in messages.messages if m[0] == 'data') == len(data)
+            assert stats['compress_skipped'] == 5, stats  # the last block is too small to probe
+            assert stats['compress_input'] == len(data), stats
+
+        missing = libernet.bundle.restore(url, destination_dir, storage)
+        assert not missing, missing
+
+        with open(os.path.join(destination_dir, "file.bin"), "rb") as file:
+            assert file.read() == data
+
+        def truncated_pread(descriptor, size, offset):  # file shrinks while reading
+            return b'' if offset >= 2 * libernet.bundle.MAX_RAW_BLOCK_SIZE else old_pread(descriptor, size, offset)
+
+        libernet.bundle.os.pread = truncated_pread
+        storage = {}
+
+        try:
+            url = libernet.bundle.create(working_dir, storage, threads=4)
+
+        finally:
+            libernet.bundle.os.pread = old_pread
+
+        assert contents[0] == contents[1]
+        assert len(contents[0]) == 6, len(contents[0])
+        assert [c['size'] for c in contents[0]] == [libernet.bundle.MAX_RAW_BLOCK_SIZE] * 5 + [1000]
+
+    shrunk = libernet.bundle.inflate(url, storage)['files']['file.bin']['contents']
+    assert shrunk == contents[0][:2], shrunk
+
+
+def test_restore_threads():
+    storage = {}
+    old_batch = libernet.bundle.RESTORE_BATCH
+    libernet.bundle.RESTORE_BATCH = 3  # batches span files
+
+    with (tempfile.TemporaryDirectory() as working_dir,
+            tempfile.TemporaryDirectory() as destination_dir):
+        files = {}
+
+        for file_index in range(0, 40):
+            name = f'dir_{file_index % 3}/file_{file_index}.bin'
+            files[name] = random.randbytes(file_index * 997)
+            os.makedirs(os.path.join(working_dir, f'dir_{file_index % 3}'), exist_ok=True)
+
+            with open(os.path.join(working_dir, name), 'wb') as file:
+                file.write(files[name])
+
+        name = 'large.bin'
+        files[name] = random.randbytes(2 * libernet.bundle.MAX_RAW_BLOCK_SIZE + 5)
+
+        with open(os.path.join(working_dir, name), 'wb') as file:
+            file.write(files[name])
+
+        os.chmod(os.path.join(working_dir, 'dir_1/file_1.bin'), 0o444)
+        url = libernet.bundle.create(working_dir, storage)
+
+        for threads in (1, 8):
+            target = os.path.join(destination_dir, str(threads))
+            missing = libernet.bundle.restore(url, target, storage, threads=threads)
+            assert not missing, missing
+
+            for name, data in files.items():
+                with open(os.path.join(target, name), 'rb') as file:
+                    assert file.read() == data, name
+
+                original = os.stat(os.path.join(working_dir, name))
+                restored = os.stat(os.path.join(target, name))
+                assert abs(original.st_mtime - restored.st_mtime) < 0.001, name
+                assert original.st_mode == restored.st_mode, name
+
+    libernet.bundle.RESTORE_BATCH = old_batch
+
+
+class CountingStorage(dict):
+    def __init__(self):
+        super().__init__()
+        self.requested = []
+
+    def get(self, key, default=None):
+        self.requested.append(key)
+        return super().get(key, default)
+
+
+def test_restore_duplicates():
+    storage = CountingStorage()
+    data = random.randbytes(libernet.bundle.MAX_RAW_BLOCK_SIZE + 100)
+
+    with (tempfile.TemporaryDirectory() as working_dir,
+            tempfile.TemporaryDirectory() as destination_dir):
+        for name in ('a.bin', 'copy/a.bin', 'copy/b.bin'):
+            os.makedirs(os.path.dirname(os.path.join(working_dir, name)), exist_ok=True)
+
+            with open(os.path.join(working_dir, name), 'wb') as file:
+                file.write(data)
+
+        makefile(os.path.join(working_dir, 'other.txt'), 'other')
+        url = libernet.bundle.create(working_dir, storage)
+        storage.requested.clear()
+        stats = {}
+        missing = libernet.bundle.restore(url, destination_dir, storage, stats=stats)
+        assert not missing, missing
+        contents = [b for b in storage.requested if b != libernet.url.address_of(url)]
+        assert len(contents) == len(set(contents)) == 3, contents  # 2 shared + other
+
+        for name in ('a.bin', 'copy/a.bin', 'copy/b.bin'):
+            with open(os.path.join(destination_dir, name), 'rb') as file:
+                assert file.read() == data, name
+
+        assert stats['restore_blocks'] == 3, stats
+        assert stats['restore_bytes'] == len(data) + 5, stats
+        assert stats['restore_bytes_saved'] == 2 * len(data), stats
+
+
+def test_local_files():
+    storage = {}
+
+    with tempfile.TemporaryDirectory() as working_dir:
+        file1_path = os.path.join(working_dir, 'file1.txt')
+        file2_path = os.path.join(working_dir, 'file2.txt')
+        makefile(file1_path, 'version 1')
+        makefile(file2_path, 'version 2')
+        files = {}
+        url1 = libernet.bundle.create(working_dir, storage, files=files)
+        assert all(k in files['file1.txt'] for k in libernet.bundle.LOCAL), files
+        inflated = libernet.bundle.inflate(url1, storage)
+        assert not any(k in inflated['files']['file1.txt'] for k in libernet.bundle.LOCAL)
+        file2_stat = os.stat(file2_path)
+        makefile(file2_path, 'version 3')  # same size, within SAME_TIME_VARIANCE
+        os.utime(file2_path, ns=(file2_stat.st_atime_ns, file2_stat.st_mtime_ns + 1))
+        messages = FakeMessages()
+        url2 = libernet.bundle.create(working_dir, storage, inflated, messages=messages)
+        assert url2 == url1  # only the time can tell, and it is too close
+        url3 = libernet.bundle.create(working_dir, storage, {'files': files}, messages=messages)
+        changed = [e[1] for e in messages.messages if e[0] == 'file']
+        assert changed == ['file2.txt'], messages.messages
+        current = libernet.bundle.inflate(url3, storage)
+        assert current['files']['file1.txt'] == inflated['files']['file1.txt']
+        assert current['files']['file2.txt'] != inflated['files']['file2.txt']
+
+
+def test_restore_many_duplicates():
+    storage = {}
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+
+    with (tempfile.TemporaryDirectory() as working_dir,
+            tempfile.TemporaryDirectory() as destination_dir):
+        for index in range(0, 600):
+            makefile(os.path.join(working_dir, f'file{index}.txt'), 'same contents')
+
+        url = libernet.bundle.create(working_dir, storage)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(256, soft), hard))
+
+        try:
+            missing = libernet.bundle.restore(url, destination_dir, storage)
+
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+        assert not missing, missing
+
+        for index in range(0, 600):
+            with open(os.path.join(destination_dir, f'file{index}.txt'), 'r') as file:
+                assert file.read() == 'same contents', index
+
+
 if __name__ == "__main__":
     test_basic()
     test_file_metadata()
@@ -480,3 +711,10 @@ if __name__ == "__main__":
     test_date_modified()
     test_restore_missing_blocks()
     test_extra_keys()
+    test_content_chunking()
+    test_threads_deterministic()
+    test_large_file_threads()
+    test_restore_threads()
+    test_restore_duplicates()
+    test_local_files()
+    test_restore_many_duplicates()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+
+from random import randbytes
+from tempfile import TemporaryDirectory
+
+import libernet.block
+import libernet.cache
+import libernet.disk
+
+from libernet.url import address_of
+
+
+class CountingStorage(dict):
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+
+    def get(self, key: str, default: bytes = None) -> bytes:
+        self.gets += 1
+        return super().get(key, default)
+
+
+class BatchStorage(CountingStorage):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def get_many(self, keys: list) -> list:
+        self.batches.append(keys)
+        return [dict.get(self, k) for k in keys]
+
+    def contains_many(self, keys: list) -> list:
+        self.batches.append(keys)
+        return [k in self for k in keys]
+
+
+def test_fetch():
+    storage = CountingStorage()
+    cache = libernet.cache.Storage(storage)
+    data = randbytes(100 * 1024)
+    url, _ = libernet.block.store(data, cache)
+    assert len(storage) == 1, storage.keys()
+    assert storage.gets == 0, storage.gets
+
+    for _ in range(0, 3):
+        assert libernet.block.fetch(url, cache) == data
+
+    assert storage.gets == 1, storage.gets
+    stats = cache.stats()
+    assert stats['unpacked_hits'] == 2, stats
+    assert stats['unpacked_misses'] == 1, stats
+    assert stats['misses'] == 1, stats
+    assert stats['blocks'] == 2, stats
+    assert cache[address_of(url)] == storage[address_of(url)]
+    assert cache.stats()['hits'] == 1, cache.stats()
+    assert storage.gets == 1, storage.gets
+    missing = '/sha256/' + 'f' * 64 + '/aes256/' + 'f' * 64
+    assert libernet.block.fetch(missing, cache) is None
+    assert cache.stats()['blocks'] == 2, cache.stats()
+
+    try:
+        _ = cache['/sha256/' + '0' * 64]
+        raise AssertionError('missing block found')
+
+    except KeyError:
+        pass
+
+
+def test_eviction():
+    storage = CountingStorage()
+    cache = libernet.cache.Storage(storage, max_bytes=3 * 1024)
+    keys = [f'/sha256/{i:064x}' for i in range(0, 5)]
+
+    for key in keys:
+        storage[key] = randbytes(1024)
+
+    cache[keys[0]] = b'set'
+    assert storage[keys[0]] == b'set'
+    assert cache.stats()['blocks'] == 0, cache.stats()
+
+    for key in keys[:3]:
+        assert cache.get(key) == storage[key]
+
+    assert cache.get(keys[0]) == storage[keys[0]]  # keys[1] is now oldest
+    assert cache.get(keys[3]) == storage[keys[3]]
+    stats = cache.stats()
+    assert stats['blocks'] == 3, stats
+    assert stats['bytes'] == 3 + 2 * 1024, stats
+    gets = storage.gets
+    assert cache.get(keys[0]) == storage[keys[0]]
+    assert storage.gets == gets, storage.gets
+    assert cache.get(keys[1]) == storage[keys[1]]
+    assert storage.gets == gets + 1, storage.gets
+    cache.set_unpacked(keys[4], False, randbytes(4 * 1024))  # larger than the cache
+    assert cache.get_unpacked(keys[4], False) is None
+    assert cache.get('/sha256/' + 'f' * 64, b'default') == b'default'
+
+
+def test_many():
+    for storage in (CountingStorage(), BatchStorage()):
+        cache = libernet.cache.Storage(storage)
+        keys = [f'/sha256/{i:064x}' for i in range(0, 10)]
+
+        for key in keys[:8]:
+            storage[key] = randbytes(128)
+
+        assert cache.get(keys[0]) == storage[keys[0]]
+        assert keys[0] in cache
+        assert keys[1] in cache
+        assert keys[9] not in cache
+        found = cache.get_many(keys)
+        assert found == [storage.get(k) for k in keys[:8]] + [None, None], found
+        assert cache.get_many(keys[:8]) == found[:8]
+        assert cache.contains_many(keys) == [True] * 8 + [False] * 2
+        assert cache.contains_many(keys[:8]) == [True] * 8
+
+        if isinstance(storage, BatchStorage):
+            assert storage.batches == [keys[1:], keys[8:]], storage.batches
+
+
+def test_disk():
+    with TemporaryDirectory() as working_dir:
+        storage = libernet.disk.Storage(working_dir)
+        cache = libernet.cache.Storage(storage, max_bytes=1024 * 1024)
+        data = randbytes(200 * 1024)
+        url, _ = libernet.block.store(data, cache)
+        assert libernet.block.fetch(url, cache) == data
+        assert cache.like(url) == storage.like(url)
+        del cache[address_of(url)]
+        assert cache.stats()['blocks'] == 0, cache.stats()
+        assert address_of(url) not in cache
+        assert libernet.block.fetch(url, cache) is None
+
+        try:
+            _ = cache.missing_method
+            raise AssertionError('attribute should not exist')
+
+        except AttributeError:
+            pass
+
+
+if __name__ == "__main__":
+    test_fetch()
+    test_eviction()
+    test_many()
+    test_disk()
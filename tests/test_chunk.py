@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+
+import io
+import random
+
+import libernet.chunk
+
+
+def gear_blocks(data, max_size=16 * 1024):
+    return list(libernet.chunk.gear(io.BytesIO(data), max_size, 1024, 4096))
+
+
+def test_fixed():
+    data = random.randbytes(10000)
+    blocks = list(libernet.chunk.blocks(io.BytesIO(data), 'fixed', 4096))
+    assert [len(b) for b in blocks] == [4096, 4096, 1808], [len(b) for b in blocks]
+    assert b''.join(blocks) == data
+    assert not list(libernet.chunk.blocks(io.BytesIO(b''), 'fixed', 4096))
+
+
+def test_gear():
+    data = random.randbytes(256 * 1024)
+    blocks = gear_blocks(data)
+    assert b''.join(blocks) == data
+    assert all(len(b) <= 16 * 1024 for b in blocks)
+    assert all(len(b) > 1024 for b in blocks[:-1])
+    assert len(blocks) > 256 // 16, len(blocks)
+    assert gear_blocks(data) == blocks  # deterministic
+    assert not gear_blocks(b'')
+    assert gear_blocks(b'tiny') == [b'tiny']
+    assert libernet.chunk.blocks(io.BytesIO(data), 'gear', 16 * 1024)
+
+
+def test_gear_edits():
+    data = random.randbytes(256 * 1024)
+    blocks = gear_blocks(data)
+    middle = len(data) // 2
+    edits = [
+        data[:middle] + b'inserted' + data[middle:],
+        data[:middle] + data[middle + 100:],
+        b'prefix' + data,
+    ]
+
+    for edited in edits:
+        edited_blocks = gear_blocks(edited)
+        assert b''.join(edited_blocks) == edited
+        changed = [i for i, b in enumerate(edited_blocks) if b not in blocks]
+        # usually 1 to 3 blocks, but moving a boundary within min_size of the next
+        # one can take a few more blocks before the boundaries line up again
+        assert changed == list(range(changed[0], changed[-1] + 1)), changed
+        assert len(changed) <= len(edited_blocks) // 4, f"{len(changed)} of {len(edited_blocks)} changed"
+
+
+def test_uniform():
+    data = bytes(100 * 1024)  # no boundaries in the content
+    blocks = gear_blocks(data)
+    assert [len(b) for b in blocks[:-1]] == [16 * 1024] * (len(blocks) - 1)
+    assert b''.join(blocks) == data
+
+
+def test_small_reads():
+    old_read_size = libernet.chunk.READ_SIZE
+    libernet.chunk.READ_SIZE = 100
+    data = random.randbytes(64 * 1024)
+
+    try:
+        blocks = gear_blocks(data)
+
+    finally:
+        libernet.chunk.READ_SIZE = old_read_size
+
+    assert blocks == gear_blocks(data)
+
+
+if __name__ == "__main__":
+    test_fixed()
+    test_gear()
+    test_gear_edits()
+    test_uniform()
+    test_small_reads()
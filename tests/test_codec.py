@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+
+import zlib
+
+import libernet.codec
+
+
+TEXT = b' '.join(b'line %d' % i for i in range(0, 10000))
+
+
+def test_round_trip():
+    assert 'zlib' in libernet.codec.available()
+    assert 'lzma' in libernet.codec.available()
+    assert 'bz2' in libernet.codec.available()
+
+    for codec in libernet.codec.available():
+        for level in (None, 1):
+            compressed = libernet.codec.compress(TEXT, codec, level)
+            assert len(compressed) < len(TEXT), (codec, level, len(compressed))
+            assert libernet.codec.identify(compressed) == codec, codec
+            assert libernet.codec.decompress(compressed) == TEXT, codec
+
+
+def test_zlib_compatible():
+    for level in range(0, 10):
+        compressed = zlib.compress(TEXT, level)
+        assert libernet.codec.identify(compressed) == 'zlib', level
+        assert libernet.codec.decompress(compressed) == TEXT, level
+
+    assert libernet.codec.compress(TEXT) == zlib.compress(TEXT, 9)
+
+
+def test_unknown():
+    assert libernet.codec.identify(b'') is None
+    assert libernet.codec.identify(b'x') is None
+    assert libernet.codec.identify(b'not compressed') is None
+
+    try:
+        libernet.codec.decompress(b'not compressed')
+        raise AssertionError('decompressed unknown data')
+
+    except zlib.error:
+        pass
+
+    for data in (b'BZh9 not compressed', b'\xfd7zXZ\x00 not compressed', b'\x28\xb5\x2f\xfd not compressed'):
+        try:
+            libernet.codec.decompress(data)
+            raise AssertionError(f'decompressed {data}')
+
+        except libernet.codec.ERRORS:
+            pass
+
+
+def test_max_length():
+    for codec in libernet.codec.available():
+        compressed = libernet.codec.compress(TEXT, codec)
+        assert libernet.codec.decompress(compressed, len(TEXT)) == TEXT, codec
+
+        for data in (compressed, compressed[:-10]):
+            try:
+                libernet.codec.decompress(data, len(TEXT) - 1)
+                raise AssertionError(f'{codec} decompressed past max_length')
+
+            except libernet.codec.ERRORS:
+                pass
+
+        try:
+            libernet.codec.decompress(compressed[:len(compressed) // 2])
+            raise AssertionError(f'{codec} decompressed partial data')
+
+        except libernet.codec.ERRORS:
+            pass
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_zlib_compatible()
+    test_unknown()
+    test_max_length()
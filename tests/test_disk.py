@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 
 
+import threading
+
+from random import randbytes
 from tempfile import TemporaryDirectory
 
 import libernet.disk
@@ -71,6 +74,111 @@ def test_corners():
             pass
 
 
+def test_index():
+    test_set = [('testing '*c).encode('utf-8') for c in range(0, 100)]
+
+    with TemporaryDirectory() as working_dir:
+        storage = Storage(working_dir, index=True)
+        urls = [store(d, storage, encrypt=False)[0] for d in test_set[:50]]
+        reopened = Storage(working_dir, index=True)
+        urls.extend(store(d, reopened, encrypt=False)[0] for d in test_set[50:])
+
+        for data, url in zip(test_set, urls):
+            assert address_of(url) in reopened, url
+            assert fetch(url, reopened) == data
+
+        for url in urls[:50]:
+            assert address_of(url) in storage, url
+
+        for url in urls[50:]:
+            assert address_of(url) not in storage, url
+            assert storage.get(address_of(url)) is None, url
+
+        missing = f"/sha256/{sha256_data_identifier(b'missing')}"
+        assert missing not in reopened
+        assert reopened.get(missing) is None
+        assert reopened.open(missing) is None
+        assert storage.open(missing) is None
+        block_file, size = reopened.open(address_of(urls[0]))
+
+        with block_file:
+            assert block_file.read() == reopened[address_of(urls[0])]
+            assert size == len(reopened[address_of(urls[0])])
+
+
+def test_delete():
+    test_set = [('testing '*c).encode('utf-8') for c in range(0, 20)]
+
+    for index in (False, True):
+        with TemporaryDirectory() as working_dir:
+            storage = Storage(working_dir, index=index)
+            urls = [address_of(store(d, storage, encrypt=False)[0]) for d in test_set]
+
+            for url in urls[:10]:
+                del storage[url]
+
+            for url in urls[:10]:
+                assert url not in storage, url
+                assert storage.get(url) is None, url
+                assert url not in storage.like(url), url
+
+                try:
+                    del storage[url]
+                    assert False, f"{url} should not be found"
+                except KeyError:
+                    pass
+
+            for url in urls[10:]:
+                assert url in storage, url
+                assert url in storage.like(url), url
+
+            reopened = Storage(working_dir, index=index)
+
+            for url in urls[:10]:
+                assert url not in reopened, url
+                assert url not in reopened.like(url), url
+
+
+def test_concurrency():
+    test_set = [randbytes(c * 997) for c in range(0, 64)]
+    keys = [f"/sha256/{sha256_data_identifier(d)}" for d in test_set]
+    errors = []
+
+    def writer(storage, rounds):
+        for _ in range(0, rounds):
+            for key, data in zip(keys, test_set):
+                storage[key] = data
+
+    def reader(storage, rounds):
+        for _ in range(0, rounds):
+            for key, data in zip(keys, test_set):
+                found = storage.get(key)
+
+                if found is not None and found != data:
+                    errors.append(key)  # saw a partially written block
+
+                storage.like(key)
+
+    with TemporaryDirectory() as working_dir:
+        storage = Storage(working_dir)
+        threads = [threading.Thread(target=writer, args=(storage, 5)) for _ in range(0, 8)]
+        threads.extend(threading.Thread(target=reader, args=(storage, 5)) for _ in range(0, 8))
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        assert not errors, errors
+
+        for key, data in zip(keys, test_set):
+            assert storage[key] == data
+
+
 if __name__ == "__main__":
     test_basics()
     test_corners()
+    test_index()
+    test_delete()
+    test_concurrency()
@@ -45,8 +45,23 @@ def test_identifier_match_score_first_byte_zero():
     libernet.hash.VALIDATE_IDENTIFIER_SIZE = old_validate
 
 
+def test_identifier_match_scores():
+    id1 = libernet.hash.sha256_data_identifier(b"test")
+    others = [libernet.hash.sha256_data_identifier(struct.pack("q", i)) for i in range(0, 1000)]
+    others.append(id1)
+    scores = libernet.hash.identifier_match_scores(id1, others)
+    assert len(scores) == len(others)
+    assert scores[-1] == 256
+
+    for other, score in zip(others, scores):
+        assert score == libernet.hash.identifier_match_score(id1, other), other
+
+    assert libernet.hash.identifier_match_scores(id1, []) == []
+
+
 if __name__ == "__main__":
     test_identifier_match_score()
     test_binary_from_identifier_first_nibble_zero()
     test_identifier_match_score_first_nibble_zero()
     test_identifier_match_score_first_byte_zero()
+    test_identifier_match_scores()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+
+import struct
+
+import libernet.index
+
+from libernet.index import BlockIndex
+from libernet.hash import sha256_data_identifier, identifier_match_scores
+
+
+def identifiers(start, end):
+    return [sha256_data_identifier(struct.pack("q", i)) for i in range(start, end)]
+
+
+def test_basics():
+    old_merge_size = libernet.index.MERGE_SIZE
+    libernet.index.MERGE_SIZE = 16
+    index = BlockIndex(sorted(identifiers(0, 100)))
+    assert len(index) == 100, len(index)
+
+    for identifier in identifiers(0, 100):
+        assert identifier in index, identifier
+
+    for identifier in identifiers(100, 200):
+        assert identifier not in index, identifier
+
+    for identifier in identifiers(50, 300):  # not in order, some duplicates
+        index.add(identifier)
+
+    assert len(list(index)) == 300
+    assert list(index) == sorted(identifiers(0, 300))
+
+    for identifier in identifiers(0, 300):
+        assert identifier in index, identifier
+
+    index.update(identifiers(250, 320))
+    assert len(index) == 320, len(index)
+    assert sha256_data_identifier(b"missing") not in index
+    libernet.index.MERGE_SIZE = old_merge_size
+
+
+def test_discard():
+    old_merge_size = libernet.index.MERGE_SIZE
+    libernet.index.MERGE_SIZE = 16
+    index = BlockIndex(identifiers(0, 100))
+
+    for identifier in identifiers(0, 100):
+        index.add(identifier)
+
+    index.discard(sha256_data_identifier(b"missing"))
+
+    for identifier in identifiers(0, 100)[::2]:
+        index.discard(identifier)
+
+    assert len(index) == 50, len(index)
+    assert list(index) == sorted(identifiers(0, 100)[1::2])
+
+    for identifier in identifiers(0, 100)[1::2]:
+        index.discard(identifier)
+
+    assert len(index) == 0, len(index)
+    assert list(index) == []
+    libernet.index.MERGE_SIZE = old_merge_size
+
+
+def test_empty():
+    index = BlockIndex()
+    assert len(index) == 0
+    assert list(index) == []
+    assert sha256_data_identifier(b"missing") not in index
+    index.add(sha256_data_identifier(b"found"))
+    assert sha256_data_identifier(b"found") in index
+    assert len(index) == 1
+
+
+def test_nearest():
+    old_merge_size = libernet.index.MERGE_SIZE
+    libernet.index.MERGE_SIZE = 64
+    stored = identifiers(0, 1000)
+    index = BlockIndex(stored[:900])
+    index.update(stored[900:])  # some are still pending
+
+    for target in identifiers(1000, 1020) + stored[:10]:
+        expected = sorted(identifier_match_scores(target, stored), reverse=True)
+        found = index.nearest(target, 10)
+        assert identifier_match_scores(target, found) == expected[:10], target
+        found = index.nearest(target, 10, minimum=6)
+        assert identifier_match_scores(target, found) == [s for s in expected[:10] if s >= 6]
+
+    assert BlockIndex().nearest(stored[0], 10) == []
+    libernet.index.MERGE_SIZE = old_merge_size
+
+
+if __name__ == "__main__":
+    test_basics()
+    test_discard()
+    test_empty()
+    test_nearest()
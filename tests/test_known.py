@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+
+import os
+
+from tempfile import TemporaryDirectory
+
+from libernet.known import KnownBlocks
+from libernet.hash import sha256_data_identifier
+
+
+def test_basics():
+    identifiers = [sha256_data_identifier(f"{i}".encode('utf-8')) for i in range(0, 100)]
+
+    with TemporaryDirectory() as working_dir:
+        path = os.path.join(working_dir, 'known', 'localhost_8042.bin')
+        known = KnownBlocks(path)
+        assert len(known) == 0
+        assert identifiers[0] not in known
+        assert not os.path.exists(path)
+
+        for identifier in identifiers[:50]:
+            known.add(identifier)
+
+        known.update(identifiers[25:75] + identifiers[25:75])
+        assert len(known) == 75, len(known)
+        assert os.path.getsize(path) == 75 * 32, os.path.getsize(path)
+
+        for index, identifier in enumerate(identifiers):
+            assert (identifier in known) == (index < 75), identifier
+
+        reopened = KnownBlocks(path)
+        assert len(reopened) == 75, len(reopened)
+
+        for index, identifier in enumerate(identifiers):
+            assert (identifier in reopened) == (index < 75), identifier
+
+
+def test_partial():
+    identifiers = [sha256_data_identifier(f"{i}".encode('utf-8')) for i in range(0, 10)]
+
+    with TemporaryDirectory() as working_dir:
+        path = os.path.join(working_dir, 'known.bin')
+        KnownBlocks(path).update(identifiers)
+
+        with open(path, 'ab') as known_file:
+            known_file.write(b'partial')
+
+        reopened = KnownBlocks(path)
+        assert len(reopened) == 10, len(reopened)
+        assert os.path.getsize(path) == 10 * 32, os.path.getsize(path)
+        reopened.add(identifiers[0])
+        assert os.path.getsize(path) == 10 * 32, os.path.getsize(path)
+
+
+def test_discard():
+    identifiers = [sha256_data_identifier(f"{i}".encode('utf-8')) for i in range(0, 10)]
+
+    with TemporaryDirectory() as working_dir:
+        path = os.path.join(working_dir, 'known.bin')
+        known = KnownBlocks(path)
+        known.discard(identifiers[0])
+        assert not os.path.exists(path)
+        known.update(identifiers)
+        known.discard(identifiers[0])
+        known.difference_update(identifiers[5:] + identifiers[5:])
+        assert len(known) == 4, len(known)
+        assert os.path.getsize(path) == 4 * 32, os.path.getsize(path)
+        reopened = KnownBlocks(path)
+
+        for index, identifier in enumerate(identifiers):
+            assert (identifier in reopened) == (0 < index < 5), identifier
+
+        reopened.clear()
+        assert len(reopened) == 0, len(reopened)
+        assert len(KnownBlocks(path)) == 0
+        reopened.clear()
+        reopened.add(identifiers[0])
+        assert len(KnownBlocks(path)) == 1
+
+
+if __name__ == "__main__":
+    test_basics()
+    test_partial()
+    test_discard()
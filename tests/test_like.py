@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+
+import os
+import json
+import threading
+
+from tempfile import TemporaryDirectory
+
+from libernet.like import LikeIndex, LikeGroup, LIKE_INDEX_NAME, RECORD
+from libernet.hash import sha256_data_identifier, identifier_match_scores
+from libernet.url import for_data_block
+
+
+def test_basics():
+    identifiers = [sha256_data_identifier(f"{i}".encode('utf-8')) for i in range(0, 5000)]
+    grouped = [i for i in identifiers if i.startswith(identifiers[0][:2])]
+
+    with TemporaryDirectory() as working_dir:
+        likes = LikeIndex(working_dir, 2)
+
+        for identifier in identifiers:
+            likes.add(identifier, len(identifier))
+
+        found = likes.like(grouped[0], 5, 8)
+        assert len(found) == 5, found
+        assert for_data_block(grouped[0]) in found, found
+        assert all(u.split('/')[2].startswith(grouped[0][:2]) for u in found), found
+        index_path = os.path.join(working_dir, grouped[0][:2], LIKE_INDEX_NAME)
+        before = os.stat(index_path)
+        assert before.st_size == RECORD.size * len(grouped)
+        likes.like(grouped[0], 5, 8)
+        likes.add(grouped[0], len(grouped[0]))  # already there
+        after = os.stat(index_path)
+        assert (before.st_size, before.st_mtime_ns) == (after.st_size, after.st_mtime_ns)
+        reopened = LikeIndex(working_dir, 2)
+        assert reopened.like(grouped[0], 5, 8) == found
+        assert len(reopened.like(grouped[0], 1000, 8)) == len(grouped)
+
+        with open(index_path, 'ab') as index_file:
+            index_file.write(b'partial')
+
+        assert LikeIndex(working_dir, 2).like(grouped[0], 5, 8) == found
+        assert os.path.getsize(index_path) == RECORD.size * len(grouped)
+
+
+def test_upgrade():
+    identifiers = [sha256_data_identifier(f"{i}".encode('utf-8')) for i in range(0, 1000)]
+    group = identifiers[0][:2]
+    grouped = [i for i in identifiers if i.startswith(group)]
+    external = sha256_data_identifier(b'external')
+
+    with TemporaryDirectory() as working_dir:
+        os.makedirs(os.path.join(working_dir, group))
+
+        for identifier in grouped:
+            with open(os.path.join(working_dir, group, identifier[2:]), 'wb') as block_file:
+                block_file.write(b'x' * 10)
+
+        with open(os.path.join(working_dir, group, grouped[0][2:] + '.like.json'), 'w', encoding='utf-8') as like_file:
+            json.dump({for_data_block(external): 30}, like_file)
+
+        found = LikeIndex(working_dir, 2).like(grouped[0], 1000, 0)
+        assert len(found) == len(grouped) + 1, found
+        assert found[for_data_block(external)] == 30
+        assert found[for_data_block(grouped[0])] == 10
+        assert os.path.isfile(os.path.join(working_dir, group, LIKE_INDEX_NAME))
+        assert not os.path.exists(os.path.join(working_dir, group, LIKE_INDEX_NAME + '.tmp'))
+        assert LikeIndex(working_dir, 2).like(grouped[0], 1000, 0) == found
+        missing = sha256_data_identifier(b'missing')
+        assert LikeIndex(working_dir, 2).like('f' + missing[1:], 5, 8) == {}
+
+
+def test_across_groups():
+    identifiers = [sha256_data_identifier(f"{i}".encode('utf-8')) for i in range(0, 3000)]
+    targets = [sha256_data_identifier(f"target {i}".encode('utf-8')) for i in range(0, 20)]
+
+    with TemporaryDirectory() as working_dir:
+        likes = LikeIndex(working_dir, 3)
+
+        for identifier in identifiers:
+            likes.add(identifier, 1)
+
+        for target in targets + identifiers[:20]:
+            found = likes.like(target, 10, 4)
+            expected = sorted(identifier_match_scores(target, identifiers), reverse=True)
+            expected = [s for s in expected[:10] if s >= 4]
+            scores = identifier_match_scores(target, [u.split('/')[2] for u in found])
+            assert sorted(scores, reverse=True) == expected, f"{scores} vs {expected}"
+
+        reopened = LikeIndex(working_dir, 3)
+        assert reopened.like(targets[0], 10, 4) == likes.like(targets[0], 10, 4)
+        assert reopened.like(targets[0], 10, 256) == {}
+
+
+def test_discard():
+    identifiers = [sha256_data_identifier(f"{i}".encode('utf-8')) for i in range(0, 500)]
+
+    with TemporaryDirectory() as working_dir:
+        likes = LikeIndex(working_dir, 2)
+
+        for identifier in identifiers:
+            likes.add(identifier, 1)
+
+        for identifier in identifiers[:250]:
+            likes.discard(identifier)
+
+        likes.discard(sha256_data_identifier(b'missing'))
+
+        for index in (likes, LikeIndex(working_dir, 2)):
+            for identifier in identifiers[:250]:
+                assert for_data_block(identifier) not in index.like(identifier, 10, 0)
+
+            for identifier in identifiers[250:]:
+                assert for_data_block(identifier) in index.like(identifier, 10, 0)
+
+        likes.add(identifiers[0], 2)
+        assert LikeIndex(working_dir, 2).like(identifiers[0], 1, 0) == {
+            for_data_block(identifiers[0]): 2
+        }
+
+
+def test_group():
+    keys = [bytes([i]) * 32 for i in (5, 1, 3)]
+    group = LikeGroup({k: i for i, k in enumerate(keys)})
+    assert len(group) == 3
+    assert group.after(keys[2]) == keys[2]
+    assert group.after(keys[2] + b'\x00') == keys[0]
+    assert group.after(keys[0] + b'\x00') is None
+    assert group.before(keys[2]) == keys[1]
+    assert group.before(keys[1]) is None
+    assert group.size(keys[1]) == 1
+    assert group.size(b'\x02' * 32) is None
+    group.set(b'\x02' * 32, 7)
+    group.set(keys[0], 9)
+    assert group.after(b'\x01' * 32 + b'\x00') == b'\x02' * 32
+    assert group.size(keys[0]) == 9
+    group.remove(keys[2])
+    assert group.before(keys[0]) == b'\x02' * 32
+    assert len(group) == 3
+
+
+def test_threads():
+    identifiers = [sha256_data_identifier(f"{i}".encode('utf-8')) for i in range(0, 4000)]
+
+    with TemporaryDirectory() as working_dir:
+        likes = LikeIndex(working_dir, 2)
+        threads = [
+            threading.Thread(
+                target=lambda s: [likes.add(i, 1) for i in identifiers[s::8]],
+                args=(start,),
+            )
+            for start in range(0, 8)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        for index in (likes, LikeIndex(working_dir, 2)):
+            for identifier in identifiers[::100]:
+                assert index.like(identifier, 1, 0) == {for_data_block(identifier): 1}
+
+
+def test_lazy_groups():
+    identifiers = [sha256_data_identifier(f"{i}".encode('utf-8')) for i in range(0, 2000)]
+    group = identifiers[0][:2]
+    grouped = sorted(i for i in identifiers if i.startswith(group))
+
+    with TemporaryDirectory() as working_dir:
+        for identifier in identifiers:
+            os.makedirs(os.path.join(working_dir, identifier[:2]), exist_ok=True)
+
+            with open(os.path.join(working_dir, identifier[:2], identifier[2:]), 'wb') as block_file:
+                block_file.write(b'x')
+
+        likes = LikeIndex(working_dir, 2)
+        assert likes.like(grouped[1], 1, 0) == {for_data_block(grouped[1]): 1}
+        scanned = [g for g in os.listdir(working_dir) if os.path.isfile(os.path.join(working_dir, g, LIKE_INDEX_NAME))]
+        assert scanned == [group], scanned  # the neighbors were not needed
+        assert len(likes.like(grouped[1], 5000, 0)) == len(identifiers)
+
+
+if __name__ == "__main__":
+    test_basics()
+    test_upgrade()
+    test_across_groups()
+    test_discard()
+    test_group()
+    test_threads()
+    test_lazy_groups()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+
+import os
+
+from random import randbytes
+from tempfile import TemporaryDirectory
+
+import libernet.pack
+import libernet.disk
+
+from libernet.pack import Storage
+from libernet.block import store, fetch, address_of
+from libernet.hash import sha256_data_identifier
+
+
+def test_basics():
+    test_set = [('testing '*c).encode('utf-8') for c in range(0, 100)]
+
+    with TemporaryDirectory() as working_dir:
+        storage = Storage(working_dir)
+        expected = {}
+
+        for key in test_set:
+            expected[key] = store(key, storage, encrypt=False)
+
+        store(test_set[0], storage, encrypt=False)  # already stored
+
+        for key in expected:
+            assert address_of(expected[key][0]) in storage
+
+        for key in expected:
+            assert storage[address_of(expected[key][0])] == expected[key][1]
+
+        for key in expected:
+            found_value = fetch(expected[key][0], storage)
+            assert key == found_value, f"{key} vs {found_value}"
+
+        for key in expected:
+            found = storage.like(address_of(expected[key][0]))
+            assert address_of(expected[key][0]) in found, f"{address_of(expected[key][0])} vs {found}"
+            assert len(found) <= 7, found
+
+        storage.close()
+        reopened = Storage(working_dir)
+
+        for key in expected:
+            assert reopened[address_of(expected[key][0])] == expected[key][1]
+
+        reopened.close()
+
+
+def test_open():
+    test_set = [b'', b'hello', randbytes(1024 * 1024)]
+
+    with TemporaryDirectory() as working_dir:
+        storage = Storage(working_dir)
+
+        for data in test_set:
+            key = f"/sha256/{sha256_data_identifier(data)}"
+            storage[key] = data
+            block_file, size = storage.open(key)
+            assert size == len(data)
+
+            with block_file:
+                assert block_file.read(5) + block_file.read() == data
+                assert block_file.read() == b''
+
+        assert storage.open(f"/sha256/{sha256_data_identifier(b'missing')}") is None
+        storage.close()
+
+
+def test_corners():
+    external = {"/sha256/eca8d73d099dfebcbf3e20a57935101839ac2c7739ccc9f2dd36d77fb8b54212": 30, "/sha256/ecabb29bbec22a6501c06aec21d8b36adfbaecd7fd57389a77563938d57ae2be": 30, "/sha256/ecabaf6cf7d763f63a9a537bd2a16aed96de1f71a46a41a7c5b8f26b420449f6": 30, "/sha256/eca9a32bbbb8a92d786b5cb7021d9be4de3ea4bf374a865a9a3af9dd6c2b3ee7": 30, "/sha256/ecaf2f7b3f3354db0d41e8104606d273c67020d0a2f44515071653fac341ecce": 30, "/sha256/ecaa682ed6ed7d4a0f1a3d64dee027b81ddc07af7d35b3bf4422f875d4af8302": 30, "/sha256/ecaeec74e719cb10c8ec2b6bddea9dbd637b294da235c7482746e20a76a0cf19": 30}
+    identifier = "/sha256/eca8d73d099dfebcbf3e20a57935101839ac2c7739ccc9f2dd36d77fb8b54212"
+
+    with TemporaryDirectory() as working_dir:
+        storage = Storage(working_dir)
+        pass1 = storage.like(identifier, external)
+        pass2 = storage.like(identifier)
+        assert pass1 == pass2, f"{pass1} vs {pass2}"
+        storage.close()
+        storage = Storage(working_dir)
+        assert storage.like(identifier) == pass1
+        old_max = libernet.disk.MAX_LIKE
+        libernet.disk.MAX_LIKE = 5
+        pass3 = storage.like(identifier)
+        assert len(pass3) == 5
+        libernet.disk.MAX_LIKE = old_max
+        assert storage.get(identifier) is None
+        assert identifier not in storage
+
+        try:
+            value = storage[identifier]
+            assert False, value
+
+        except KeyError:
+            pass
+
+        storage.close()
+
+
+def test_segments():
+    old_segment_size = libernet.pack.SEGMENT_SIZE
+    libernet.pack.SEGMENT_SIZE = 4096
+    test_set = [randbytes(1000) for _ in range(0, 100)]
+
+    with TemporaryDirectory() as working_dir:
+        storage = Storage(working_dir)
+        urls = [store(d, storage)[0] for d in test_set]
+        storage.close()
+        storage = Storage(working_dir)
+
+        for data, url in zip(test_set, urls):
+            assert fetch(url, storage) == data
+
+        storage.close()
+        segments = [n for n in os.listdir(os.path.join(working_dir, 'pack')) if n.startswith('segment_')]
+        assert len(segments) > 10, segments
+
+    libernet.pack.SEGMENT_SIZE = old_segment_size
+
+
+def test_recovery():
+    test_set = [(f'{c} testing '*c).encode('utf-8') for c in range(0, 20)]
+
+    with TemporaryDirectory() as working_dir:
+        pack_dir = os.path.join(working_dir, 'pack')
+        storage = Storage(working_dir)
+        urls = [store(d, storage)[0] for d in test_set]
+        storage.close()
+        index_path = os.path.join(pack_dir, libernet.pack.INDEX_NAME)
+        segment_path = os.path.join(pack_dir, libernet.pack.SEGMENT_NAME.format(0))
+        entry_size = libernet.pack.INDEX_ENTRY.size
+        os.truncate(index_path, entry_size * 15 + 7)  # lost 5 index entries + partial
+
+        with open(segment_path, 'ab') as segment_file:
+            segment_file.write(b'partial record')  # crashed while writing a record
+
+        storage = Storage(working_dir)
+
+        for data, url in zip(test_set, urls):
+            assert fetch(url, storage) == data
+
+        url, _ = store(b'after recovery', storage)
+        storage.close()
+        assert os.path.getsize(index_path) == entry_size * 21
+        storage = Storage(working_dir)
+        assert fetch(url, storage) == b'after recovery'
+
+        with open(segment_path, 'r+b') as segment_file:
+            segment_file.seek(-3, os.SEEK_END)
+            segment_file.write(b'bad')  # corrupt the last block
+
+        assert storage.get(address_of(url)) is None
+        storage.close()
+
+
+def test_repair():
+    data = randbytes(64 * 1024)
+
+    with TemporaryDirectory() as working_dir:
+        segment_path = os.path.join(working_dir, 'pack', libernet.pack.SEGMENT_NAME.format(0))
+
+        for reopen in (False, True):
+            storage = Storage(working_dir)
+            url, block = store(data, storage)
+            key = address_of(url)
+
+            with open(segment_path, 'r+b') as segment_file:
+                segment_file.seek(-100, os.SEEK_END)
+                segment_file.write(b'corrupt')
+
+            if reopen:
+                storage.close()
+                storage = Storage(working_dir)
+
+            assert key in storage  # only checked when read
+            assert storage.open(key) is not None
+
+            assert storage.get(key) is None
+            assert key not in storage
+            assert storage.open(key) is None
+            assert key not in storage.like(key)
+            storage[key] = block
+            assert key in storage
+            assert fetch(url, storage) == data
+            storage.close()
+            storage = Storage(working_dir)
+            assert fetch(url, storage) == data
+            storage.close()
+            os.unlink(segment_path)
+            os.unlink(os.path.join(working_dir, 'pack', libernet.pack.INDEX_NAME))
+
+
+if __name__ == "__main__":
+    test_basics()
+    test_open()
+    test_corners()
+    test_segments()
+    test_recovery()
+    test_repair()
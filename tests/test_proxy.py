@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 
 
+import os
 import time
+import threading
+
+from random import randbytes
 
 from tempfile import TemporaryDirectory
 from types import SimpleNamespace
@@ -10,6 +14,8 @@ from multiprocessing import Process
 from libernet.server import serve
 from libernet.block import store, fetch
 from libernet.proxy import Storage
+from libernet.disk import Storage as DiskStorage
+from libernet.known import KnownBlocks
 from libernet.hash import sha256_data_identifier
 from libernet.url import address_of
 
@@ -48,6 +54,11 @@ def test_basics():
         for key in expected:
             assert proxy[address_of(expected[key][0])] == expected[key][1]
 
+        addresses = [address_of(expected[k][0]) for k in expected]
+        missing = f"/sha256/{sha256_data_identifier(b'no way')}"
+        assert proxy.contains_many(addresses + [missing]) == [True] * len(addresses) + [False]
+        assert proxy.get_many(addresses + [missing]) == [expected[k][1] for k in expected] + [None]
+
         for key in expected:
             found_value = fetch(expected[key][0], proxy)
             assert key == found_value, f"{key} vs {found_value}"
@@ -64,6 +75,136 @@ def test_basics():
         time.sleep(SHUTDOWN_WAIT)  # wait for the server to shutdown
 
 
+def test_uploaders():
+    with TemporaryDirectory() as working_dir:
+        server = Process(target=serve,
+                args=(SimpleNamespace(storage=working_dir, port=SERVER_PORT, debug=False),))
+        server.start()
+        time.sleep(STARTUP_WAIT)  # wait for the server to come up
+
+        for uploaders, max_queued_bytes in ((1, 1), (4, 100), (16, 1024 * 1024)):
+            proxy = Storage("localhost", SERVER_PORT, uploaders, max_queued_bytes)
+            test_set = [f'{uploaders} testing {c}'.encode('utf-8') for c in range(0, 50)]
+            urls = [store(d, proxy, encrypt=False)[0] for d in test_set]
+            assert all(proxy.contains_many([address_of(u) for u in urls]))
+            assert [fetch(u, proxy) for u in urls] == test_set
+            proxy.shutdown()
+            proxy.join()  # wait for any pending messages to be sent
+            assert not proxy.active()
+
+        server.kill()
+        time.sleep(SHUTDOWN_WAIT)  # wait for the server to shutdown
+
+
+def test_spill():
+    with TemporaryDirectory() as working_dir:
+        server = Process(target=serve,
+                args=(SimpleNamespace(storage=working_dir, port=SERVER_PORT, debug=False),))
+        server.start()
+        time.sleep(STARTUP_WAIT)  # wait for the server to come up
+
+        with TemporaryDirectory() as spill_dir:
+            spill = DiskStorage(spill_dir)
+            proxy = Storage("localhost", SERVER_PORT, 2, 100, spill)
+            test_set = [f'spill testing {c}'.encode('utf-8') * 10 for c in range(0, 50)]
+            test_set.extend(test_set[:10])  # spill the same blocks twice
+            urls = [store(d, proxy, encrypt=False)[0] for d in test_set]
+            assert [fetch(u, proxy) for u in urls] == test_set
+            proxy.shutdown()
+            proxy.join()  # wait for any pending messages to be sent
+
+            for url in urls:  # spilled blocks are removed once they are sent
+                assert address_of(url) not in spill, url
+
+        server.kill()
+        time.sleep(SHUTDOWN_WAIT)  # wait for the server to shutdown
+
+
+def test_pending_reads():
+    with TemporaryDirectory() as working_dir:
+        server = Process(target=serve,
+                args=(SimpleNamespace(storage=working_dir, port=SERVER_PORT, debug=False),))
+        server.start()
+        time.sleep(STARTUP_WAIT)  # wait for the server to come up
+
+        with TemporaryDirectory() as spill_dir:
+            for spill in (None, DiskStorage(spill_dir)):
+                proxy = Storage("localhost", SERVER_PORT, 1, 4 * 1024 * 1024, spill)
+                test_set = [randbytes(512 * 1024) for _ in range(0, 16)]
+                urls = []
+
+                for data in test_set:
+                    urls.append(store(data, proxy, encrypt=False)[0])
+                    address = address_of(urls[-1])
+                    assert address in proxy, address
+                    assert fetch(urls[-1], proxy) == data
+                    assert address in proxy.like(address), address
+
+                addresses = [address_of(u) for u in urls]
+                assert all(proxy.contains_many(addresses))
+                assert len([b for b in proxy.get_many(addresses) if b is not None]) == 16
+                proxy.shutdown()
+                proxy.join()  # wait for any pending messages to be sent
+                reopened = Storage("localhost", SERVER_PORT)
+                assert all(reopened.contains_many(addresses))
+                assert [fetch(u, reopened) for u in urls] == test_set
+                reopened.shutdown()
+                reopened.join()
+
+        server.kill()
+        time.sleep(SHUTDOWN_WAIT)  # wait for the server to shutdown
+
+
+def test_known():
+    with TemporaryDirectory() as working_dir:
+        server = Process(target=serve,
+                args=(SimpleNamespace(storage=working_dir, port=SERVER_PORT, debug=False),))
+        server.start()
+        time.sleep(STARTUP_WAIT)  # wait for the server to come up
+        known_path = os.path.join(working_dir, 'known.bin')
+        proxy = Storage("localhost", SERVER_PORT, known=KnownBlocks(known_path))
+        test_set = [f'known testing {c}'.encode('utf-8') for c in range(0, 20)]
+        urls = [store(d, proxy, encrypt=False)[0] for d in test_set[:10]]
+        proxy.shutdown()
+        proxy.join()  # wait for any pending messages to be sent
+        assert len(KnownBlocks(known_path)) == 10
+
+        # blocks the server is known to have are not sent again
+        known = KnownBlocks(known_path)
+        never_sent = store(test_set[10], {}, encrypt=False)[0]
+        known.add(address_of(never_sent).split('/')[2])
+        proxy = Storage("localhost", SERVER_PORT, known=known)
+        assert store(test_set[10], proxy, encrypt=False)[0] == never_sent
+        assert address_of(never_sent) not in proxy
+        assert address_of(never_sent).split('/')[2] not in known  # the server said so
+        assert len(KnownBlocks(known_path)) == 10
+        proxy.shutdown()
+        proxy.join()  # wait for any pending messages to be sent
+
+        # warm the known blocks from the server, forgetting the ones it does not have
+        known = KnownBlocks(os.path.join(working_dir, 'warm.bin'))
+        lost = store(test_set[11], {}, encrypt=False)[0]
+        known.add(address_of(lost).split('/')[2])
+        proxy = Storage("localhost", SERVER_PORT, known=known)
+        proxy.warm([address_of(u) for u in urls] + [address_of(lost)])
+        assert len(known) == 10, len(known)
+        assert proxy.known_blocks() == 10, proxy.known_blocks()
+        assert address_of(lost).split('/')[2] not in known
+        proxy.warm([address_of(u) for u in urls])
+        assert address_of(urls[0]) in proxy
+        assert len(known) == 10, len(known)
+        store(test_set[11], proxy, encrypt=False)
+        proxy.shutdown()
+        proxy.join()  # wait for any pending messages to be sent
+        proxy = Storage("localhost", SERVER_PORT, known=known)
+        assert address_of(lost) in proxy  # sent once it was no longer known
+        assert len(known) == 11, len(known)
+        proxy.shutdown()
+        proxy.join()  # wait for any pending messages to be sent
+        server.kill()
+        time.sleep(SHUTDOWN_WAIT)  # wait for the server to shutdown
+
+
 def test_errors():
     missing_identifier = sha256_data_identifier(b'no way')
 
@@ -95,6 +236,27 @@ def test_errors():
         time.sleep(SHUTDOWN_WAIT)  # wait for the server to shutdown
 
 
+def test_send_failure():
+    proxy = Storage("localhost", SERVER_PORT, 1, 1)  # no server to send to
+    blocks = [randbytes(10) for _ in range(0, 2)]
+
+    def send():
+        for block in blocks:
+            store(block, proxy, encrypt=False)
+
+    sender = threading.Thread(target=send, daemon=True)
+    sender.start()
+    sender.join(10)
+    assert not sender.is_alive()  # a failed send gives its space back
+    proxy.shutdown()
+    proxy.join()
+
+
 if __name__ == "__main__":
     test_basics()
+    test_uploaders()
+    test_spill()
+    test_pending_reads()
+    test_known()
     test_errors()
+    test_send_failure()
@@ -2,6 +2,7 @@
 
 
 import tempfile
+import io
 import multiprocessing
 import os
 import time
@@ -19,6 +20,8 @@ import requests
 import libernet.server
 import libernet.disk
 import libernet.message
+import libernet.pack
+import libernet.batch
 
 from libernet.disk import Storage
 from libernet.hash import sha256_data_identifier, identifier_match_score
@@ -107,6 +110,55 @@ def test_app():
     libernet.disk.MAX_LIKE = max_like
 
 
+def test_app_streaming():
+    test_set = [b'', b'hello', randbytes(1024 * 1024), randbytes(100000)]
+
+    with tempfile.TemporaryDirectory() as storage:
+        pack = libernet.pack.Storage(storage)
+        backends = [Storage(storage), Storage(storage, index=True), pack]
+
+        for backend in backends:
+            instance = libernet.server.create_app(backend, libernet.message.Center())
+
+            with instance.test_client() as test_client:
+                for data in test_set:
+                    identifier = sha256_data_identifier(data)
+                    test_client.put(f"/sha256/{identifier}", data=data)
+                    response = test_client.get(f'/sha256/{identifier}')
+                    assert response.status_code == 200
+                    assert response.content_length == len(data)
+                    assert response.data == data
+
+        pack.close()
+
+
+def test_app_batches():
+    test_set = [b'', b'hello', randbytes(1024 * 1024), randbytes(100000)]
+    missing = sha256_data_identifier(b'not stored')
+
+    with tempfile.TemporaryDirectory() as storage:
+        instance = libernet.server.create_app(Storage(storage), libernet.message.Center())
+
+        with instance.test_client() as test_client:
+            identifiers = [sha256_data_identifier(d) for d in test_set]
+
+            for identifier, data in zip(identifiers, test_set):
+                test_client.put(f"/sha256/{identifier}", data=data)
+
+            request = libernet.batch.pack_identifiers(identifiers + [missing])
+            response = test_client.post('/sha256/many', data=request)
+            assert response.status_code == 200
+            found = list(libernet.batch.read_frames(io.BytesIO(response.data), 5))
+            assert found == test_set + [None]
+            response = test_client.post('/sha256/exists', data=request)
+            assert response.status_code == 200
+            assert libernet.batch.unpack_bitmap(response.data, 5) == [True] * 4 + [False]
+            response = test_client.post('/sha256/many', data=b'short')
+            assert response.status_code == 400
+            response = test_client.post('/sha256/exists', data=b'short')
+            assert response.status_code == 400
+
+
 def test_load_settings():
     with tempfile.TemporaryDirectory() as storage:
         args = SimpleNamespace(storage=storage, port=None)
@@ -151,8 +203,25 @@ def test_rotate():
         assert contents == log_contents
 
 
+def test_create_storage():
+    parser = libernet.server.get_arg_parser()
+
+    with tempfile.TemporaryDirectory() as storage:
+        args = parser.parse_args(['--storage', storage, '--backend', 'pack'])
+        pack = libernet.server.create_storage(args)
+        assert isinstance(pack, libernet.pack.Storage), pack
+        pack.close()
+        args = parser.parse_args(['--storage', storage, '--index'])
+        assert isinstance(libernet.server.create_storage(args), Storage)
+        args = SimpleNamespace(storage=storage)
+        assert isinstance(libernet.server.create_storage(args), Storage)
+
+
 if __name__ == "__main__":
     test_rotate()
     test_arg_parser()
     test_app()
+    test_app_streaming()
+    test_app_batches()
     test_load_settings()
+    test_create_storage()
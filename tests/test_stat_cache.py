@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+
+import os
+
+from tempfile import TemporaryDirectory
+
+from libernet.stat_cache import StatCache
+
+
+def test_basics():
+    files = {'file.txt': {'size': 4, 'modified_ns': 1, 'inode': 2, 'contents': []}}
+
+    with TemporaryDirectory() as working_dir:
+        path = os.path.join(working_dir, 'stat', 'localhost_source.json')
+        cache = StatCache(path)
+        assert cache.load('/sha256/1') is None
+        cache.save('/sha256/1', files)
+        assert cache.load('/sha256/1') == {'files': files}
+        assert StatCache(path).load('/sha256/1') == {'files': files}
+        assert cache.load('/sha256/2') is None
+        assert not os.path.exists(path + '.tmp')
+
+
+def test_bad_files():
+    with TemporaryDirectory() as working_dir:
+        path = os.path.join(working_dir, 'localhost_source.json')
+
+        for contents in ('{"url": "/sha256/1", "fil', '[]', '\xff'):
+            with open(path, 'w', encoding='latin-1') as cache_file:
+                cache_file.write(contents)
+
+            assert StatCache(path).load('/sha256/1') is None, contents
+
+
+if __name__ == "__main__":
+    test_basics()
+    test_bad_files()